@@ -1,8 +1,19 @@
+import time
+
+# 表示開始までの時間の計測起点（インポートを含める）
+PAGE_STARTED = time.perf_counter()
+
 import streamlit as st
 import sys
+from importlib import metadata
 from pathlib import Path
 import pandas as pd
 
+from core.startup import FIRST_PAINT, record_first_paint, tapas_modules
+from core.datasets import dataset_path, load_metadata
+from core.sources import cached_source, fetch_uci, import_archive, install_source
+from core.stats import dataset_stats, describe
+
 # TAPASパスの追加
 tapas_path = Path(__file__).parent / "tapas"
 if str(tapas_path) not in sys.path:
@@ -20,32 +31,31 @@ st.write("""
 TAPAS (Toolbox for Adversarial Privacy Auditing of Synthetic Data) は、
 合成データのプライバシー保護レベルを評価するためのツールです。
 """)
+record_first_paint("app", PAGE_STARTED)
 
 # システム情報を折りたたみセクションに
 with st.expander("システム情報", expanded=False):
     st.write(f"Python version: {sys.version}")
     st.write(f"Streamlit version: {st.__version__}")
     
-    # TAPASのインポート確認
-    try:
-        import tapas
-        st.success("✅ TAPASが正常にインポートされました！")
-        st.write(f"TAPASバージョン: {tapas.__version__}")
-        
-        # 利用可能なモジュールの確認
-        modules = []
-        for module in ['datasets', 'generators', 'threat_models', 'attacks', 'report']:
-            try:
-                __import__(f'tapas.{module}')
-                modules.append(module)
-            except ImportError:
-                pass
+    # TAPASの確認（インポートはせず、パッケージの場所とサブモジュールだけを調べる）
+    modules = tapas_modules()
+    if modules is None:
+        st.warning("TAPASが見つかりませんでした。")
+    else:
+        st.success("✅ TAPASが見つかりました！")
+        try:
+            st.write(f"TAPASバージョン: {metadata.version('tapas')}")
+        except metadata.PackageNotFoundError:
+            pass
         
         if modules:
             st.write("利用可能なTAPASモジュール：")
             st.write(modules)
-    except ImportError as e:
-        st.warning(f"TAPASのインポートができませんでした: {e}")
+    
+    if FIRST_PAINT:
+        st.write("表示開始までの時間（秒）：")
+        st.write({page: round(seconds, 3) for page, seconds in FIRST_PAINT.items()})
 
 # メインコンテンツ
 st.header("🚀 はじめに")
@@ -88,70 +98,70 @@ if dataset_option == "UCI Adult Dataset":
     このデータセットは、人口統計データに基づいて年収が50K以上かどうかを予測するためのものです。
     """)
     
+    cached = cached_source("uci_adult")
+    if cached is not None:
+        st.caption(f"ローカルキャッシュ: {cached[1][:12]}（ネットワークには接続しません）")
+    
+    with st.expander("ローカルのファイルから読み込む（オフライン環境用）", expanded=False):
+        archive = st.file_uploader(
+            "UCIのadult.zip、adult.data、またはCSV（.csv / .csv.gz）",
+            type=["zip", "data", "csv", "gz"],
+            key="adult_archive"
+        )
+        if archive is not None and st.button("キャッシュに取り込む", key="import_adult"):
+            try:
+                cached = import_archive("uci_adult", archive.name, archive.getvalue())
+                st.success(f"✅ キャッシュに取り込みました: {cached[1][:12]}")
+            except Exception as e:
+                st.error(f"取り込み中にエラーが発生しました: {e}")
+    
     if st.button("Adult Datasetをロード", key="load_adult"):
         try:
-            from ucimlrepo import fetch_ucirepo
-            
             with st.spinner("データをロード中..."):
-                # データセットの取得
-                adult = fetch_ucirepo(id=2)
-                X = adult.data.features
-                y = adult.data.targets
-                
-                # データの結合
-                data = pd.concat([X, y], axis=1)
+                # キャッシュが無い場合だけ取得する
+                if cached is None:
+                    cached = fetch_uci("uci_adult")
+                source_path, sha = cached
                 
-                # データを保存
-                DATA_DIR = Path("data/uploaded/adult_dataset")
-                DATA_DIR.mkdir(parents=True, exist_ok=True)
+                # 保存済みのデータセットと内容が同じなら書き直さない
+                changed = install_source(
+                    "adult_dataset", source_path, sha,
+                    "UCI Adult Dataset - Income prediction dataset"
+                )
+                if changed:
+                    st.success("✅ Adult Datasetが正常にロードされました！")
+                else:
+                    st.success("✅ Adult Datasetは既に最新の状態で保存されています。")
                 
-                csv_path = DATA_DIR / "adult_dataset.csv"
-                data.to_csv(csv_path, index=False)
-                
-                # メタデータの保存
-                metadata = {
-                    "name": "adult_dataset",
-                    "description": "UCI Adult Dataset - Income prediction dataset",
-                    "original_filename": "adult_uci.csv",
-                    "rows": len(data),
-                    "columns": len(data.columns),
-                    "column_names": data.columns.tolist(),
-                    "dtypes": data.dtypes.astype(str).to_dict(),
-                    "upload_date": pd.Timestamp.now().isoformat()
-                }
-                
-                metadata_path = DATA_DIR / "metadata.json"
-                import json
-                with open(metadata_path, "w") as f:
-                    json.dump(metadata, f, indent=2)
-                
-                st.success("✅ Adult Datasetが正常にロードされました！")
+                metadata = load_metadata("adult_dataset")
+                stats = dataset_stats("adult_dataset")
                 
                 # データの概要表示
                 st.write("### データセット概要")
                 col1, col2, col3 = st.columns(3)
                 with col1:
-                    st.metric("レコード数", len(data))
+                    st.metric("レコード数", metadata["rows"])
                 with col2:
-                    st.metric("特徴量数", len(X.columns))
+                    st.metric("特徴量数", metadata["columns"] - 1)
                 with col3:
-                    st.metric("ターゲット変数", y.columns[0])
+                    st.metric("ターゲット変数", metadata["column_names"][-1])
                 
                 # データプレビュー
                 st.write("### データプレビュー")
-                st.dataframe(data.head(10))
+                st.dataframe(pd.read_csv(dataset_path("adult_dataset"), nrows=10))
                 
                 # 統計情報
                 st.write("### 基本統計量")
-                st.dataframe(data.describe())
+                st.dataframe(describe(stats))
                 
                 st.info("データセット管理ページで、このデータセットを確認できます。")
                 
         except ImportError:
-            st.error("ucimlrepoがインストールされていません。以下のコマンドでインストールしてください：")
+            st.error("ucimlrepoがインストールされていません。以下のコマンドでインストールするか、ローカルのファイルから読み込んでください：")
             st.code("poetry add ucimlrepo")
         except Exception as e:
             st.error(f"データのロード中にエラーが発生しました: {e}")
+            st.info("ネットワークに接続できない環境では、ローカルのファイルから読み込んでください。")
 
 elif dataset_option == "カスタムデータ生成":
     st.subheader("カスタムデータ生成")
@@ -159,70 +169,49 @@ elif dataset_option == "カスタムデータ生成":
     
     col1, col2 = st.columns(2)
     with col1:
-        num_records = st.number_input("レコード数", min_value=100, max_value=10000, value=1000)
-        num_features = st.number_input("特徴量数", min_value=2, max_value=20, value=5)
+        num_records = st.number_input("レコード数", min_value=100, max_value=50_000_000, value=1000, step=1000)
+        num_features = st.number_input("数値特徴量数", min_value=2, max_value=200, value=5)
+        num_categorical = st.number_input("カテゴリカル特徴量数", min_value=0, max_value=100, value=0)
+        num_categories = st.number_input("カテゴリ数", min_value=2, max_value=100, value=8)
     
     with col2:
         noise_level = st.slider("ノイズレベル", min_value=0.0, max_value=1.0, value=0.1)
+        correlation = st.slider("特徴量間の相関", min_value=0.0, max_value=0.95, value=0.0)
+        outlier_rate = st.slider("外れ値の割合", min_value=0.0, max_value=0.05, value=0.0, step=0.001, format="%.3f")
         random_seed = st.number_input("ランダムシード", min_value=0, value=42)
     
+    st.caption("データはチャンク単位でディスクに直接書き出すため、数百万件のレコードも生成できます。")
+    
     if st.button("データ生成", key="generate_custom"):
-        import numpy as np
-        
-        np.random.seed(random_seed)
+        from core.tablegen import write_table
         
-        # データ生成
-        X = np.random.randn(num_records, num_features)
+        progress_bar = st.progress(0.0)
+        status_text = st.empty()
         
-        # ノイズの追加
-        noise = np.random.randn(num_records, num_features) * noise_level
-        X += noise
+        def on_progress(done, total):
+            progress_bar.progress(done / total)
+            status_text.text(f"{done:,} / {total:,} レコードを書き出しました")
         
-        # ターゲット変数の生成（線形結合 + ノイズ）
-        weights = np.random.randn(num_features)
-        y = X @ weights + np.random.randn(num_records) * noise_level
-        y_binary = (y > np.median(y)).astype(int)
-        
-        # DataFrameに変換
-        feature_names = [f"feature_{i+1}" for i in range(num_features)]
-        data = pd.DataFrame(X, columns=feature_names)
-        data['target'] = y_binary
-        
-        # データを保存
-        DATA_DIR = Path("data/uploaded/custom_dataset")
-        DATA_DIR.mkdir(parents=True, exist_ok=True)
-        
-        csv_path = DATA_DIR / "custom_dataset.csv"
-        data.to_csv(csv_path, index=False)
-        
-        # メタデータの保存
-        metadata = {
-            "name": "custom_dataset",
-            "description": f"Custom generated dataset with {num_records} records and {num_features} features",
-            "original_filename": "custom_generated.csv",
-            "rows": len(data),
-            "columns": len(data.columns),
-            "column_names": data.columns.tolist(),
-            "dtypes": data.dtypes.astype(str).to_dict(),
-            "upload_date": pd.Timestamp.now().isoformat(),
-            "generation_params": {
-                "num_records": num_records,
-                "num_features": num_features,
+        write_table(
+            "custom_dataset",
+            {
+                "num_records": int(num_records),
+                "num_numeric": int(num_features),
+                "num_categorical": int(num_categorical),
+                "num_categories": int(num_categories),
+                "correlation": correlation,
                 "noise_level": noise_level,
-                "random_seed": random_seed
-            }
-        }
-        
-        metadata_path = DATA_DIR / "metadata.json"
-        import json
-        with open(metadata_path, "w") as f:
-            json.dump(metadata, f, indent=2)
+                "outlier_rate": outlier_rate,
+                "seed": int(random_seed),
+            },
+            on_progress=on_progress,
+        )
         
         st.success("✅ カスタムデータセットが生成されました！")
         
-        # データプレビュー
+        # データプレビュー（先頭だけを読み込む）
         st.write("### データプレビュー")
-        st.dataframe(data.head(10))
+        st.dataframe(pd.read_csv(dataset_path("custom_dataset"), nrows=10))
         
         st.info("データセット管理ページで、このデータセットを確認できます。")
 
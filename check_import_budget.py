@@ -0,0 +1,49 @@
+"""各ページの最上位インポートにかかる時間を計測し、予算を超えていないか確認するツール
+
+ページのスクリプトを実行せずに、無条件に実行されるインポート文だけを新しいプロセスで読み込んで計測する。
+streamlit・pandas・numpyの読み込み時間は差し引き、重いモジュール（TAPAS、scikit-learn、matplotlibなど）が
+最上位で読み込まれている場合も失敗とする。
+
+使用例:
+    python check_import_budget.py
+    python check_import_budget.py --budget 0.3 app.py pages/3_Reports.py
+"""
+import argparse
+import sys
+from pathlib import Path
+
+from core.startup import IMPORT_BUDGET_SECONDS, check_import_budget
+
+PROJECT_DIR = Path(__file__).parent
+DEFAULT_PAGES = [PROJECT_DIR / "app.py", *sorted((PROJECT_DIR / "pages").glob("*.py"))]
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="ページのインポート時間の予算チェック")
+    parser.add_argument("pages", nargs="*", type=Path, default=DEFAULT_PAGES, help="確認するページのスクリプト")
+    parser.add_argument(
+        "--budget",
+        type=float,
+        default=IMPORT_BUDGET_SECONDS,
+        help="基準のモジュールを除いたインポート時間の上限（秒）",
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    report = check_import_budget(args.pages, PROJECT_DIR, args.budget)
+
+    for entry in report:
+        status = "OK" if entry["ok"] else "NG"
+        print(f"[{status}] {entry['page']}: {entry['seconds']:.3f} 秒")
+        if entry["heavy"]:
+            print(f"    最上位で重いモジュールを読み込んでいます: {', '.join(entry['heavy'])}")
+        if entry["missing"]:
+            print(f"    インストールされていないモジュール: {', '.join(entry['missing'])}")
+
+    return 0 if all(entry["ok"] for entry in report) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1 @@
+# Streamlitページとバッチ実行で共有する評価ロジック
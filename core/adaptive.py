@@ -0,0 +1,57 @@
+"""信頼区間の幅に基づいて評価サンプル数を適応的に決める"""
+from statistics import NormalDist
+
+import numpy as np
+
+from core.metrics import auc_score
+
+DEFAULT_ADAPTIVE = {
+    "metric": "advantage",
+    "tolerance": 0.05,
+    "confidence": 0.95,
+    "batch_size": 50,
+    "max_samples": 1000,
+}
+
+
+def _z(confidence):
+    return NormalDist().inv_cdf(0.5 + confidence / 2)
+
+
+def advantage_interval(labels, predictions, confidence=0.95):
+    # advantage = TPR - FPR。0や1に張り付いた比率でも幅が潰れないよう補正した分散を使う
+    labels, predictions = np.asarray(labels), np.asarray(predictions)
+    positives, negatives = labels == 1, labels == 0
+    n1, n0 = positives.sum(), negatives.sum()
+    tp, fp = predictions[positives].sum(), predictions[negatives].sum()
+    tpr, fpr = tp / n1, fp / n0
+    tpr_adj, fpr_adj = (tp + 0.5) / (n1 + 1), (fp + 0.5) / (n0 + 1)
+    se = np.sqrt(tpr_adj * (1 - tpr_adj) / n1 + fpr_adj * (1 - fpr_adj) / n0)
+    estimate = tpr - fpr
+    return estimate, estimate - _z(confidence) * se, estimate + _z(confidence) * se
+
+
+def auc_interval(labels, scores, confidence=0.95):
+    # Hanley & McNeil (1982) の近似分散
+    labels = np.asarray(labels)
+    n1, n0 = (labels == 1).sum(), (labels == 0).sum()
+    auc = auc_score(labels, scores)
+    q1, q2 = auc / (2 - auc), 2 * auc**2 / (1 + auc)
+    variance = (auc * (1 - auc) + (n1 - 1) * (q1 - auc**2) + (n0 - 1) * (q2 - auc**2)) / (n1 * n0)
+    se = np.sqrt(max(variance, 0.0))
+    return auc, auc - _z(confidence) * se, auc + _z(confidence) * se
+
+
+def confidence_interval(config, labels, scores, predictions):
+    if config["metric"] == "auc":
+        return auc_interval(labels, scores, config["confidence"])
+    return advantage_interval(labels, predictions, config["confidence"])
+
+
+def has_converged(config, labels, scores, predictions):
+    # 1バッチ分以上の結果があり、両クラスが揃ってから判定する
+    labels = np.asarray(labels)
+    if len(labels) < config["batch_size"] or len(np.unique(labels)) < 2:
+        return False
+    _, low, high = confidence_interval(config, labels, scores, predictions)
+    return high - low <= config["tolerance"]
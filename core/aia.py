@@ -0,0 +1,98 @@
+"""合成データに対する属性推論攻撃（AIA）"""
+import numpy as np
+
+from core.metrics import auc_score
+
+
+class AttributeInferenceAttack:
+    """合成データ上の条件付き頻度（Naive Bayes）で、複数ターゲットの機微属性をまとめて推定する
+
+    機微属性の候補値ごとに各列の頻度表を合成データから1パスで作り、ターゲットは表の参照だけで
+    採点するため、計算量はターゲット数×レコード数ではなく候補値の数に比例する。
+    """
+
+    def __init__(self, encoder, sensitive_attribute, num_bins=10, smoothing=1.0):
+        if sensitive_attribute not in encoder.categories:
+            raise ValueError(
+                f"推定対象の属性はカテゴリカル列から選択してください: {sensitive_attribute!r} "
+                f"（候補: {', '.join(encoder.categories)}）"
+            )
+        self.encoder = encoder
+        self.sensitive_attribute = sensitive_attribute
+        self.values = encoder.categories[sensitive_attribute]
+        self.num_bins = num_bins
+        self.smoothing = smoothing
+        self._sensitive = list(encoder.categories).index(sensitive_attribute)
+
+    def _discretize(self, dataset):
+        # 数値列はビン番号に変換し、カテゴリカル列のコードと同様に扱う
+        codes, numeric = self.encoder.split(dataset)
+        bins = np.clip(np.floor(numeric * self.num_bins), 0, self.num_bins - 1).astype(int)
+        cardinalities = [len(values) for values in self.encoder.categories.values()]
+        cardinalities += [self.num_bins] * bins.shape[1]
+        return np.hstack([codes, bins]), cardinalities
+
+    def true_codes(self, targets):
+        return self.encoder.column_codes(targets, self.sensitive_attribute).astype(int)
+
+    def predict_proba(self, synthetic, targets):
+        num_values = len(self.values)
+        codes, cardinalities = self._discretize(synthetic)
+        target_codes, _ = self._discretize(targets)
+        sensitive = codes[:, self._sensitive]
+        known = sensitive >= 0
+
+        # 事前分布 log P(v)
+        value_counts = np.bincount(sensitive[known], minlength=num_values)
+        log_scores = np.tile(
+            np.log((value_counts + self.smoothing) / (known.sum() + self.smoothing * num_values)),
+            (len(targets), 1),
+        )
+
+        # 各列について log P(x_j | v) の表を作り、ターゲットの値で参照して加算
+        for j, cardinality in enumerate(cardinalities):
+            if j == self._sensitive:
+                continue
+            valid = known & (codes[:, j] >= 0)
+            table = np.bincount(
+                codes[valid, j] * num_values + sensitive[valid],
+                minlength=cardinality * num_values,
+            ).reshape(cardinality, num_values)
+            log_likelihood = np.log(
+                (table + self.smoothing) / (value_counts + self.smoothing * cardinality)
+            )
+            observed = target_codes[:, j] >= 0
+            log_scores[observed] += log_likelihood[target_codes[observed, j]]
+
+        log_scores -= log_scores.max(axis=1, keepdims=True)
+        proba = np.exp(log_scores)
+        return proba / proba.sum(axis=1, keepdims=True)
+
+
+def aia_metrics(true_codes, probabilities, num_values):
+    # 全ての (サンプル, ターゲット) の推定をまとめたマクロ平均指標
+    predictions = probabilities.argmax(axis=1)
+    confusion = np.bincount(
+        true_codes * num_values + predictions, minlength=num_values * num_values
+    ).reshape(num_values, num_values)
+    true_positives = np.diag(confusion)
+    predicted, actual = confusion.sum(axis=0), confusion.sum(axis=1)
+    present = (predicted + actual) > 0
+    with np.errstate(invalid="ignore", divide="ignore"):
+        precision = np.nan_to_num(true_positives / predicted)
+        recall = np.nan_to_num(true_positives / actual)
+        f1 = np.nan_to_num(2 * precision * recall / (precision + recall))
+
+    # One-vs-restのAUC（正例と負例の両方がある候補値のみ）
+    aucs = [
+        auc_score(true_codes == v, probabilities[:, v])
+        for v in range(num_values)
+        if 0 < (true_codes == v).sum() < len(true_codes)
+    ]
+    return {
+        "accuracy": float((predictions == true_codes).mean()),
+        "precision": float(precision[present].mean()),
+        "recall": float(recall[present].mean()),
+        "f1_score": float(f1[present].mean()),
+        "auc": float(np.mean(aucs)) if aucs else 0.5,
+    }
@@ -0,0 +1,111 @@
+"""合成データに対するメンバーシップ推論攻撃"""
+import numpy as np
+
+from core.classifiers import DEFAULT_CLASSIFIER, fit_classifier, make_classifier, positive_proba, trained_size
+from core.features import SetFeatureExtractor
+from core.neighbours import RecordIndex
+
+ATTACK_TYPES = [
+    "Membership Inference Attack (MIA)",
+    "Attribute Inference Attack (AIA)",
+    "Groundhog Attack",
+    "Closest Distance Attack",
+]
+
+# Shadowデータセットで学習・評価するメンバーシップ推論攻撃（複数攻撃モードで同じデータを共有できる）
+MIA_TYPES = [attack_type for attack_type in ATTACK_TYPES if attack_type != "Attribute Inference Attack (AIA)"]
+
+# 集合特徴量で分類器を学習する攻撃（分類器を選べる）
+GROUNDHOG_TYPES = ["Membership Inference Attack (MIA)", "Groundhog Attack"]
+
+
+class GroundhogAttack:
+    """Shadowデータセットの統計的特徴量で分類器を学習するMIA"""
+
+    threshold = 0.5
+
+    def __init__(self, encoder, use_naive=True, use_hist=True, use_corr=True, random_state=None,
+                 classifier=DEFAULT_CLASSIFIER, n_jobs=None):
+        self.extractor = SetFeatureExtractor(encoder, use_naive, use_hist, use_corr)
+        self.classifier_name = classifier
+        self.classifier = make_classifier(classifier, random_state=random_state)
+        # 学習に使うコア数（結果は変わらないので攻撃パラメータには含めない）
+        self.n_jobs = n_jobs
+
+    def features(self, datasets):
+        # 分類器はfloat32で学習・採点するので、特徴量も最初からfloat32で持つ
+        return self.extractor.extract(datasets).astype(np.float32)
+
+    @property
+    def trained_estimators(self):
+        return trained_size(self.classifier)
+
+    def fit_features(self, features, labels, step=None, on_progress=None):
+        # 決定木系はwarm_startで木を少しずつ追加し、途中経過を保存できるようにする
+        fit_classifier(
+            self.classifier_name, self.classifier, features, labels, step=step,
+            on_progress=None if on_progress is None else lambda: on_progress(self),
+            n_jobs=self.n_jobs,
+        )
+        return self
+
+    def score_features(self, features):
+        return positive_proba(self.classifier, features, n_jobs=self.n_jobs)
+
+    def fit(self, datasets, labels):
+        return self.fit_features(self.features(datasets), labels)
+
+    def score(self, datasets):
+        return self.score_features(self.features(datasets))
+
+
+class ClosestDistanceAttack:
+    """ターゲットに最も近い合成レコードまでの距離でメンバーシップを推定するMIA"""
+
+    threshold = 0.0
+
+    def __init__(self, encoder, target, distance="l1"):
+        self.encoder = encoder
+        self.target = target
+        self.distance = distance
+
+    def features(self, datasets):
+        # 合成データセットごとにインデックスを1回だけ作り、距離が近いほどスコアが高くなるよう符号を反転
+        return np.array([
+            -RecordIndex(self.encoder, dataset, self.distance).query(self.target)[0].min()
+            for dataset in datasets
+        ])
+
+    def fit_features(self, features, labels, step=None, on_progress=None):
+        # Shadowデータセット上で精度が最大となる閾値を選択
+        labels = np.asarray(labels)
+        candidates = np.unique(features)
+        accuracies = [((features >= t) == labels).mean() for t in candidates]
+        self.threshold = candidates[int(np.argmax(accuracies))]
+        return self
+
+    def score_features(self, features):
+        return features
+
+    def fit(self, datasets, labels):
+        return self.fit_features(self.features(datasets), labels)
+
+    def score(self, datasets):
+        return self.score_features(self.features(datasets))
+
+
+def make_attack(attack_type, encoder, target, attack_params=None, random_state=None, n_jobs=None):
+    attack_params = attack_params or {}
+    if attack_type in GROUNDHOG_TYPES:
+        return GroundhogAttack(
+            encoder,
+            use_naive=attack_params.get("use_naive", True),
+            use_hist=attack_params.get("use_hist", True),
+            use_corr=attack_params.get("use_corr", True),
+            random_state=random_state,
+            classifier=attack_params.get("classifier", DEFAULT_CLASSIFIER),
+            n_jobs=n_jobs,
+        )
+    elif attack_type == "Closest Distance Attack":
+        return ClosestDistanceAttack(encoder, target, distance=attack_params.get("distance", "l1"))
+    raise ValueError(f"{attack_type} はメンバーシップ推論攻撃ではありません。")
@@ -0,0 +1,89 @@
+"""評価スイープの展開と並列実行"""
+import itertools
+from concurrent.futures import as_completed
+
+from core.evaluation import DEFAULT_PARAMETERS, evaluation_checkpoint, run_evaluation
+from core.sampling import publish_tables
+from core.workers import WorkerPool
+
+# スイープ仕様で直積を取る軸（仕様のキー → 評価パラメータのキー）
+SWEEP_AXES = {
+    "datasets": "dataset",
+    "generators": "generator",
+    "attacks": "attack_type",
+    "auxiliary_split": "auxiliary_split",
+    "num_samples": "num_samples",
+}
+
+
+def _as_list(value):
+    return value if isinstance(value, list) else [value]
+
+
+def _generator_params(generator):
+    # "Raw (コピー)" のような文字列か {"method": ..., パラメータ...} の辞書を受け付ける
+    if isinstance(generator, str):
+        return {"generator": generator, "generator_params": {}}
+    params = dict(generator)
+    return {"generator": params.pop("method"), "generator_params": params}
+
+
+def expand_sweep(spec):
+    if "datasets" not in spec:
+        raise ValueError("スイープ仕様には datasets が必要です。")
+
+    fixed = {key: value for key, value in spec.items() if key not in SWEEP_AXES}
+    axes = [
+        _as_list(spec[axis] if axis in spec else DEFAULT_PARAMETERS[name])
+        for axis, name in SWEEP_AXES.items()
+    ]
+
+    jobs = []
+    for dataset, generator, attack_type, auxiliary_split, num_samples in itertools.product(*axes):
+        jobs.append({
+            **fixed,
+            "dataset": dataset,
+            **_generator_params(generator),
+            "attack_type": attack_type,
+            "auxiliary_split": auxiliary_split,
+            "num_samples": num_samples,
+        })
+    return jobs
+
+
+def run_job(job, checkpoint_every=None, n_jobs=None):
+    # checkpoint_everyを指定すると途中経過を保存し、同じジョブの再実行時に続きから再開する
+    # n_jobsは分類器の学習に使うコア数（結果に影響しないのでジョブのパラメータには含めない）
+    checkpoint = evaluation_checkpoint(job, every=checkpoint_every) if checkpoint_every else None
+    return run_evaluation(job, checkpoint, n_jobs)
+
+
+def run_batch(jobs, workers=1, checkpoint_every=None):
+    # データセットは親プロセスでメモリマップ用のファイルとして1度だけ公開し、各ワーカーはそれを
+    # 読み取り専用で開く。プロセス間で受け渡すのはジョブのパラメータ辞書と結果だけにする。
+    # 読み込めないデータセットがあっても、そのデータセットを使うジョブだけを失敗にする
+    published, errors = {}, {}
+    for target in {(job["dataset"], job.get("dataset_version")) for job in jobs}:
+        try:
+            published.update(publish_tables([target]))
+        except Exception as e:
+            errors[target] = e
+
+    # 完了した順に (ジョブ, 結果, 例外) を返す
+    runnable = []
+    for job in jobs:
+        error = errors.get((job["dataset"], job.get("dataset_version")))
+        if error is not None:
+            yield job, None, error
+        else:
+            runnable.append(job)
+    if not runnable:
+        return
+    with WorkerPool(workers, published) as pool:
+        futures = {pool.submit(run_job, job, checkpoint_every): job for job in runnable}
+        for future in as_completed(futures):
+            job = futures[future]
+            try:
+                yield job, future.result(), None
+            except Exception as e:
+                yield job, None, e
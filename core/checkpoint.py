@@ -0,0 +1,67 @@
+"""長時間の評価ジョブの途中経過を保存・復元する"""
+import hashlib
+import json
+import os
+import pickle
+import shutil
+from pathlib import Path
+
+from core.datasets import file_signature
+
+CHECKPOINT_DIR = Path("data/checkpoints")
+
+
+class Checkpoint:
+    """キーごとの途中経過をpickleで保存する（path=Noneなら何も保存しない）"""
+
+    def __init__(self, path=None, every=10):
+        self.path = Path(path) if path is not None else None
+        self.every = every
+
+    @property
+    def enabled(self):
+        return self.path is not None
+
+    def child(self, name):
+        if not self.enabled:
+            return self
+        return Checkpoint(self.path / name, every=self.every)
+
+    def load(self, key, default=None):
+        if not self.enabled:
+            return default
+        path = self.path / f"{key}.pkl"
+        if not path.exists():
+            return default
+        with open(path, "rb") as f:
+            return pickle.load(f)
+
+    def save(self, key, value):
+        if not self.enabled:
+            return
+        path = self.path / f"{key}.pkl"
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+        # 書き込み途中で中断されても前回の状態が残るよう一時ファイルから置き換える
+        tmp_path = path.with_suffix(".tmp")
+        with open(tmp_path, "wb") as f:
+            pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+
+    def clear(self):
+        if self.enabled and self.path.exists():
+            shutil.rmtree(self.path)
+
+
+def job_key(params, dataset_path):
+    # 評価パラメータとデータファイルの状態が同じなら同じジョブとみなす
+    payload = json.dumps(
+        {"params": params, "dataset": file_signature(dataset_path)[1:]},
+        sort_keys=True,
+        default=str,
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()[:16]
+
+
+def checkpoint_for(params, dataset_path, every=10, checkpoint_dir=CHECKPOINT_DIR):
+    return Checkpoint(checkpoint_dir / job_key(params, dataset_path), every=every)
@@ -0,0 +1,156 @@
+"""Groundhog攻撃の分類器（ランダムフォレスト・勾配ブースティング・one-hotのロジスティック回帰）
+
+どの分類器もfloat32の特徴量行列で学習・採点する。決定木系は warm_start で木（反復）を少しずつ
+追加できるので、学習の途中経過をチェックポイントに保存できる。
+"""
+import time
+
+import numpy as np
+
+CLASSIFIERS = {
+    "random_forest": "ランダムフォレスト",
+    "hist_gradient_boosting": "勾配ブースティング（ヒストグラム）",
+    "logistic_regression": "ロジスティック回帰（one-hot）",
+}
+DEFAULT_CLASSIFIER = "random_forest"
+
+# warm_startで大きくしていくパラメータと、その最終的な値
+GROWTH = {
+    "random_forest": ("n_estimators", 100),
+    "hist_gradient_boosting": ("max_iter", 100),
+}
+
+
+class OneHotLogisticRegression:
+    """各特徴量を分位点で区切ったone-hotの疎行列でロジスティック回帰を学習する"""
+
+    def __init__(self, num_bins=10, C=1.0, random_state=None):
+        self.num_bins = num_bins
+        self.C = C
+        self.random_state = random_state
+
+    def _encode(self, X):
+        from scipy import sparse
+
+        # 列ごとのビン番号に列のオフセットを足し、1行に特徴量の数だけ1が立つCSR行列にする
+        codes = np.column_stack([
+            np.searchsorted(edges, X[:, j], side="right") for j, edges in enumerate(self.edges_)
+        ])
+        indices = (codes + self.offsets_).ravel()
+        indptr = np.arange(0, len(indices) + 1, X.shape[1])
+        return sparse.csr_matrix(
+            (np.ones(len(indices), dtype=np.float32), indices, indptr), shape=(len(X), self.num_columns_)
+        )
+
+    def fit(self, X, y):
+        from sklearn.linear_model import LogisticRegression
+
+        # 値の種類が少ない列は区切りが重複するので、重複を除いた分位点だけを使う
+        quantiles = np.quantile(X, np.linspace(0, 1, self.num_bins + 1)[1:-1], axis=0)
+        self.edges_ = [np.unique(column) for column in quantiles.T]
+        sizes = np.array([len(edges) + 1 for edges in self.edges_])
+        self.offsets_ = np.r_[0, np.cumsum(sizes)[:-1]]
+        self.num_columns_ = int(sizes.sum())
+
+        self.model_ = LogisticRegression(C=self.C, solver="liblinear", random_state=self.random_state)
+        self.model_.fit(self._encode(X), y)
+        self.classes_ = self.model_.classes_
+        return self
+
+    def predict_proba(self, X):
+        return self.model_.predict_proba(self._encode(X))
+
+
+def make_classifier(name=DEFAULT_CLASSIFIER, random_state=None):
+    if name == "random_forest":
+        from sklearn.ensemble import RandomForestClassifier
+
+        return RandomForestClassifier(n_estimators=0, warm_start=True, random_state=random_state)
+    elif name == "hist_gradient_boosting":
+        from sklearn.ensemble import HistGradientBoostingClassifier
+
+        # 早期終了は検証用の分割で結果が変わるので使わない（スレッド数は limit_threads で決める）
+        return HistGradientBoostingClassifier(
+            max_iter=0, warm_start=True, early_stopping=False, random_state=random_state
+        )
+    elif name == "logistic_regression":
+        return OneHotLogisticRegression(random_state=random_state)
+    raise ValueError(f"未対応の分類器です: {name}（候補: {', '.join(CLASSIFIERS)}）")
+
+
+def trained_size(classifier):
+    # warm_startで追加済みの木（反復）の数
+    if hasattr(classifier, "estimators_"):
+        return len(classifier.estimators_)
+    return getattr(classifier, "n_iter_", 0)
+
+
+def limit_threads(n_jobs=None):
+    """学習・採点中のOpenMPのスレッド数を n_jobs（未指定なら1）に制限する
+
+    勾配ブースティングは既定でCPUコア数だけスレッドを使うため、評価ワーカーのプロセスごとに
+    制限しないとコア数を大きく超えるスレッドが同時に動く。
+    """
+    from threadpoolctl import threadpool_limits
+
+    return threadpool_limits(limits=n_jobs or 1, user_api="openmp")
+
+
+def fit_classifier(name, classifier, features, labels, step=None, on_progress=None, n_jobs=None):
+    """分類器を学習する（決定木系はstepごとに木を追加し、途中経過をon_progressに渡す）
+
+    n_jobs は学習結果を変えない実行時の設定なので、分類器を作るときではなく学習のたびに指定する。
+    """
+    features = np.asarray(features, dtype=np.float32)
+    if name == "random_forest":
+        classifier.set_params(n_jobs=n_jobs)
+    if name not in GROWTH:
+        if not hasattr(classifier, "classes_"):
+            classifier.fit(features, labels)
+            if on_progress is not None:
+                on_progress()
+        return classifier
+
+    parameter, size = GROWTH[name]
+    step = step or size
+    while trained_size(classifier) < size:
+        classifier.set_params(**{parameter: min(trained_size(classifier) + step, size)})
+        with limit_threads(n_jobs):
+            classifier.fit(features, labels)
+        if on_progress is not None:
+            on_progress()
+    return classifier
+
+
+def positive_proba(classifier, features, n_jobs=None):
+    # 正例（メンバー）の確率。学習データに正例がなかった場合は0
+    if 1 not in classifier.classes_:
+        return np.zeros(len(features))
+    with limit_threads(n_jobs):
+        proba = classifier.predict_proba(np.asarray(features, dtype=np.float32))
+    return proba[:, list(classifier.classes_).index(1)]
+
+
+def benchmark_classifiers(train_features, train_labels, test_features, test_labels,
+                          names=None, random_state=None, n_jobs=None):
+    """同じ特徴量で分類器ごとの学習・採点時間と攻撃性能を測る（1行1分類器のリスト）"""
+    from core.metrics import binary_metrics
+
+    rows = []
+    for name in names or CLASSIFIERS:
+        classifier = make_classifier(name, random_state=random_state)
+        started = time.perf_counter()
+        fit_classifier(name, classifier, train_features, train_labels, n_jobs=n_jobs)
+        trained = time.perf_counter()
+        scores = positive_proba(classifier, test_features, n_jobs=n_jobs)
+        scored = time.perf_counter()
+        metrics = binary_metrics(test_labels, scores, (scores >= 0.5).astype(int))
+        rows.append({
+            "classifier": name,
+            "train_seconds": trained - started,
+            "score_seconds": scored - trained,
+            "auc": metrics["auc"],
+            "accuracy": metrics["accuracy"],
+            "advantage": metrics["advantage"],
+        })
+    return rows
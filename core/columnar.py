@@ -0,0 +1,166 @@
+"""整数コードと型付き配列による列指向のデータセット表現"""
+import hashlib
+import json
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from core.encoding import numeric_values
+
+
+def _code_dtype(num_categories):
+    # カテゴリ数に収まる最小の整数型（-1は欠損・未知の値）
+    for dtype in (np.int8, np.int16, np.int32):
+        if num_categories < np.iinfo(dtype).max:
+            return dtype
+    return np.int64
+
+
+class ColumnarTable:
+    """データセットの全レコードを列ごとの配列として1度だけ保持する基底テーブル"""
+
+    def __init__(self, columns, arrays, categories, key=None, path=None):
+        self.columns = columns
+        self.arrays = arrays
+        self.categories = categories
+        self.num_rows = len(next(iter(arrays.values()))) if arrays else 0
+        self.path = path
+        if key is None:
+            # 内容から求めた識別子（チェックポイントから復元したコピーも同じテーブルとして扱える）
+            digest = hashlib.sha256(json.dumps([columns, categories], sort_keys=True, default=str).encode())
+            for name in sorted(arrays):
+                digest.update(np.ascontiguousarray(arrays[name]).tobytes())
+            key = digest.hexdigest()
+        self.key = key
+        # 開き直すための (データセット名, バージョン)。open_base_table で開いたテーブルにだけ設定される
+        self.source = None
+
+    def __reduce__(self):
+        # データセットから開いたテーブルは名前・バージョン・キーだけをpickleし、復元時に open_base_table で
+        # 開き直す（テーブルのキャッシュが削除されていてもCSVから作り直せる）
+        if self.source is not None:
+            from core.sampling import reopen_table
+
+            return (reopen_table, (*self.source, self.key))
+        # それ以外のディスク上のテーブルはパスだけをpickleし、復元時にメモリマップで開き直す
+        if self.path is not None:
+            return (ColumnarTable.open, (str(self.path),))
+        return (ColumnarTable, (self.columns, self.arrays, self.categories, self.key))
+
+    def save(self, directory, extra=None):
+        # 列ごとの.npyと、列定義・カテゴリを記録したtable.jsonとして保存する
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        for i, col in enumerate(self.columns):
+            np.save(directory / f"{i}.npy", self.arrays[col["name"]])
+        with open(directory / "table.json", "w") as f:
+            json.dump({
+                "columns": self.columns,
+                "categories": self.categories,
+                "key": self.key,
+                **(extra or {}),
+            }, f, indent=2)
+
+    @classmethod
+    def open(cls, directory):
+        # 各列を読み取り専用のメモリマップとして開く（行は参照されるまで読み込まれない）
+        directory = Path(directory)
+        with open(directory / "table.json") as f:
+            meta = json.load(f)
+        arrays = {
+            col["name"]: np.load(directory / f"{i}.npy", mmap_mode="r")
+            for i, col in enumerate(meta["columns"])
+        }
+        return cls(meta["columns"], arrays, meta["categories"], key=meta["key"], path=directory)
+
+    @classmethod
+    def from_dataframe(cls, df, encoder):
+        # カテゴリカル列はエンコーダのカテゴリ順の整数コード、数値列は型付き配列にする
+        arrays = {}
+        for col in encoder.columns:
+            name = col["name"]
+            if name in encoder.categories:
+                codes = encoder.column_codes(df, name)
+                arrays[name] = codes.astype(_code_dtype(len(encoder.categories[name])))
+            else:
+                values = numeric_values(df[name])
+                if col["type"] == "Integer" and not np.isnan(values).any():
+                    values = values.astype(np.int64)
+                arrays[name] = values
+        return cls(encoder.columns, arrays, encoder.categories)
+
+    def __len__(self):
+        return self.num_rows
+
+    @property
+    def nbytes(self):
+        return sum(array.nbytes for array in self.arrays.values())
+
+    def view(self, index=None):
+        if index is None:
+            index = np.arange(self.num_rows)
+        return ColumnarDataset(self, index)
+
+
+class ColumnarDataset:
+    """基底テーブル上のインデックス配列で表したデータセット
+
+    行のデータはコピーせず、生成器が書き換えた列だけを overrides として個別に保持する。
+    """
+
+    def __init__(self, table, index, overrides=None):
+        self.table = table
+        self.index = np.asarray(index)
+        self.overrides = overrides or {}
+
+    def __len__(self):
+        return len(self.index)
+
+    @property
+    def columns(self):
+        return self.table.columns
+
+    @property
+    def categories(self):
+        return self.table.categories
+
+    def column(self, name):
+        if name in self.overrides:
+            return self.overrides[name]
+        return self.table.arrays[name][self.index]
+
+    def get_records(self, record_ids):
+        record_ids = np.asarray(record_ids)
+        overrides = {name: values[record_ids] for name, values in self.overrides.items()}
+        return ColumnarDataset(self.table, self.index[record_ids], overrides)
+
+    def sample(self, num_records, rng, replace=False):
+        return self.get_records(rng.choice(len(self), size=num_records, replace=replace))
+
+    def with_columns(self, **columns):
+        return ColumnarDataset(self.table, self.index, {**self.overrides, **columns})
+
+    def to_dataframe(self):
+        data = {}
+        for col in self.columns:
+            name = col["name"]
+            values = self.column(name)
+            if name in self.categories:
+                data[name] = pd.Categorical.from_codes(values, categories=self.categories[name])
+            else:
+                data[name] = values
+        return pd.DataFrame(data)
+
+
+def concat_datasets(datasets):
+    # 同じ基底テーブル上のデータセットはインデックスの連結だけで結合する
+    table = datasets[0].table
+    if any(dataset.table.key != table.key for dataset in datasets):
+        raise ValueError("異なる基底テーブルのデータセットは結合できません。")
+    overridden = set().union(*(dataset.overrides for dataset in datasets))
+    overrides = {
+        name: np.concatenate([dataset.column(name) for dataset in datasets])
+        for name in overridden
+    }
+    return ColumnarDataset(table, np.concatenate([dataset.index for dataset in datasets]), overrides)
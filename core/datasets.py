@@ -0,0 +1,520 @@
+"""保存済みデータセットの一覧取得と読み込み、複数の利用者・ジョブから安全に書き込むための補助
+
+ファイルは同じディレクトリの一時ファイルに書いてから置き換えるので、読み手が書きかけの内容を見ることはない。
+CSV・記述ファイル・メタデータのように複数のファイルをまとめて書き換える処理はデータセット単位の排他ロックを取り、
+それらを組み合わせて読む処理は共有ロックの間にファイルを開いてから読む。
+
+CSVの中身は内容のSHA-256の名前で data/objects/<sha256>.csv に1つだけ保存し、データセット名のCSVは
+そのファイルへのハードリンクにする。同じ内容を別名で保存してもディスクは消費せず、内容から求めたキャッシュも共有される。
+保存場所のファイルは読み取り専用にし、どの名前からも書き換えずに置き換えるだけにする。
+
+追記したバッチは partitions/<sha256>.csv に置き、バージョンごとのパーティションの並びを versions.json に記録する
+（追記の処理は core.versions）。全レコードを読む処理は dataset_files / load_dataframe でパーティションをまとめて読む。
+"""
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+
+import pandas as pd
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+DATA_DIR = Path("data/uploaded")
+LOCK_FILENAME = ".lock"
+VERSIONS_FILENAME = "versions.json"
+# 内容のハッシュ値の計算時の読み込み単位
+HASH_CHUNK_BYTES = 1 << 20
+# どのデータセットからも参照されなくなった内容を削除するまでの猶予（保存途中のファイルを消さないように）
+OBJECT_GRACE_SECONDS = 60
+
+# ハッシュ値を計算済みのファイル（(デバイス, inode, サイズ, 更新時刻) → SHA-256）
+_CONTENT_HASHES = {}
+
+# 同じスレッドで取得済みのロック（ロックを取った処理の中から別の書き込み関数を呼べるようにする）
+_HELD = threading.local()
+# fcntlが使えない環境ではプロセス内のロックだけで排他する
+_PROCESS_LOCKS = {}
+_PROCESS_LOCKS_GUARD = threading.Lock()
+
+
+def temporary_path(path):
+    # 隠しファイルにして、一覧の走査や *.json のglobに書きかけのファイルが現れないようにする
+    return path.with_name(f".{path.name}.{os.getpid()}.{uuid.uuid4().hex[:8]}.tmp")
+
+
+@contextmanager
+def atomic_write(path, mode="w", **kwargs):
+    """一時ファイルに書き込み、ブロックを抜けたところで置き換える（例外時は元のファイルを残す）"""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = temporary_path(path)
+    try:
+        with open(tmp_path, mode, **kwargs) as f:
+            yield f
+        os.replace(tmp_path, path)
+    finally:
+        tmp_path.unlink(missing_ok=True)
+
+
+def write_json(path, data, **kwargs):
+    with atomic_write(path) as f:
+        json.dump(data, f, indent=2, **kwargs)
+    return path
+
+
+def create_file(tmp_path, path):
+    """書き終えた一時ファイルを path として公開する。既に path があれば上書きせずFalseを返す
+
+    ハードリンクを張れないファイルシステムでは path を排他的に作成して内容をコピーする
+    （どちらの方法でも、同時に同じ名前で作成すると一方だけが成功する）。
+    """
+    try:
+        os.link(tmp_path, path)
+        return True
+    except FileExistsError:
+        return False
+    except OSError:
+        pass
+    try:
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o644)
+    except FileExistsError:
+        return False
+    try:
+        with os.fdopen(fd, "wb") as dst, open(tmp_path, "rb") as src:
+            shutil.copyfileobj(src, dst)
+            dst.flush()
+            os.fsync(dst.fileno())
+    except BaseException:
+        Path(path).unlink(missing_ok=True)
+        raise
+    return True
+
+
+def create_json(path, data, **kwargs):
+    # 既存のファイルは上書きせずFalseを返す（同時に同じ名前で作成しても一方だけが成功する）
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = temporary_path(path)
+    try:
+        with open(tmp_path, "w") as f:
+            json.dump(data, f, indent=2, **kwargs)
+        return create_file(tmp_path, path)
+    finally:
+        tmp_path.unlink(missing_ok=True)
+
+
+@contextmanager
+def dataset_lock(name, data_dir=DATA_DIR, shared=False):
+    """データセット単位のロック。書き込みは排他（shared=False）、組み合わせた読み込みは共有で取る"""
+    lock_path = Path(data_dir) / name / LOCK_FILENAME
+    key = str(lock_path.absolute())
+    held = _HELD.__dict__.setdefault("keys", set())
+    if key in held or (shared and not lock_path.parent.exists()):
+        yield
+        return
+
+    lock_path.parent.mkdir(parents=True, exist_ok=True)
+    if fcntl is None:
+        with _PROCESS_LOCKS_GUARD:
+            lock = _PROCESS_LOCKS.setdefault(key, threading.Lock())
+        with lock:
+            held.add(key)
+            try:
+                yield
+            finally:
+                held.discard(key)
+        return
+
+    # flockは開いたファイルごとのロックなので、同じプロセスの別スレッドとも排他される
+    with open(lock_path, "a") as f:
+        fcntl.flock(f.fileno(), fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+        held.add(key)
+        try:
+            yield
+        finally:
+            held.discard(key)
+            fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+def read_json(path):
+    # 走査中に削除されたファイルや壊れたファイルは無いものとして扱う
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (FileNotFoundError, NotADirectoryError, json.JSONDecodeError):
+        return None
+
+
+def list_datasets(data_dir=DATA_DIR):
+    # 各データセットディレクトリのmetadata.jsonを収集（一時ディレクトリ・削除中のディレクトリは除く）
+    try:
+        entries = sorted(Path(data_dir).iterdir())
+    except FileNotFoundError:
+        return []
+    datasets = []
+    for dataset_dir in entries:
+        if dataset_dir.name.startswith("."):
+            continue
+        metadata = read_json(dataset_dir / "metadata.json")
+        if metadata is not None:
+            datasets.append(metadata)
+    return datasets
+
+
+def load_metadata(name, data_dir=DATA_DIR):
+    return read_json(data_dir / name / "metadata.json") or {}
+
+
+def save_metadata(name, metadata, data_dir=DATA_DIR):
+    # CSVの内容のハッシュ値も記録しておく（別名のデータセットと内容が同じかを読み込まずに判定できる）
+    if "content_sha256" not in metadata and dataset_path(name, data_dir).exists():
+        metadata = {**metadata, "content_sha256": content_hash(name, data_dir)}
+    return write_json(data_dir / name / "metadata.json", metadata)
+
+
+def remove_dataset(name, data_dir=DATA_DIR):
+    # 隠しディレクトリに退避してから削除する（開いているファイルを読んでいる処理はそのまま読み終えられる）
+    dataset_dir = data_dir / name
+    with dataset_lock(name, data_dir):
+        removed = dataset_dir.with_name(f".{name}.removed.{uuid.uuid4().hex[:8]}")
+        os.rename(dataset_dir, removed)
+    shutil.rmtree(removed, ignore_errors=True)
+    collect_objects(data_dir)
+
+
+def dataset_path(name, data_dir=DATA_DIR):
+    return data_dir / name / f"{name}.csv"
+
+
+def objects_dir(data_dir=DATA_DIR):
+    # data/uploaded と同じファイルシステムに置く（ハードリンクを張れるように）
+    return Path(data_dir).parent / "objects"
+
+
+def object_path(sha, data_dir=DATA_DIR):
+    return objects_dir(data_dir) / f"{sha}.csv"
+
+
+def _file_key(path):
+    stat = Path(path).stat()
+    return stat.st_dev, stat.st_ino, stat.st_size, stat.st_mtime_ns
+
+
+def _hash_file(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(HASH_CHUNK_BYTES), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _ingest(path, data_dir):
+    # 一時ファイルを内容のハッシュ値の名前で保存場所に移す（同じ内容が既にあれば一時ファイルは捨てる）
+    sha = _hash_file(path)
+    target = object_path(sha, data_dir)
+    os.chmod(path, 0o444)
+    try:
+        os.link(path, target)
+    except FileExistsError:
+        pass
+    except OSError:
+        # ハードリンクを張れないファイルシステムでは一時ファイルをそのまま移す（名前は内容で決まるので、
+        # 同じ名前のファイルを置き換えても中身は変わらない）
+        os.replace(path, target)
+    Path(path).unlink(missing_ok=True)
+    _CONTENT_HASHES[_file_key(target)] = sha
+    return sha
+
+
+def _place(source, target):
+    # target を source へのハードリンクに置き換える
+    target.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = temporary_path(target)
+    try:
+        os.link(source, tmp_path)
+    except OSError:
+        # ハードリンクを張れないファイルシステムではコピーする
+        shutil.copyfile(source, tmp_path)
+    os.replace(tmp_path, target)
+    # target が既に同じファイルへのリンクだった場合、renameは何もしないので一時ファイルが残る
+    tmp_path.unlink(missing_ok=True)
+    return target
+
+
+def _link(name, sha, data_dir):
+    # データセット名のCSVを保存場所のファイルへのハードリンクに置き換える（内容はコピーしない）
+    return _place(object_path(sha, data_dir), dataset_path(name, data_dir))
+
+
+def _clear_versions(name, data_dir):
+    # CSVごと置き換えたデータセットの追記履歴とパーティションを削除する
+    # （同じ内容のCSVで置き換えても、古い追記分が履歴として復活しないようにする）
+    versions_path(name, data_dir).unlink(missing_ok=True)
+    shutil.rmtree(data_dir / name / "partitions", ignore_errors=True)
+
+
+@contextmanager
+def dataset_writer(name, data_dir=DATA_DIR, mode="w", **kwargs):
+    """データセットのCSVを書き込む。ブロックを抜けたところで保存場所に移し、データセット名から参照する"""
+    directory = objects_dir(data_dir)
+    directory.mkdir(parents=True, exist_ok=True)
+    tmp_path = temporary_path(directory / name)
+    try:
+        with open(tmp_path, mode, **kwargs) as f:
+            yield f
+        _link(name, _ingest(tmp_path, data_dir), data_dir)
+        _clear_versions(name, data_dir)
+    finally:
+        tmp_path.unlink(missing_ok=True)
+
+
+def store_dataframe(name, df, data_dir=DATA_DIR, **kwargs):
+    with dataset_writer(name, data_dir, newline="") as f:
+        df.to_csv(f, index=False, **kwargs)
+    return dataset_path(name, data_dir)
+
+
+def store_file(name, source_path, data_dir=DATA_DIR):
+    # 既存のファイル（取得済みのソースなど）を、可能ならコピーせずにデータセットとして取り込む
+    directory = objects_dir(data_dir)
+    directory.mkdir(parents=True, exist_ok=True)
+    tmp_path = temporary_path(directory / name)
+    try:
+        try:
+            os.link(source_path, tmp_path)
+        except OSError:
+            shutil.copyfile(source_path, tmp_path)
+        _link(name, _ingest(tmp_path, data_dir), data_dir)
+        _clear_versions(name, data_dir)
+    finally:
+        tmp_path.unlink(missing_ok=True)
+    return dataset_path(name, data_dir)
+
+
+def store_partition(name, df, data_dir=DATA_DIR):
+    # 追記分だけを独立したCSV（ヘッダー付き）として保存場所に書き込み、データセットからリンクする
+    directory = objects_dir(data_dir)
+    directory.mkdir(parents=True, exist_ok=True)
+    tmp_path = temporary_path(directory / name)
+    try:
+        df.to_csv(tmp_path, index=False)
+        sha = _ingest(tmp_path, data_dir)
+    finally:
+        tmp_path.unlink(missing_ok=True)
+    target = partition_path(name, sha, data_dir)
+    if not target.exists():
+        _place(object_path(sha, data_dir), target)
+    return sha
+
+
+def content_hash(name, data_dir=DATA_DIR):
+    """データセットのCSVの内容のSHA-256。保存場所への登録が確認できれば読み込まずに返す"""
+    path = dataset_path(name, data_dir)
+    key = _file_key(path)
+    if key in _CONTENT_HASHES:
+        return _CONTENT_HASHES[key]
+
+    sha = load_metadata(name, data_dir).get("content_sha256")
+    target = object_path(sha, data_dir) if sha else None
+    if target is None or not target.exists() or not os.path.samefile(target, path):
+        # 保存場所を使う前に保存されたデータセットは、ここでハッシュ値を計算して保存場所に登録する
+        sha = _hash_file(path)
+        target = object_path(sha, data_dir)
+        if not target.exists():
+            target.parent.mkdir(parents=True, exist_ok=True)
+            try:
+                os.link(path, target)
+                os.chmod(target, 0o444)
+            except OSError:
+                pass
+    _CONTENT_HASHES[key] = sha
+    return sha
+
+
+def alias_dataset(name, source_name, data_dir=DATA_DIR):
+    # 別のデータセットと同じ内容を、コピーせずに別の名前から参照する（追記したパーティションと履歴も含める）
+    versions = load_versions(source_name, data_dir)
+    for sha in {sha for entry in versions or [] for sha in entry["partitions"][1:]}:
+        target = partition_path(name, sha, data_dir)
+        if not target.exists():
+            _place(partition_path(source_name, sha, data_dir), target)
+    path = _link(name, content_hash(source_name, data_dir), data_dir)
+    if versions:
+        write_json(versions_path(name, data_dir), {"versions": versions})
+    else:
+        versions_path(name, data_dir).unlink(missing_ok=True)
+    return path
+
+
+def deduplicate_datasets(data_dir=DATA_DIR):
+    """内容が同じなのに別々のファイルになっているデータセットを保存場所のファイルへのリンクにまとめ、解放したバイト数を返す"""
+    freed = 0
+    for metadata in list_datasets(data_dir):
+        name = metadata["name"]
+        path = dataset_path(name, data_dir)
+        with dataset_lock(name, data_dir):
+            if not path.exists():
+                continue
+            sha = content_hash(name, data_dir)
+            target = object_path(sha, data_dir)
+            if target.exists() and not os.path.samefile(target, path):
+                # 他に参照の無いファイルだけがディスクから解放される
+                stat = path.stat()
+                if stat.st_nlink == 1:
+                    freed += stat.st_size
+                _link(name, sha, data_dir)
+    return freed + collect_objects(data_dir)
+
+
+def collect_objects(data_dir=DATA_DIR, grace_seconds=OBJECT_GRACE_SECONDS):
+    # どのデータセットからもリンクされていない内容を削除し、解放したバイト数を返す
+    directory = objects_dir(data_dir)
+    if not directory.exists():
+        return 0
+    freed = 0
+    now = time.time()
+    for path in directory.glob("*.csv"):
+        try:
+            stat = path.stat()
+            # リンクの追加・削除でctimeが更新されるので、直前に保存されたファイルは残しておく
+            if stat.st_nlink == 1 and now - stat.st_ctime > grace_seconds:
+                path.unlink()
+                freed += stat.st_size
+        except FileNotFoundError:
+            continue
+    return freed
+
+
+def file_signature(path):
+    # ファイルの内容が変わったことを検出するための簡易的な識別子
+    stat = Path(path).stat()
+    return str(path), stat.st_size, stat.st_mtime_ns
+
+
+def versions_path(name, data_dir=DATA_DIR):
+    return data_dir / name / VERSIONS_FILENAME
+
+
+def partition_path(name, sha, data_dir=DATA_DIR):
+    # 追記したパーティションも保存場所のファイルへのハードリンクとして置く（参照が残っている間は削除されない）
+    return data_dir / name / "partitions" / f"{sha}.csv"
+
+
+def load_versions(name, data_dir=DATA_DIR):
+    """バージョンの履歴。追記したことが無い（またはCSVごと置き換えられた）データセットはNone"""
+    versions = read_json(versions_path(name, data_dir))
+    if not versions or not dataset_path(name, data_dir).exists():
+        return None
+    # 最初のパーティションは <name>.csv そのもの。置き換えられていれば履歴は無効
+    if versions["versions"][0]["partitions"][0] != content_hash(name, data_dir):
+        return None
+    return versions["versions"]
+
+
+def _version_entry(name, version, data_dir):
+    versions = load_versions(name, data_dir)
+    if versions is None:
+        if version not in (None, 1):
+            raise ValueError(f"データセット '{name}' にバージョン {version} はありません。")
+        return None
+    if version is None:
+        return versions[-1]
+    for entry in versions:
+        if entry["version"] == version:
+            return entry
+    raise ValueError(f"データセット '{name}' にバージョン {version} はありません。")
+
+
+def dataset_version(name, data_dir=DATA_DIR):
+    # 最新のバージョン番号（追記したことが無ければ1）
+    versions = load_versions(name, data_dir)
+    return versions[-1]["version"] if versions else 1
+
+
+def version_partitions(name, version=None, data_dir=DATA_DIR):
+    # バージョンを構成するパーティションの内容のハッシュ値（古い順）
+    entry = _version_entry(name, version, data_dir)
+    return entry["partitions"] if entry else [content_hash(name, data_dir)]
+
+
+def version_key(name, version=None, data_dir=DATA_DIR):
+    """バージョンの内容を表すキー。パーティションが1つならCSVの内容のハッシュ値そのもの"""
+    partitions = version_partitions(name, version, data_dir)
+    if len(partitions) == 1:
+        return partitions[0]
+    return hashlib.sha256(json.dumps(partitions).encode()).hexdigest()
+
+
+def dataset_files(name, version=None, data_dir=DATA_DIR):
+    partitions = version_partitions(name, version, data_dir)
+    return [dataset_path(name, data_dir)] + [partition_path(name, sha, data_dir) for sha in partitions[1:]]
+
+
+def dataset_signature(name, data_dir=DATA_DIR):
+    # 統計量などが最新の内容から作られたかを確認するための識別子
+    if load_versions(name, data_dir):
+        return [version_key(name, data_dir=data_dir)]
+    return list(file_signature(dataset_path(name, data_dir))[1:])
+
+
+@contextmanager
+def open_snapshot(name, data_dir=DATA_DIR, version=None):
+    """共有ロックの間にバージョンの全パーティションを開き、(ファイルのリスト, 識別子) を渡す
+
+    開いたファイルは、後から置き換えられたり追記されたりしても開いた時点の内容のまま読める。
+    """
+    with dataset_lock(name, data_dir, shared=True):
+        files = [open(path, "rb") for path in dataset_files(name, version, data_dir)]
+        signature = (
+            dataset_signature(name, data_dir) if version is None
+            else [version_key(name, version, data_dir)]
+        )
+    try:
+        yield files, signature
+    finally:
+        for f in files:
+            f.close()
+
+
+def load_dataframe(name, data_dir=DATA_DIR, version=None, **kwargs):
+    with open_snapshot(name, data_dir, version) as (files, _):
+        frames = [pd.read_csv(f, **kwargs) for f in files]
+    return frames[0] if len(frames) == 1 else pd.concat(frames, ignore_index=True)
+
+
+def infer_column_type(dtype):
+    # pandasのdtypeからTAPASの列型を判定
+    dtype = str(dtype)
+    if dtype.startswith('int'):
+        return 'Integer'
+    elif dtype.startswith('float'):
+        return 'Continuous'
+    return 'Categorical'
+
+
+def load_columns(name, df=None, data_dir=DATA_DIR, version=None):
+    # TAPAS記述ファイルがあればその列定義を使い、なければdtypeから推定
+    # （バージョンを指定した場合は、そのバージョンを作った時点の列定義を使う）
+    entry = _version_entry(name, version, data_dir) if version is not None else None
+    if entry and entry.get("columns"):
+        return entry["columns"]
+    description_path = data_dir / name / f"{name}.json"
+    if description_path.exists():
+        with open(description_path) as f:
+            description = json.load(f)
+        if isinstance(description, dict):
+            description = description["columns"]
+        return description
+
+    if df is None:
+        df = load_dataframe(name, data_dir, version)
+    return [{"name": col, "type": infer_column_type(df[col].dtype)} for col in df.columns]
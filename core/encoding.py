@@ -0,0 +1,105 @@
+"""TAPAS記述ファイルの列定義に基づくレコードの数値エンコーディング"""
+import numpy as np
+import pandas as pd
+
+NUMERIC_TYPES = ("Integer", "Continuous")
+
+
+def numeric_values(series):
+    # k-匿名化で区間に一般化された列は区間の中点として扱う
+    if isinstance(series.dtype, pd.CategoricalDtype) and isinstance(series.cat.categories, pd.IntervalIndex):
+        series = series.map(lambda interval: interval.mid if pd.notna(interval) else np.nan)
+    return pd.to_numeric(series, errors="coerce").to_numpy(dtype=float)
+
+
+class Encoder:
+    """カテゴリカル列をone-hot、数値列を[0, 1]に正規化して行列化する"""
+
+    def __init__(self, df, columns):
+        self.columns = columns
+        self.categories = {}
+        self.ranges = {}
+        for col in columns:
+            name = col["name"]
+            if col["type"] in NUMERIC_TYPES:
+                values = numeric_values(df[name])
+                lo, hi = np.nanmin(values), np.nanmax(values)
+                self.ranges[name] = (lo, hi if hi > lo else lo + 1.0)
+            elif isinstance(col.get("representation"), list):
+                self.categories[name] = [str(v) for v in col["representation"]]
+            else:
+                self.categories[name] = sorted(df[name].dropna().astype(str).unique())
+        self._build_slices()
+
+    @classmethod
+    def from_state(cls, columns, categories, ranges):
+        # 保存済みのカテゴリと値域から、元データを読まずにエンコーダを復元する
+        encoder = cls.__new__(cls)
+        encoder.columns = columns
+        encoder.categories = categories
+        encoder.ranges = {name: tuple(bounds) for name, bounds in ranges.items()}
+        encoder._build_slices()
+        return encoder
+
+    def state(self):
+        return {
+            "categories": self.categories,
+            "ranges": {name: [float(lo), float(hi)] for name, (lo, hi) in self.ranges.items()},
+        }
+
+    def _build_slices(self):
+        # エンコード後の各列が占める範囲
+        self.slices = {}
+        offset = 0
+        for col in self.columns:
+            name = col["name"]
+            width = len(self.categories[name]) if name in self.categories else 1
+            self.slices[name] = slice(offset, offset + width)
+            offset += width
+        self.dim = offset
+
+    @property
+    def numeric_columns(self):
+        return [self.slices[name].start for name in self.ranges]
+
+    def codes(self, series, name):
+        # カテゴリのインデックス（未知の値と欠損は-1）
+        return pd.Categorical(series.astype(str).where(series.notna()), categories=self.categories[name]).codes
+
+    def column_codes(self, dataset, name):
+        # DataFrameは値からコードを求め、列指向データセットは保持しているコードをそのまま使う
+        if isinstance(dataset, pd.DataFrame):
+            return self.codes(dataset[name], name)
+        return dataset.column(name)
+
+    def column_numeric(self, dataset, name):
+        lo, hi = self.ranges[name]
+        if isinstance(dataset, pd.DataFrame):
+            values = numeric_values(dataset[name])
+        else:
+            values = dataset.column(name).astype(float)
+        return np.nan_to_num((values - lo) / (hi - lo))
+
+    def split(self, dataset):
+        # カテゴリカル列はコード、数値列は正規化値のまま2つの行列に分けて返す
+        codes = np.column_stack([
+            self.column_codes(dataset, name).astype(np.int32) for name in self.categories
+        ]) if self.categories else np.zeros((len(dataset), 0), dtype=np.int32)
+        numeric = np.column_stack([
+            self.column_numeric(dataset, name) for name in self.ranges
+        ]) if self.ranges else np.zeros((len(dataset), 0))
+        return codes, numeric
+
+    def encode(self, dataset):
+        encoded = np.zeros((len(dataset), self.dim))
+        for col in self.columns:
+            name = col["name"]
+            part = self.slices[name]
+            if name in self.ranges:
+                encoded[:, part.start] = self.column_numeric(dataset, name)
+            else:
+                codes = self.column_codes(dataset, name).astype(np.intp)
+                rows = np.flatnonzero(codes >= 0)
+                encoded[rows, part.start + codes[rows]] = 1.0
+        return encoded
+
@@ -0,0 +1,634 @@
+"""TargetedMIAに基づくプライバシー評価の実行と結果の保存"""
+import hashlib
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from core.aia import AttributeInferenceAttack, aia_metrics
+from core.adaptive import DEFAULT_ADAPTIVE, confidence_interval, has_converged
+from core.attacks import GROUNDHOG_TYPES, MIA_TYPES, make_attack
+from core.classifiers import benchmark_classifiers
+from core.checkpoint import Checkpoint, checkpoint_for
+from core.datasets import create_file, create_json, dataset_path, dataset_version, read_json, temporary_path
+from core.generators import sample_synthetic
+from core.metrics import binary_metrics
+from core.sampling import open_base_table, sample_training_indices, split_records
+
+RESULTS_DIR = Path("data/results")
+
+DEFAULT_PARAMETERS = {
+    "generator": "Raw (コピー)",
+    "generator_params": {},
+    "synthetic_dataset": None,
+    # 元データのバージョン（Noneなら実行時の最新）。結果には実際に使ったバージョンを記録する
+    "dataset_version": None,
+    "attack_type": "Groundhog Attack",
+    "attack_params": {},
+    # 複数攻撃モードで同じShadowデータセットを共有する攻撃の一覧 [{"attack_type", "attack_params"}]
+    "attack_set": None,
+    "auxiliary_split": 0.5,
+    "num_samples": 100,
+    "num_training_records": 1000,
+    "num_synthetic_records": 1000,
+    "evaluation_runs": 1,
+    "target_record_idx": None,
+    "adaptive": None,
+    "seed": None,
+}
+
+
+def generator_from_metadata(metadata):
+    # 合成データのメタデータから生成手法とパラメータを復元
+    method = metadata.get("generation_method", "Raw (コピー)")
+    params = {
+        key: value for key, value in metadata.get("generation_params", {}).items()
+        if key not in ("method", "seed") and value is not None
+    }
+    return method, params
+
+
+def normalize_parameters(params):
+    params = {**DEFAULT_PARAMETERS, **params}
+    if params["adaptive"]:
+        params["adaptive"] = {**DEFAULT_ADAPTIVE, **params["adaptive"]}
+        # 属性推論攻撃には停止条件が無いので、適応モードを受け付けない（固定のサンプル数で評価したのに
+        # 結果に適応モードの設定が記録されないようにする）
+        if params["attack_type"] not in MIA_TYPES and not params["attack_set"]:
+            raise ValueError("適応的な評価サンプル数はメンバーシップ推論攻撃でのみ使えます。")
+    if params["attack_set"]:
+        params["attack_set"] = [
+            {"attack_type": attack["attack_type"], "attack_params": attack.get("attack_params") or {}}
+            for attack in params["attack_set"]
+        ]
+        if any(attack["attack_type"] not in MIA_TYPES for attack in params["attack_set"]):
+            raise ValueError("複数攻撃モードで実行できるのはメンバーシップ推論攻撃だけです。")
+        params["attack_type"] = " + ".join(attack["attack_type"] for attack in params["attack_set"])
+    return params
+
+
+def attack_list(params):
+    # 評価する (攻撃種別, 攻撃パラメータ) の一覧（単一攻撃なら1件）
+    if params["attack_set"]:
+        return [(attack["attack_type"], attack["attack_params"]) for attack in params["attack_set"]]
+    return [(params["attack_type"], params["attack_params"])]
+
+
+def config_key(params, dataset_key):
+    # シードを含む全パラメータと元データの内容から決まるキー（同じキーの結果はビット単位で再現される）
+    # データセット名は含めないので、同じ内容を別名で保存したデータセットの結果も再利用できる
+    # 単一攻撃では attack_set を含めず、複数攻撃モードを追加する前の結果と同じキーにする
+    params = {
+        key: value for key, value in normalize_parameters(params).items()
+        if key not in ("dataset", "synthetic_dataset", "dataset_version")
+        and not (key == "attack_set" and value is None)
+    }
+    payload = json.dumps([params, dataset_key], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()[:16]
+
+
+def _legacy_config_key(params, dataset_key):
+    # データセット名を含めていた頃の config_key（バージョンと複数攻撃モードを追加する前の形式）
+    params = {
+        key: value for key, value in normalize_parameters(params).items()
+        if key != "dataset_version" and not (key == "attack_set" and value is None)
+    }
+    payload = json.dumps([params, dataset_key], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()[:16]
+
+
+def result_keys(params):
+    """保存済みの結果と照合する config_key の集合（古い形式で保存された結果のキーも含める）"""
+    params = normalize_parameters(params)
+    table, _ = open_base_table(params["dataset"], version=params["dataset_version"])
+    keys = {config_key(params, table.key)}
+    if not params["attack_set"]:
+        keys.add(_legacy_config_key(params, table.key))
+    return keys
+
+
+def generate_pair(base, pool, target_idx, num_training, params, seed):
+    # generate_pairs=True, replace_target=True 相当：ターゲットの有無だけが異なるペアを生成
+    rng = np.random.default_rng(seed)
+    members = sample_training_indices(pool, num_training, rng)
+    with_target = members.copy()
+    with_target[0] = target_idx
+    datasets = [
+        sample_synthetic(
+            base.get_records(rows),
+            params["generator"],
+            params["generator_params"],
+            params["num_synthetic_records"],
+            rng,
+        )
+        for rows in (members, with_target)
+    ]
+    return datasets, [0, 1]
+
+
+def generate_samples(base, pool, target_idx, num_training, params, pair_seeds):
+    datasets, labels = [], []
+    for seed in pair_seeds:
+        pair_datasets, pair_labels = generate_pair(base, pool, target_idx, num_training, params, seed)
+        datasets += pair_datasets
+        labels += pair_labels
+    return datasets, labels
+
+
+def _batches(items, start, size):
+    for begin in range(start, len(items), size):
+        yield items[begin:begin + size]
+
+
+def _map_attacks(fn, *iterables):
+    # 攻撃ごとの特徴量抽出・学習・採点をスレッドで並列に実行する（1つだけならそのまま呼ぶ）
+    items = list(zip(*iterables))
+    if len(items) == 1:
+        return [fn(*items[0])]
+    with ThreadPoolExecutor(max_workers=len(items)) as executor:
+        return list(executor.map(lambda item: fn(*item), items))
+
+
+def _split_for_target(base, params, split_seed):
+    rng = np.random.default_rng(split_seed)
+    n = len(base)
+    target_idx = params["target_record_idx"]
+    if target_idx is None:
+        target_idx = int(rng.integers(n))
+    if not 0 <= target_idx < n:
+        raise ValueError(f"ターゲットレコードのインデックスが範囲外です: {target_idx}")
+
+    # ターゲット以外のレコードを補助データと評価用データに分割
+    auxiliary, held_out = split_records(n, [target_idx], params["auxiliary_split"], rng)
+    num_training = min(params["num_training_records"], len(auxiliary), len(held_out))
+    if num_training < 2:
+        raise ValueError("補助データまたは評価用データが不足しています。補助データの割合を調整してください。")
+    return target_idx, auxiliary, held_out, num_training
+
+
+def run_targeted_mia(base, encoder, params, seed_sequence, checkpoint, n_jobs=None):
+    # 分割・攻撃・各ペアの乱数を個別に派生させ、途中から再開しても同じ結果になるようにする
+    # 適応モードでは評価サンプル数の上限まで、バッチごとに停止条件を確認しながら評価する
+    # 複数攻撃モードではShadow・評価用の合成データを1度だけ生成して全ての攻撃で共有し、
+    # 各攻撃の結果は同じシードで単独に実行した場合と一致する。攻撃ごとに (ラベル, スコア, 閾値, 所要時間) を返す
+    adaptive = params["adaptive"]
+    num_test_samples = adaptive["max_samples"] if adaptive else params["num_samples"]
+    test_batch_pairs = max(adaptive["batch_size"] // 2, 1) if adaptive else checkpoint.every
+
+    split_seed, attack_seed, train_seed, test_seed = seed_sequence.spawn(4)
+    train_pair_seeds = train_seed.spawn((params["num_samples"] + 1) // 2)
+    test_pair_seeds = test_seed.spawn((num_test_samples + 1) // 2)
+    target_idx, auxiliary, held_out, num_training = _split_for_target(base, params, split_seed)
+
+    # 1. 攻撃者は補助データからShadowデータセットを生成する
+    datasets, labels = checkpoint.load("train_samples", ([], []))
+    for seeds in _batches(train_pair_seeds, len(datasets) // 2, checkpoint.every):
+        batch_datasets, batch_labels = generate_samples(base, auxiliary, target_idx, num_training, params, seeds)
+        datasets += batch_datasets
+        labels += batch_labels
+        checkpoint.save("train_samples", (datasets, labels))
+    datasets, labels = datasets[:params["num_samples"]], np.array(labels[:params["num_samples"]])
+
+    attacks = attack_list(params)
+    attack_checkpoints = (
+        [checkpoint] if len(attacks) == 1 else [checkpoint.child(f"attack{i}") for i in range(1, len(attacks) + 1)]
+    )
+    random_state = int(np.random.default_rng(attack_seed).integers(2**31))
+
+    def train(attack_type, attack_params, attack_checkpoint):
+        # 2. Shadowデータセットから特徴量を抽出する
+        attack = attack_checkpoint.load("attack")
+        if attack is None:
+            attack = make_attack(
+                attack_type, encoder, base.get_records([target_idx]), attack_params, random_state=random_state,
+            )
+        if hasattr(attack, "n_jobs"):
+            # チェックポイントから復元した攻撃も、今回の実行のコア数で学習する
+            attack.n_jobs = n_jobs
+        features = attack_checkpoint.load("train_features")
+        if features is None:
+            features = attack.features(datasets)
+            attack_checkpoint.save("train_features", features)
+
+        # 3. 攻撃を学習する（途中まで学習済みの分類器があればその続きから）
+        started = time.perf_counter()
+        attack.fit_features(
+            features, labels,
+            step=checkpoint.every if checkpoint.enabled else None,
+            on_progress=lambda partial: attack_checkpoint.save("attack", partial),
+        )
+        attack_checkpoint.save("attack", attack)
+        return attack, time.perf_counter() - started
+
+    trained, train_seconds = zip(*_map_attacks(train, *zip(*attacks), attack_checkpoints))
+    score_seconds = [0.0] * len(attacks)
+
+    def score(attack, datasets):
+        started = time.perf_counter()
+        attack_scores = attack.score_features(attack.features(datasets))
+        return attack_scores, time.perf_counter() - started
+
+    # 4. 攻撃者が知らないデータから生成した合成データで評価する
+    # （適応モードでは停止条件を満たした攻撃から採点をやめ、全ての攻撃が止まるまで生成を続ける）
+    progress = checkpoint.load("test_scores")
+    if progress is None:
+        progress = {"labels": [], "scores": [[] for _ in attacks], "stopped": [None] * len(attacks)}
+    test_labels, scores, stopped = progress["labels"], progress["scores"], progress["stopped"]
+    for seeds in _batches(test_pair_seeds, len(test_labels) // 2, test_batch_pairs):
+        if adaptive:
+            for i, attack in enumerate(trained):
+                if stopped[i] is None and has_converged(
+                    adaptive, test_labels, scores[i], np.array(scores[i]) >= attack.threshold
+                ):
+                    stopped[i] = len(test_labels)
+            if all(stop is not None for stop in stopped):
+                break
+        batch_datasets, batch_labels = generate_samples(base, held_out, target_idx, num_training, params, seeds)
+        test_labels += batch_labels
+        active = [i for i, stop in enumerate(stopped) if stop is None]
+        batch_scores = _map_attacks(score, [trained[i] for i in active], [batch_datasets] * len(active))
+        for i, (attack_scores, seconds) in zip(active, batch_scores):
+            scores[i] += attack_scores.tolist()
+            score_seconds[i] += seconds
+        checkpoint.save("test_scores", progress)
+
+    # 所要時間はこの実行で学習・採点した分だけ（チェックポイントから再開した分は含まない）
+    outcomes = []
+    for i, (attack, attack_scores, stop) in enumerate(zip(trained, scores, stopped)):
+        end = min(stop if stop is not None else len(test_labels), num_test_samples)
+        timing = {"train_seconds": train_seconds[i], "score_seconds": score_seconds[i]}
+        outcomes.append((np.array(test_labels[:end]), np.array(attack_scores[:end]), float(attack.threshold), timing))
+    return outcomes
+
+
+def run_targeted_aia(base, encoder, params, seed_sequence, checkpoint):
+    attack = AttributeInferenceAttack(encoder, params["attack_params"].get("target_attribute"))
+    split_seed, sample_seed = seed_sequence.spawn(2)
+    rng = np.random.default_rng(split_seed)
+    n = len(base)
+
+    # ターゲットを選び、残りを補助データと訓練データ用のプールに分割
+    if params["target_record_idx"] is not None:
+        targets = np.array([params["target_record_idx"]])
+    else:
+        num_targets = min(params["attack_params"].get("num_targets", 100), n // 2)
+        targets = rng.choice(n, size=num_targets, replace=False)
+    _, held_out = split_records(n, targets, params["auxiliary_split"], rng)
+    num_training = min(params["num_training_records"], len(held_out) + len(targets))
+    if num_training <= len(targets):
+        raise ValueError("訓練データ数がターゲット数より少なくなっています。訓練データ数を増やしてください。")
+
+    # ターゲットを必ず含む訓練データから合成データを生成し、全ターゲットの属性を一括で推定する
+    target_records = base.get_records(targets)
+    probabilities = checkpoint.load("aia_probabilities", [])
+    sample_seeds = sample_seed.spawn(params["num_samples"])
+    for seeds in _batches(sample_seeds, len(probabilities), checkpoint.every):
+        for seed in seeds:
+            sample_rng = np.random.default_rng(seed)
+            members = sample_training_indices(held_out, num_training, sample_rng, include=targets)
+            synthetic = sample_synthetic(
+                base.get_records(members),
+                params["generator"],
+                params["generator_params"],
+                params["num_synthetic_records"],
+                sample_rng,
+            )
+            probabilities.append(attack.predict_proba(synthetic, target_records))
+        checkpoint.save("aia_probabilities", probabilities)
+
+    # 真の値が記述ファイルのカテゴリに含まれるターゲットのみで評価する
+    true_codes = attack.true_codes(target_records)
+    known = true_codes >= 0
+    stacked = np.stack(probabilities)[:, known]
+    correct = stacked.argmax(axis=2) == true_codes[known]
+    run_metrics = aia_metrics(
+        np.tile(true_codes[known], len(probabilities)),
+        stacked.reshape(-1, len(attack.values)),
+        len(attack.values),
+    )
+    run_metrics["num_samples_used"] = len(probabilities)
+    run_metrics["per_target"] = [
+        {
+            "record_idx": int(record_idx),
+            "true_value": attack.values[code],
+            "accuracy": float(accuracy),
+        }
+        for record_idx, code, accuracy in zip(targets[known], true_codes[known], correct.mean(axis=0))
+    ]
+    return run_metrics
+
+
+def run_evaluation(params, checkpoint=None, n_jobs=None):
+    params = normalize_parameters(params)
+    dataset = params["dataset"]
+    attack_type = params["attack_type"]
+    checkpoint = checkpoint or Checkpoint()
+
+    # 元データはメモリマップした列指向テーブルとして共有し、各データセットはその上のビューとして扱う
+    # （バージョン未指定なら開始時点の最新に固定し、途中で追記されても同じデータで評価する）
+    if params["dataset_version"] is None:
+        params["dataset_version"] = dataset_version(dataset)
+    table, encoder = open_base_table(dataset, version=params["dataset_version"])
+    base = table.view()
+
+    # シード未指定の場合も、再開時に同じ乱数系列を使えるよう保存しておく
+    seed = checkpoint.load("seed")
+    if seed is None:
+        seed = params["seed"] if params["seed"] is not None else np.random.SeedSequence().entropy
+        checkpoint.save("seed", seed)
+    params["seed"] = seed
+
+    # 評価回ごとに独立した乱数系列を使い、完了した回はチェックポイントから復元する
+    # 各実行の結果は攻撃ごとの (指標, サンプル, 所要時間) の一覧（複数攻撃モード以外は1件）
+    attack_types = [name for name, _ in attack_list(params)]
+    grouped = params["attack_set"] is not None
+    results, per_target, samples, timings = [], [], [], []
+    run_seeds = np.random.SeedSequence(seed).spawn(params["evaluation_runs"])
+    for run, run_seed in enumerate(run_seeds, start=1):
+        run_checkpoint = checkpoint.child(f"run{run}")
+        run_outcomes = run_checkpoint.load("outcomes")
+        if run_outcomes is None:
+            if attack_type == "Attribute Inference Attack (AIA)":
+                run_outcomes = [(run_targeted_aia(base, encoder, params, run_seed, run_checkpoint), None, None)]
+            else:
+                run_outcomes = []
+                mia_outcomes = run_targeted_mia(base, encoder, params, run_seed, run_checkpoint, n_jobs)
+                for labels, scores, threshold, timing in mia_outcomes:
+                    predictions = (scores >= threshold).astype(int)
+                    run_metrics = binary_metrics(labels, scores, predictions)
+                    run_metrics["num_samples_used"] = len(labels)
+                    if params["adaptive"] and len(np.unique(labels)) > 1:
+                        _, low, high = confidence_interval(params["adaptive"], labels, scores, predictions)
+                        run_metrics["ci_width"] = float(high - low)
+                    # Reportsページで指標の信頼区間やROC曲線を計算し直せるよう、サンプルごとのスコアも残す
+                    run_samples = {"labels": labels.astype(np.int8), "scores": scores, "threshold": threshold}
+                    run_outcomes.append((run_metrics, run_samples, timing))
+            run_checkpoint.save("outcomes", run_outcomes)
+
+        for name, (run_metrics, run_samples, timing) in zip(attack_types, run_outcomes):
+            if run_samples is not None:
+                samples.append({"run": run, **({"attack_type": name} if grouped else {}), **run_samples})
+            # 所要時間は実行ごとに変わるので、再現性を確認する results とは分けて残す
+            if timing is not None:
+                timings.append({"run": run, "attack_type": name, **timing})
+
+            # ターゲットごとの結果は実行単位の集計とは分けて保存する
+            run_metrics = dict(run_metrics)
+            for entry in run_metrics.pop("per_target", []):
+                per_target.append({"run": run, **entry})
+            results.append({
+                "run": run,
+                "attack_type": name,
+                "dataset": dataset,
+                **run_metrics,
+            })
+
+    timestamp = pd.Timestamp.now()
+    # 全実行のサンプルをまとめた指標はJSONに入れておき、一覧や比較ではサンプルを読まずに済ませる
+    # （複数攻撃モードでは攻撃ごとにまとめる）
+    summary = None
+    if samples and grouped:
+        summary = {
+            name: binary_metrics(*pooled_samples({"samples": [s for s in samples if s["attack_type"] == name]}))
+            for name in attack_types
+        }
+    elif samples:
+        summary = binary_metrics(*pooled_samples({"samples": samples}))
+    label = "Multi_Attack" if grouped else attack_type.replace(' ', '_')
+    return {
+        "id": f"{dataset}_{label}_{timestamp.strftime('%Y%m%d_%H%M%S')}",
+        "dataset": dataset,
+        "attack_type": attack_type,
+        **({"attacks": attack_types} if grouped else {}),
+        "parameters": {
+            "data_type": params["generator"],
+            "generator_params": params["generator_params"],
+            "synthetic_dataset": params["synthetic_dataset"],
+            "attack_params": params["attack_params"],
+            **({"attack_set": params["attack_set"]} if grouped else {}),
+            "auxiliary_split": params["auxiliary_split"],
+            "num_synthetic_records": params["num_synthetic_records"],
+            "num_training_records": params["num_training_records"],
+            "num_samples": params["num_samples"],
+            "target_record_idx": params["target_record_idx"],
+            "evaluation_runs": params["evaluation_runs"],
+            "adaptive": params["adaptive"],
+            "seed": seed,
+            "dataset_version": params["dataset_version"],
+            "dataset_key": table.key,
+            "config_key": config_key(params, table.key),
+        },
+        "results": results,
+        **({"per_target": per_target} if per_target else {}),
+        **({"timings": timings} if timings else {}),
+        **({"summary": summary, "samples": samples} if samples else {}),
+        "timestamp": timestamp.isoformat(),
+    }
+
+
+def compare_classifiers(params, classifiers=None, n_jobs=None):
+    """1回目の評価と同じShadow・評価用データセットのGroundhog特徴量で、分類器ごとの学習時間と攻撃性能を比べる"""
+    params = normalize_parameters(params)
+    if params["dataset_version"] is None:
+        params["dataset_version"] = dataset_version(params["dataset"])
+    table, encoder = open_base_table(params["dataset"], version=params["dataset_version"])
+    base = table.view()
+    # 比較対象の評価と同じデータセットにするため、評価で実際に使ったシードが必要
+    if params["seed"] is None:
+        raise ValueError("分類器の比較には評価で使ったシードを指定してください。")
+    seed = params["seed"]
+
+    # run_targeted_mia と同じ乱数の派生で、1回目の評価と同じデータセットを生成する
+    # （適応モードでも評価サンプル数は固定の num_samples を使う）
+    run_seed = np.random.SeedSequence(seed).spawn(params["evaluation_runs"])[0]
+    split_seed, attack_seed, train_seed, test_seed = run_seed.spawn(4)
+    target_idx, auxiliary, held_out, num_training = _split_for_target(base, params, split_seed)
+    num_pairs = (params["num_samples"] + 1) // 2
+    train_datasets, train_labels = generate_samples(
+        base, auxiliary, target_idx, num_training, params, train_seed.spawn(num_pairs)
+    )
+    test_datasets, test_labels = generate_samples(
+        base, held_out, target_idx, num_training, params, test_seed.spawn(num_pairs)
+    )
+
+    # Groundhog攻撃の特徴量は分類器によらないので1度だけ抽出する
+    attack_params = next(
+        (attack_params for attack_type, attack_params in attack_list(params) if attack_type in GROUNDHOG_TYPES),
+        params["attack_params"],
+    )
+    attack = make_attack("Groundhog Attack", encoder, base.get_records([target_idx]), attack_params)
+    return benchmark_classifiers(
+        attack.features(train_datasets[:params["num_samples"]]), train_labels[:params["num_samples"]],
+        attack.features(test_datasets[:params["num_samples"]]), test_labels[:params["num_samples"]],
+        names=classifiers,
+        random_state=int(np.random.default_rng(attack_seed).integers(2**31)),
+        n_jobs=n_jobs,
+    )
+
+
+def params_from_result(result):
+    # 保存済みの結果から、同じ評価を再実行するためのパラメータを復元する
+    recorded = result["parameters"]
+    params = {key: recorded[key] for key in DEFAULT_PARAMETERS if key in recorded}
+    params.update({
+        "dataset": result["dataset"],
+        "attack_type": result["attack_type"],
+        "generator": recorded["data_type"],
+    })
+    return params
+
+
+def find_result(params, results_dir=RESULTS_DIR):
+    # シードを固定した評価と同じ設定の保存済み結果を探す（シード未指定の評価は再利用しない）
+    params = normalize_parameters(params)
+    if params["seed"] is None or not Path(results_dir).exists():
+        return None
+    keys = result_keys(params)
+    for _, result in load_results(results_dir):
+        if result.get("parameters", {}).get("config_key") in keys:
+            return result
+    return None
+
+
+def saved_config_keys(results_dir=RESULTS_DIR):
+    # 保存済みの結果の config_key の集合（多数のジョブを照合するときは結果を1度だけ読み込む）
+    return {result.get("parameters", {}).get("config_key") for _, result in load_results(results_dir)} - {None}
+
+
+def replay_result(result):
+    # 記録されたシードで評価をやり直し、各実行の指標が完全に一致するかを返す
+    # 指標を追加する前に保存された結果とは、記録されている指標だけを比べる
+    replayed = run_evaluation(params_from_result(result))
+    recorded = [
+        {key: run[key] for key in expected if key in run}
+        for run, expected in zip(replayed["results"], result["results"])
+    ]
+    return replayed, len(replayed["results"]) == len(result["results"]) and recorded == result["results"]
+
+
+def pooled_samples(result, results_dir=RESULTS_DIR):
+    # 全実行のサンプルを連結した (ラベル, スコア, 判定) の配列（サンプルを残していない結果はNone）
+    samples = load_samples(result, results_dir)
+    if not samples:
+        return None
+    labels = np.concatenate([np.asarray(run["labels"], dtype=int) for run in samples])
+    scores = np.concatenate([np.asarray(run["scores"], dtype=float) for run in samples])
+    predictions = np.concatenate([
+        (np.asarray(run["scores"], dtype=float) >= run["threshold"]).astype(int) for run in samples
+    ])
+    return labels, scores, predictions
+
+
+def evaluation_checkpoint(params, every=10):
+    params = normalize_parameters(params)
+    if params["dataset_version"] is None:
+        params["dataset_version"] = dataset_version(params["dataset"])
+    return checkpoint_for(params, dataset_path(params["dataset"]), every=every)
+
+
+def load_results(results_dir=RESULTS_DIR):
+    # 保存済みの結果を1度だけ読み込んだ (パス, 結果) のリスト（走査中に削除されたファイルは除く）
+    results = []
+    for path in sorted(Path(results_dir).glob("*.json")) if Path(results_dir).exists() else []:
+        result = read_json(path)
+        if result is not None:
+            results.append((path, result))
+    return results
+
+
+def load_samples(result, results_dir=RESULTS_DIR):
+    # 実行ごとのサンプル [{run, labels, scores, threshold}]。保存済みの結果ではここで初めてnpzを読む
+    # （attack_view で取り出した攻撃ごとの結果では、その攻撃のサンプルだけを返す）
+    if "samples" in result:
+        samples = result["samples"]
+    elif "samples_file" in result and (Path(results_dir) / result["samples_file"]).exists():
+        with np.load(Path(results_dir) / result["samples_file"]) as arrays:
+            bounds = np.r_[0, np.cumsum(arrays["counts"])]
+            attack_types = arrays["attack_types"] if "attack_types" in arrays else [None] * len(arrays["runs"])
+            samples = [
+                {
+                    "run": int(run),
+                    **({"attack_type": str(attack_type)} if attack_type is not None else {}),
+                    "labels": arrays["labels"][begin:end],
+                    "scores": arrays["scores"][begin:end],
+                    "threshold": float(threshold),
+                }
+                for run, attack_type, threshold, begin, end in zip(
+                    arrays["runs"], attack_types, arrays["thresholds"], bounds[:-1], bounds[1:]
+                )
+            ]
+    else:
+        return None
+    if result.get("attack_type") in result.get("attacks", []):
+        samples = [run for run in samples if run["attack_type"] == result["attack_type"]]
+    return samples
+
+
+def attack_views(result):
+    # 複数攻撃モードの結果を、攻撃ごとの単一攻撃と同じ形の結果に分ける（それ以外はそのまま1件）
+    if "attacks" not in result:
+        return [result]
+    views = []
+    for attack_type in result["attacks"]:
+        view = {
+            **result,
+            "attack_type": attack_type,
+            "results": [entry for entry in result["results"] if entry["attack_type"] == attack_type],
+        }
+        if "summary" in result:
+            view["summary"] = result["summary"][attack_type]
+        if "timings" in result:
+            view["timings"] = [entry for entry in result["timings"] if entry["attack_type"] == attack_type]
+        views.append(view)
+    return views
+
+
+def _write_samples(samples, file):
+    # 全実行のサンプルを連結した配列と、実行ごとの件数・しきい値を1つのnpzにまとめる
+    np.savez_compressed(
+        file,
+        runs=np.array([run["run"] for run in samples]),
+        **({"attack_types": np.array([run["attack_type"] for run in samples])} if "attack_type" in samples[0] else {}),
+        thresholds=np.array([run["threshold"] for run in samples], dtype=float),
+        counts=np.array([len(run["labels"]) for run in samples]),
+        labels=np.concatenate([np.asarray(run["labels"], dtype=np.int8) for run in samples]),
+        scores=np.concatenate([np.asarray(run["scores"], dtype=float) for run in samples]),
+    )
+
+
+def save_result(result, results_dir=RESULTS_DIR):
+    # 同じ秒に保存された結果と衝突しないようにIDへ連番を付ける
+    # （他のジョブが同時に同じ名前で保存しても上書きせず、次の番号で保存し直す）
+    # サンプルごとのスコアは隣のnpzに分けて保存し、JSONは一覧表示に必要な要約だけにする
+    # （npzを先に同じ名前で確保し、JSONが見えた時点で必ずnpzも揃っているようにする）
+    samples = result.get("samples")
+    summary = {key: value for key, value in result.items() if key != "samples"}
+    tmp_path = None
+    if samples:
+        tmp_path = temporary_path(Path(results_dir) / f"{result['id']}.npz")
+        tmp_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(tmp_path, "wb") as f:
+            _write_samples(samples, f)
+
+    base_id = result["id"]
+    suffix = 0
+    try:
+        while True:
+            path = Path(results_dir) / (f"{base_id}_{suffix}.json" if suffix else f"{base_id}.json")
+            suffix += 1
+            result["id"] = summary["id"] = path.stem
+            samples_path = path.with_suffix(".npz")
+            if tmp_path is not None:
+                if not create_file(tmp_path, samples_path):
+                    continue
+                summary["samples_file"] = samples_path.name
+            if create_json(path, summary):
+                return path
+            if tmp_path is not None:
+                samples_path.unlink()
+    finally:
+        if tmp_path is not None:
+            tmp_path.unlink(missing_ok=True)
@@ -0,0 +1,71 @@
+"""Groundhog攻撃用の集合特徴量（Naive・Histogram・Correlation）のバッチ抽出"""
+import numpy as np
+import pandas as pd
+
+from core.columnar import concat_datasets
+
+
+class SetFeatureExtractor:
+    """複数の合成データセットをまとめてエンコードし、特徴量行列を一括で計算する"""
+
+    def __init__(self, encoder, use_naive=True, use_hist=True, use_corr=True, num_bins=10, chunk_size=32):
+        if not (use_naive or use_hist or use_corr):
+            raise ValueError("Groundhog攻撃には少なくとも1種類の特徴量が必要です。")
+        self.encoder = encoder
+        self.use_naive = use_naive
+        self.use_hist = use_hist
+        self.use_corr = use_corr
+        self.num_bins = num_bins
+        self.chunk_size = chunk_size
+        self.numeric_columns = np.array(encoder.numeric_columns, dtype=int)
+        self.upper = np.triu_indices(encoder.dim, k=1)
+
+    def encode_batch(self, datasets):
+        # 同じ長さのデータセットは連結して1回でエンコードし、(データセット数, レコード数, 次元) に整形
+        lengths = {len(dataset) for dataset in datasets}
+        if len(lengths) == 1:
+            if isinstance(datasets[0], pd.DataFrame):
+                combined = pd.concat(datasets, ignore_index=True)
+            else:
+                combined = concat_datasets(datasets)
+            encoded = self.encoder.encode(combined)
+            return [encoded.reshape(len(datasets), lengths.pop(), self.encoder.dim)]
+        return [self.encoder.encode(dataset)[np.newaxis] for dataset in datasets]
+
+    def naive(self, batch):
+        return [batch.mean(axis=1), np.median(batch, axis=1), batch.var(axis=1)]
+
+    def hist(self, batch):
+        # 数値列の[0, 1]区間ヒストグラム（範囲外の値は数えない）
+        num_datasets, num_records, _ = batch.shape
+        values = batch[:, :, self.numeric_columns]
+        in_range = (values >= 0) & (values <= 1)
+        bins = np.clip(np.floor(values * self.num_bins), 0, self.num_bins - 1).astype(int)
+        offsets = np.arange(num_datasets * len(self.numeric_columns)).reshape(num_datasets, 1, -1) * self.num_bins
+        counts = np.bincount(
+            (bins + offsets)[in_range],
+            minlength=num_datasets * len(self.numeric_columns) * self.num_bins,
+        )
+        return [counts.reshape(num_datasets, -1) / num_records]
+
+    def corr(self, batch):
+        centered = batch - batch.mean(axis=1, keepdims=True)
+        cov = np.einsum("bni,bnj->bij", centered, centered)
+        std = np.sqrt(np.einsum("bii->bi", cov))
+        with np.errstate(invalid="ignore", divide="ignore"):
+            corr = cov / (std[:, :, np.newaxis] * std[:, np.newaxis, :])
+        return [np.nan_to_num(corr[:, self.upper[0], self.upper[1]])]
+
+    def extract(self, datasets):
+        features = []
+        for start in range(0, len(datasets), self.chunk_size):
+            for batch in self.encode_batch(datasets[start:start + self.chunk_size]):
+                parts = []
+                if self.use_naive:
+                    parts += self.naive(batch)
+                if self.use_hist:
+                    parts += self.hist(batch)
+                if self.use_corr:
+                    parts += self.corr(batch)
+                features.append(np.concatenate(parts, axis=1))
+        return np.concatenate(features)
@@ -0,0 +1,90 @@
+"""オリジナルデータと合成データの分布の近さ（忠実度）の評価
+
+どちらのデータも core.stats の統計量（分位点スケッチ・カテゴリ頻度・偏差積和）だけから比較するので、
+CSVを読み直す必要はなく、統計量は1回の走査で作ったものをそのまま使える。
+"""
+import numpy as np
+import pandas as pd
+
+from core.stats import column_cdf, column_quantiles, correlation_matrix, dataset_stats
+
+# 数値列のTVDを求めるときのビン数（オリジナルデータの分位点で区切る）
+NUM_BINS = 20
+# 列ごとに表示するカテゴリ頻度の数
+TOP_CATEGORIES = 20
+
+
+def _frequencies(column):
+    counts = pd.Series(column.get("categories", {}), dtype=float)
+    if column.get("other"):
+        counts["(その他)"] = column["other"]
+    total = counts.sum()
+    return counts / total if total > 0 else counts
+
+
+def _numeric_distances(original, synthetic, num_bins=NUM_BINS):
+    # KS統計量は両方のスケッチのセントロイド位置での経験分布関数の差の最大値
+    grid = np.union1d(
+        np.asarray(original["numeric"]["sketch"])[:, 0],
+        np.asarray(synthetic["numeric"]["sketch"])[:, 0],
+    )
+    ks = float(np.abs(column_cdf(original, grid) - column_cdf(synthetic, grid)).max())
+
+    # TVDはオリジナルデータの分位点で区切ったビンの確率の差
+    edges = np.unique(column_quantiles(original, np.linspace(0, 1, num_bins + 1)[1:-1]))
+    p = np.diff(np.concatenate([[0.0], column_cdf(original, edges), [1.0]]))
+    q = np.diff(np.concatenate([[0.0], column_cdf(synthetic, edges), [1.0]]))
+    return ks, float(np.abs(p - q).sum() / 2)
+
+
+def fidelity_report(original_stats, synthetic_stats, top_categories=TOP_CATEGORIES):
+    columns = []
+    categories = {}
+    for name, original in original_stats["columns"].items():
+        synthetic = synthetic_stats["columns"].get(name)
+        if synthetic is None:
+            continue
+        entry = {"column": name, "ks": None, "tvd": None}
+        if "numeric" in original and "numeric" in synthetic:
+            entry["type"] = "numeric"
+            if original["count"] > 0 and synthetic["count"] > 0:
+                entry["ks"], entry["tvd"] = _numeric_distances(original, synthetic)
+        else:
+            entry["type"] = "categorical"
+            p, q = _frequencies(original), _frequencies(synthetic)
+            p, q = p.align(q, fill_value=0.0)
+            entry["tvd"] = float((p - q).abs().sum() / 2)
+            top = p.sort_values(ascending=False).index[:top_categories]
+            categories[name] = [
+                {"value": value, "original": float(p[value]), "synthetic": float(q[value])} for value in top
+            ]
+        columns.append(entry)
+
+    # 両方にある数値列だけで相関行列を比べる
+    original_corr = correlation_matrix(original_stats)
+    synthetic_corr = correlation_matrix(synthetic_stats)
+    shared = [col for col in original_corr.columns if col in synthetic_corr.columns]
+    difference = (original_corr.loc[shared, shared] - synthetic_corr.loc[shared, shared]).abs()
+    upper = difference.to_numpy()[np.triu_indices(len(shared), k=1)]
+    upper = upper[~np.isnan(upper)]
+
+    ks_values = [c["ks"] for c in columns if c["ks"] is not None]
+    tvd_values = [c["tvd"] for c in columns if c["tvd"] is not None]
+    return {
+        "summary": {
+            "mean_ks": float(np.mean(ks_values)) if ks_values else None,
+            "mean_tvd": float(np.mean(tvd_values)) if tvd_values else None,
+            "mean_correlation_difference": float(upper.mean()) if len(upper) else None,
+            "max_correlation_difference": float(upper.max()) if len(upper) else None,
+        },
+        "columns": columns,
+        "correlation": {
+            "columns": shared,
+            "difference": difference.round(6).to_numpy().tolist(),
+        },
+        "categories": categories,
+    }
+
+
+def compare_datasets(original_name, synthetic_name, **kwargs):
+    return fidelity_report(dataset_stats(original_name, **kwargs), dataset_stats(synthetic_name, **kwargs))
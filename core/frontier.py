@@ -0,0 +1,131 @@
+"""生成パラメータのグリッドに対するプライバシーと有用性のトレードオフ（パレートフロンティア）の評価"""
+from concurrent.futures import as_completed
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from core.datasets import dataset_version, load_dataframe, write_json
+from core.evaluation import RESULTS_DIR, run_evaluation
+from core.fidelity import fidelity_report
+from core.generators import generate_columnar
+from core.sampling import open_base_table
+from core.stats import compute_stats, dataset_stats
+
+# Reportsページの結果一覧（results直下の*.json）と混ざらないようにサブディレクトリに保存する
+FRONTIER_DIR = RESULTS_DIR / "frontiers"
+
+# 生成手法ごとにスイープするパラメータと既定のグリッド
+PARAMETER_GRIDS = {
+    "ノイズ付加": ("noise_level", [0.01, 0.05, 0.1, 0.2, 0.5, 1.0]),
+    "データ置換": ("replacement_rate", [0.01, 0.05, 0.1, 0.2, 0.3, 0.5]),
+    "k-匿名化（簡易版）": ("k_value", [2, 3, 5, 7, 10]),
+    "差分プライバシー（簡易版）": ("epsilon", [0.1, 0.5, 1.0, 2.0, 5.0, 10.0]),
+}
+
+# パレートフロンティアで最小化する指標（プライバシーリスクと分布のずれ）
+RISK_METRIC = "auc"
+FIDELITY_METRIC = "mean_tvd"
+
+
+def frontier_jobs(params, parameter, values):
+    # 全ての点で同じシードを使い、補助データの分割・ターゲット・学習用レコードの選び方を共通にする
+    seed = params.get("seed")
+    if seed is None:
+        seed = int(np.random.SeedSequence().entropy % 2**63)
+    # スイープの途中で追記されても全ての点を同じバージョンで評価する
+    version = params.get("dataset_version") or dataset_version(params["dataset"])
+    return [
+        {
+            **params,
+            "seed": seed,
+            "dataset_version": version,
+            "generator_params": {**params.get("generator_params", {}), parameter: value},
+        }
+        for value in values
+    ]
+
+
+def _match_types(df, stats):
+    # 列指向テーブルでカテゴリとして扱う数値列を、元のCSVと同じ数値型に戻す
+    for name, column in stats["columns"].items():
+        if "numeric" in column and name in df and not pd.api.types.is_numeric_dtype(df[name]):
+            df[name] = pd.to_numeric(df[name].astype(object), errors="coerce")
+    return df
+
+
+def run_frontier_point(job):
+    # 1点分のMIA評価と忠実度評価（ワーカーで実行する）
+    result = run_evaluation(job)
+    results_df = pd.DataFrame(result["results"])
+
+    table, _ = open_base_table(job["dataset"], version=job["dataset_version"])
+    if job["dataset_version"] == dataset_version(job["dataset"]):
+        original_stats = dataset_stats(job["dataset"])
+    else:
+        # 評価中に追記された場合は、固定したバージョンのデータから統計量を作る
+        original_stats = compute_stats(load_dataframe(job["dataset"], version=job["dataset_version"]))
+    rng = np.random.default_rng(np.random.SeedSequence([job["seed"], 1]))
+    synthetic = generate_columnar(table.view(), job["generator"], job["generator_params"], rng)
+    fidelity = fidelity_report(original_stats, compute_stats(_match_types(synthetic.to_dataframe(), original_stats)))
+
+    return {
+        "generator_params": job["generator_params"],
+        "privacy": {
+            metric: float(results_df[metric].mean())
+            for metric in ["accuracy", "precision", "recall", "f1_score", "auc"]
+        },
+        "fidelity": fidelity["summary"],
+    }
+
+
+def pareto_front(points, risk_metric=RISK_METRIC, fidelity_metric=FIDELITY_METRIC):
+    # リスクとずれの両方が小さい方が良い。他の点に支配されない点に印を付ける
+    # （ずれを計算できなかった点は比較に使わず、フロンティアにも含めない）
+    comparable = [point for point in points if point["fidelity"][fidelity_metric] is not None]
+    costs = np.array([
+        [point["privacy"][risk_metric], point["fidelity"][fidelity_metric]] for point in comparable
+    ]).reshape(-1, 2)
+    for point in points:
+        point["pareto"] = False
+    for i, point in enumerate(comparable):
+        dominated = np.all(costs <= costs[i], axis=1) & np.any(costs < costs[i], axis=1)
+        point["pareto"] = not dominated.any()
+    return points
+
+
+def run_frontier(pool, params, parameter, values, on_progress=None):
+    jobs = frontier_jobs(params, parameter, values)
+    pool.publish([(params["dataset"], jobs[0]["dataset_version"])])
+    futures = {pool.submit(run_frontier_point, job): value for job, value in zip(jobs, values)}
+
+    points = []
+    for done, future in enumerate(as_completed(futures), start=1):
+        points.append({"value": futures[future], **future.result()})
+        if on_progress is not None:
+            on_progress(done, len(jobs))
+    points.sort(key=lambda point: point["value"])
+
+    timestamp = pd.Timestamp.now()
+    return {
+        "id": f"{params['dataset']}_{parameter}_{timestamp.strftime('%Y%m%d_%H%M%S')}",
+        "dataset": params["dataset"],
+        "generator": params["generator"],
+        "parameter": parameter,
+        "attack_type": params["attack_type"],
+        "risk_metric": RISK_METRIC,
+        "fidelity_metric": FIDELITY_METRIC,
+        "seed": jobs[0]["seed"],
+        "dataset_version": jobs[0]["dataset_version"],
+        "points": pareto_front(points),
+        "timestamp": timestamp.isoformat(),
+    }
+
+
+def save_frontier(frontier, frontier_dir=FRONTIER_DIR):
+    return write_json(Path(frontier_dir) / f"{frontier['id']}.json", frontier, ensure_ascii=False)
+
+
+def list_frontiers(frontier_dir=FRONTIER_DIR):
+    frontier_dir = Path(frontier_dir)
+    return sorted(frontier_dir.glob("*.json"), reverse=True) if frontier_dir.exists() else []
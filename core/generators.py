@@ -0,0 +1,139 @@
+"""オリジナルデータから合成データを生成する簡易手法"""
+import numpy as np
+import pandas as pd
+
+GENERATION_METHODS = [
+    "Raw (コピー)",
+    "ノイズ付加",
+    "データ置換",
+    "k-匿名化（簡易版）",
+    "差分プライバシー（簡易版）",
+]
+
+
+def generate_synthetic(df, method, params=None, rng=None):
+    params = params or {}
+    if rng is None:
+        rng = np.random.default_rng()
+
+    synthetic_df = df.copy()
+
+    if method == "ノイズ付加":
+        noise_level = params.get("noise_level", 0.1)
+        noise_type = params.get("noise_type", "ガウシアン")
+
+        # 数値列にノイズを追加
+        numeric_cols = df.select_dtypes(include=[np.number]).columns
+        for col in numeric_cols:
+            scale = noise_level * df[col].std()
+            if noise_type == "ガウシアン":
+                noise = rng.normal(0, scale, size=len(df))
+            elif noise_type == "ラプラス":
+                noise = rng.laplace(0, scale, size=len(df))
+            else:  # 一様分布
+                noise = rng.uniform(-scale, scale, size=len(df))
+            synthetic_df[col] = df[col] + noise
+
+    elif method == "データ置換":
+        replacement_rate = params.get("replacement_rate", 0.1)
+
+        # カテゴリカル列の値をランダムに置換
+        categorical_cols = df.select_dtypes(include=['object']).columns
+        for col in categorical_cols:
+            mask = rng.random(len(df)) < replacement_rate
+            unique_values = df[col].unique()
+            synthetic_df.loc[mask, col] = rng.choice(unique_values, mask.sum())
+
+    elif method == "k-匿名化（簡易版）":
+        k_value = params.get("k_value", 5)
+
+        # 準識別子の一般化（簡易版）
+        for col in params.get("quasi_identifiers", []):
+            if df[col].dtype in ['int64', 'float64']:
+                # 数値の場合：範囲に一般化
+                bins = pd.qcut(df[col], q=max(len(df) // k_value, 1), duplicates='drop')
+                synthetic_df[col] = bins
+            else:
+                # カテゴリカルの場合：頻度の低い値を「その他」に
+                value_counts = df[col].value_counts()
+                rare_values = value_counts[value_counts < k_value].index
+                synthetic_df.loc[synthetic_df[col].isin(rare_values), col] = "その他"
+
+    elif method == "差分プライバシー（簡易版）":
+        epsilon = params.get("epsilon", 1.0)
+
+        # 数値列にラプラスノイズを追加
+        numeric_cols = df.select_dtypes(include=[np.number]).columns
+        for col in numeric_cols:
+            sensitivity = df[col].max() - df[col].min()
+            scale = sensitivity / epsilon
+            noise = rng.laplace(0, scale, size=len(df))
+            synthetic_df[col] = df[col] + noise
+
+    return synthetic_df
+
+
+def generate_columnar(dataset, method, params=None, rng=None):
+    # 列指向データセット版の生成手法。書き換えた列だけを新しい配列として持ち、残りは元の行を参照する
+    params = params or {}
+    if rng is None:
+        rng = np.random.default_rng()
+
+    categories = dataset.categories
+    numeric_cols = [col["name"] for col in dataset.columns if col["name"] not in categories]
+    categorical_cols = [col["name"] for col in dataset.columns if col["name"] in categories]
+    overrides = {}
+
+    if method == "ノイズ付加":
+        noise_level = params.get("noise_level", 0.1)
+        noise_type = params.get("noise_type", "ガウシアン")
+        for col in numeric_cols:
+            values = dataset.column(col).astype(float)
+            scale = noise_level * np.nanstd(values, ddof=1)
+            if noise_type == "ガウシアン":
+                noise = rng.normal(0, scale, size=len(dataset))
+            elif noise_type == "ラプラス":
+                noise = rng.laplace(0, scale, size=len(dataset))
+            else:  # 一様分布
+                noise = rng.uniform(-scale, scale, size=len(dataset))
+            overrides[col] = values + noise
+
+    elif method == "データ置換":
+        replacement_rate = params.get("replacement_rate", 0.1)
+        for col in categorical_cols:
+            codes = dataset.column(col).copy()
+            mask = rng.random(len(dataset)) < replacement_rate
+            codes[mask] = rng.choice(np.unique(codes), mask.sum())
+            overrides[col] = codes
+
+    elif method == "k-匿名化（簡易版）":
+        k_value = params.get("k_value", 5)
+        for col in params.get("quasi_identifiers", []):
+            values = dataset.column(col)
+            if col in categories:
+                # 頻度の低い値は記述ファイルにない「その他」（コード-1）にまとめる
+                counts = np.bincount(values[values >= 0], minlength=len(categories[col]))
+                codes = values.copy()
+                codes[(values >= 0) & (counts[np.maximum(values, 0)] < k_value)] = -1
+                overrides[col] = codes
+            else:
+                # 数値は分位区間の中点に一般化
+                bins = pd.qcut(values, q=max(len(dataset) // k_value, 1), duplicates='drop')
+                mids = np.asarray(bins.categories.mid, dtype=float)
+                overrides[col] = np.where(bins.codes >= 0, mids[bins.codes], np.nan)
+
+    elif method == "差分プライバシー（簡易版）":
+        epsilon = params.get("epsilon", 1.0)
+        for col in numeric_cols:
+            values = dataset.column(col).astype(float)
+            scale = (np.nanmax(values) - np.nanmin(values)) / epsilon
+            overrides[col] = values + rng.laplace(0, scale, size=len(dataset))
+
+    return dataset.with_columns(**overrides)
+
+
+def sample_synthetic(dataset, method, params, num_records, rng):
+    # 合成データを生成し、指定されたレコード数だけ取り出す
+    synthetic = generate_columnar(dataset, method, params, rng)
+    replace = num_records > len(synthetic)
+    return synthetic.sample(num_records, rng, replace=replace)
@@ -0,0 +1,133 @@
+"""スコアとラベルの配列から攻撃の評価指標をまとめて計算する
+
+スコアで1度だけ並べ替えた同値グループごとの正例数・負例数から、混同行列の指標・AUC・advantage・
+低FPRでのTPR・ROC曲線を同じ式で求める。ブートストラップでは各リサンプルを「各サンプルが何回
+選ばれたか」の重み行列で表し、複数のリサンプルを行列演算で一括処理する。
+"""
+import numpy as np
+
+# 低FPR領域でのTPRを報告するFPRの水準
+LOW_FPR_LEVELS = (0.001, 0.01)
+
+# 重み行列1つあたりの要素数の上限（ブートストラップのバッチの大きさを決める）
+MAX_BATCH_ELEMENTS = 1 << 22
+
+METRIC_NAMES = ["accuracy", "precision", "recall", "f1_score", "auc", "advantage"] + [
+    f"tpr_at_fpr_{level:g}" for level in LOW_FPR_LEVELS
+]
+
+# 片方のクラスしかない場合など、指標が定義できないときの値
+_UNDEFINED = {"auc": 0.5}
+
+
+def _sorted_groups(labels, scores, predictions):
+    # スコアの降順に並べ、同じスコアのサンプルをまとめるグループの開始位置を求める
+    labels, scores = np.asarray(labels), np.asarray(scores, dtype=float)
+    order = np.argsort(-scores, kind="stable")
+    sorted_scores = scores[order]
+    starts = np.r_[0, np.flatnonzero(np.diff(sorted_scores)) + 1]
+    sorted_predictions = None if predictions is None else np.asarray(predictions)[order]
+    return (labels[order] == 1).astype(float), sorted_predictions, sorted_scores, starts
+
+
+def _divide(numerator, denominator):
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(denominator > 0, numerator / np.where(denominator > 0, denominator, 1), np.nan)
+
+
+def _roc_points(positives, negatives):
+    # 同値グループごとの正例数・負例数（最後の軸）から、原点を含むROC曲線の点を作る
+    num_positives = positives.sum(axis=-1, keepdims=True)
+    num_negatives = negatives.sum(axis=-1, keepdims=True)
+    zero = np.zeros(positives.shape[:-1] + (1,))
+    tpr = _divide(np.concatenate([zero, np.cumsum(positives, axis=-1)], axis=-1), num_positives)
+    fpr = _divide(np.concatenate([zero, np.cumsum(negatives, axis=-1)], axis=-1), num_negatives)
+    return fpr, tpr
+
+
+def _weighted_metrics(weights, positive, predictions, starts):
+    # weights: (リサンプル数, サンプル数) の重み。各行について全指標を配列で返す
+    negative = 1.0 - positive
+    predicted = predictions.astype(float)
+    num_positives, num_negatives = weights @ positive, weights @ negative
+    true_positives = weights @ (positive * predicted)
+    false_positives = weights @ (negative * predicted)
+    total = num_positives + num_negatives
+
+    precision = np.nan_to_num(_divide(true_positives, true_positives + false_positives))
+    recall = np.nan_to_num(_divide(true_positives, num_positives))
+    metrics = {
+        "accuracy": _divide(true_positives + num_negatives - false_positives, total),
+        "precision": precision,
+        "recall": recall,
+        # sklearn と同じく件数から求める（適合率と再現率から求めると末尾の桁が変わる）
+        "f1_score": np.nan_to_num(_divide(2 * true_positives, true_positives + false_positives + num_positives)),
+        "advantage": _divide(true_positives, num_positives) - _divide(false_positives, num_negatives),
+    }
+
+    # AUCは各正例より低いスコアの負例の重み（同値は半分）の合計として求める
+    positives = np.add.reduceat(weights * positive, starts, axis=1)
+    negatives = np.add.reduceat(weights * negative, starts, axis=1)
+    below = num_negatives[:, None] - np.cumsum(negatives, axis=1)
+    metrics["auc"] = _divide((positives * (below + 0.5 * negatives)).sum(axis=1), num_positives * num_negatives)
+
+    fpr, tpr = _roc_points(positives, negatives)
+    for level in LOW_FPR_LEVELS:
+        reachable = np.where(fpr <= level, tpr, -np.inf).max(axis=1)
+        metrics[f"tpr_at_fpr_{level:g}"] = np.where(np.isfinite(reachable), reachable, np.nan)
+    return metrics
+
+
+def binary_metrics(labels, scores, predictions):
+    """全サンプルでの評価指標（accuracy, precision, recall, f1_score, auc, advantage, 低FPRでのTPR）"""
+    positive, sorted_predictions, _, starts = _sorted_groups(labels, scores, predictions)
+    metrics = _weighted_metrics(np.ones((1, len(positive))), positive, sorted_predictions, starts)
+    return {
+        name: float(np.nan_to_num(metrics[name][0], nan=_UNDEFINED.get(name, 0.0)))
+        for name in METRIC_NAMES
+    }
+
+
+def auc_score(labels, scores):
+    """ROC曲線の下の面積（同じスコアは0.5として数える）"""
+    positive, _, _, starts = _sorted_groups(labels, scores, None)
+    positives = np.add.reduceat(positive, starts)
+    negatives = np.add.reduceat(1.0 - positive, starts)
+    below = negatives.sum() - np.cumsum(negatives)
+    return float(_divide((positives * (below + 0.5 * negatives)).sum(), positives.sum() * negatives.sum()))
+
+
+def roc_curve(labels, scores):
+    """ROC曲線の (FPR, TPR, しきい値) の配列。しきい値はスコアの降順で、先頭は全て陰性と判定する点"""
+    positive, _, sorted_scores, starts = _sorted_groups(labels, scores, None)
+    positives = np.add.reduceat(positive, starts)
+    negatives = np.add.reduceat(1.0 - positive, starts)
+    fpr, tpr = _roc_points(positives, negatives)
+    return fpr, tpr, np.r_[np.inf, sorted_scores[starts]]
+
+
+def bootstrap_intervals(labels, scores, predictions, num_resamples=1000, confidence=0.95, seed=0):
+    """各指標のブートストラップ信頼区間 {指標: (下限, 上限)}（パーセンタイル法）"""
+    positive, sorted_predictions, _, starts = _sorted_groups(labels, scores, predictions)
+    n = len(positive)
+    rng = np.random.default_rng(seed)
+    batch_size = max(MAX_BATCH_ELEMENTS // max(n, 1), 1)
+
+    samples = {name: [] for name in METRIC_NAMES}
+    for begin in range(0, num_resamples, batch_size):
+        size = min(batch_size, num_resamples - begin)
+        # 各行に n 個の復元抽出を行い、サンプルごとの選ばれた回数を重みにする
+        draws = rng.integers(n, size=(size, n)) + n * np.arange(size)[:, None]
+        weights = np.bincount(draws.ravel(), minlength=size * n).reshape(size, n).astype(float)
+        for name, values in _weighted_metrics(weights, positive, sorted_predictions, starts).items():
+            samples[name].append(values)
+
+    alpha = (1 - confidence) / 2
+    intervals = {}
+    for name, values in samples.items():
+        values = np.concatenate(values)
+        values = values[~np.isnan(values)]
+        intervals[name] = (
+            tuple(float(q) for q in np.quantile(values, [alpha, 1 - alpha])) if len(values) else (np.nan, np.nan)
+        )
+    return intervals
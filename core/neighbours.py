@@ -0,0 +1,48 @@
+"""Closest Distance攻撃用の合成レコード最近傍インデックス"""
+import numpy as np
+
+
+class RecordIndex:
+    """エンコード済みの合成レコードを保持し、複数ターゲットの最近傍距離をブロック単位で計算する
+
+    距離はカテゴリカル列のHamming距離と、[0, 1]に正規化した数値列のL1またはL2距離の和。
+    """
+
+    def __init__(self, encoder, dataset, metric="l1", block_size=2048):
+        if metric not in ("l1", "l2"):
+            raise ValueError(f"未対応の距離です: {metric}")
+        self.encoder = encoder
+        self.metric = metric
+        self.block_size = block_size
+        self.codes, self.numeric = encoder.split(dataset)
+
+    def __len__(self):
+        return len(self.codes)
+
+    def _block_distances(self, codes, numeric, start, stop):
+        # (ターゲット数, ブロック内レコード数) の距離行列
+        # 未知のカテゴリ（-1）は、同じく未知のカテゴリとも一致しないものとして数える
+        block = self.codes[np.newaxis, start:stop, :]
+        mismatches = (codes[:, np.newaxis, :] != block) | (codes[:, np.newaxis, :] < 0) | (block < 0)
+        distances = mismatches.sum(axis=2, dtype=float)
+        diff = numeric[:, np.newaxis, :] - self.numeric[np.newaxis, start:stop, :]
+        if self.metric == "l1":
+            distances += np.abs(diff).sum(axis=2)
+        else:
+            distances += np.sqrt((diff ** 2).sum(axis=2))
+        return distances
+
+    def query(self, targets):
+        # 各ターゲットについて最も近い合成レコードの距離とインデックスを返す
+        codes, numeric = self.encoder.split(targets)
+        best_distances = np.full(len(codes), np.inf)
+        best_indices = np.full(len(codes), -1)
+        rows = np.arange(len(codes))
+        for start in range(0, len(self), self.block_size):
+            distances = self._block_distances(codes, numeric, start, start + self.block_size)
+            nearest = distances.argmin(axis=1)
+            nearest_distances = distances[rows, nearest]
+            closer = nearest_distances < best_distances
+            best_distances[closer] = nearest_distances[closer]
+            best_indices[closer] = start + nearest[closer]
+        return best_distances, best_indices
@@ -0,0 +1,106 @@
+"""共有ベーステーブル上のインデックス配列による補助データ分割と訓練データのサンプリング"""
+import hashlib
+import json
+import os
+import shutil
+from pathlib import Path
+
+import numpy as np
+
+from core.columnar import ColumnarTable
+from core.datasets import dataset_lock, dataset_path, dataset_version, load_columns, load_dataframe, version_key
+from core.encoding import Encoder
+
+TABLE_CACHE_DIR = Path("data/cache/tables")
+
+# プロセス内で開いたテーブル（同じデータセットの評価はメモリマップを共有する）
+_OPEN_TABLES = {}
+
+
+def _table_key(name, version=None):
+    # バージョンの内容と列定義から決める（名前が違っても内容が同じデータセットはキャッシュを共有する）
+    has_description = dataset_path(name).with_suffix(".json").exists()
+    columns = load_columns(name, version=version) if has_description else None
+    payload = json.dumps([version_key(name, version), columns], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()[:16]
+
+
+def _build_table(name, directory, version=None):
+    # CSVを読み込んで列指向テーブルに変換し、一時ディレクトリから置き換える
+    df = load_dataframe(name, version=version)
+    encoder = Encoder(df, load_columns(name, df, version=version))
+    tmp_dir = directory.with_name(f".{directory.name}.{os.getpid()}")
+    ColumnarTable.from_dataframe(df, encoder).save(tmp_dir, extra={"encoder": encoder.state()})
+    try:
+        os.rename(tmp_dir, directory)
+    except OSError:
+        # 他のプロセスが先に作成した
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+def _open_table(directory):
+    table = ColumnarTable.open(directory)
+    with open(Path(directory) / "table.json") as f:
+        state = json.load(f)["encoder"]
+    return table, Encoder.from_state(table.columns, state["categories"], state["ranges"])
+
+
+def publish_table(name, cache_dir=TABLE_CACHE_DIR, version=None):
+    # テーブルをキャッシュに書き出し、ワーカーが開くための (キー, ディレクトリ) を返す
+    # キーの計算とCSV・記述ファイルの読み込みの間にデータセットが書き換えられないようにする
+    with dataset_lock(name, shared=True):
+        key = _table_key(name, version)
+        directory = cache_dir / key
+        if not (directory / "table.json").exists():
+            _build_table(name, directory, version)
+    return key, str(directory)
+
+
+def open_base_table(name, cache_dir=TABLE_CACHE_DIR, version=None):
+    # versionを指定しなければ最新のバージョンを開く
+    key = _table_key(name, version)
+    if key not in _OPEN_TABLES:
+        _, directory = publish_table(name, cache_dir, version)
+        _OPEN_TABLES[key] = _open_table(directory)
+    table, encoder = _OPEN_TABLES[key]
+    # 同じ内容のデータセットはテーブルを共有するので、直近に開いたデータセットから開き直せればよい
+    table.source = (name, dataset_version(name) if version is None else version)
+    return table, encoder
+
+
+def reopen_table(name, version, key):
+    """pickleしたテーブルをデータセットから開き直す（内容が保存時と異なればValueError）"""
+    table, _ = open_base_table(name, version=version)
+    if table.key != key:
+        raise ValueError(f"データセット '{name}' のバージョン {version} の内容が保存時と異なります。")
+    return table
+
+
+def publish_tables(names, cache_dir=TABLE_CACHE_DIR):
+    # 親プロセスで各データセットを1度だけ書き出す（ワーカーが同時にCSVを読み込まないように）
+    # namesの要素はデータセット名か、バージョンを固定する場合は (名前, バージョン)
+    targets = {(name, None) if isinstance(name, str) else tuple(name) for name in names}
+    return dict(
+        publish_table(name, cache_dir, version)
+        for name, version in sorted(targets, key=lambda target: (target[0], target[1] or 0))
+    )
+
+
+def attach_tables(published):
+    # ワーカー起動時に公開済みテーブルを読み取り専用のメモリマップとして開いておく
+    for key, directory in published.items():
+        _OPEN_TABLES[key] = _open_table(directory)
+
+
+def split_records(num_records, exclude, auxiliary_split, rng):
+    # 除外するレコード（ターゲット）以外を補助データと評価用データのインデックスに分割
+    others = rng.permutation(np.setdiff1d(np.arange(num_records), exclude))
+    num_auxiliary = int(len(others) * auxiliary_split)
+    return others[:num_auxiliary], others[num_auxiliary:]
+
+
+def sample_training_indices(pool, num_training, rng, include=()):
+    # includeのレコードを必ず含む訓練データを、行をコピーせずインデックス配列として返す
+    include = np.asarray(include, dtype=int)
+    members = rng.choice(pool, size=num_training - len(include), replace=False)
+    return np.concatenate([include, members])
@@ -0,0 +1,105 @@
+"""CSVの先頭部分とカーディナリティの走査からTAPAS記述ファイルの列型を推定する
+
+全行は読み込まない。型は先頭 SAMPLE_ROWS 行から決め、整数列だけは続けてその列のみを
+チャンク単位で走査してユニーク数を数える。ユニーク数が上限を超えた列はその時点で整数列と確定し、
+全ての列が確定するか時間の上限に達したところで走査を打ち切る。
+"""
+import time
+
+import pandas as pd
+
+from core.datasets import DATA_DIR, write_json
+
+# 型の判定に読む先頭の行数
+SAMPLE_ROWS = 10_000
+# ユニーク数がこれ以下の整数列はカテゴリカルとして扱う
+MAX_CATEGORICAL_INTEGERS = 20
+# カーディナリティの走査の読み込み単位と時間の上限（秒）
+SCAN_CHUNK_ROWS = 200_000
+SCAN_TIME_BUDGET = 0.3
+
+
+def _rewind(source):
+    if hasattr(source, "seek"):
+        source.seek(0)
+    return source
+
+
+def _column_type(series):
+    if pd.api.types.is_bool_dtype(series) or not pd.api.types.is_numeric_dtype(series):
+        return "Categorical"
+    if pd.api.types.is_integer_dtype(series):
+        return "Integer"
+    # 欠損を含む整数列はfloatとして読み込まれるので、値が全て整数ならIntegerとみなす
+    values = series.dropna()
+    if len(values) and (values == values.round()).all():
+        return "Integer"
+    return "Continuous"
+
+
+def _scan_cardinality(source, candidates, seen, max_categories, skip_rows, time_budget):
+    # 先頭のサンプル以降を候補列だけ読み、ユニーク数が上限を超えた列から候補を外していく
+    started = time.perf_counter()
+    reader = pd.read_csv(
+        _rewind(source),
+        usecols=sorted(candidates),
+        skiprows=range(1, skip_rows + 1),
+        chunksize=SCAN_CHUNK_ROWS,
+    )
+    exhausted = True
+    for chunk in reader:
+        for name in list(candidates):
+            seen[name].update(pd.unique(chunk[name].dropna()))
+            if len(seen[name]) > max_categories:
+                candidates.discard(name)
+        if not candidates:
+            break
+        if time.perf_counter() - started > time_budget:
+            exhausted = False
+            break
+    reader.close()
+    return exhausted
+
+
+def infer_schema(
+    source,
+    sample_rows=SAMPLE_ROWS,
+    max_categories=MAX_CATEGORICAL_INTEGERS,
+    time_budget=SCAN_TIME_BUDGET,
+):
+    """列定義のリストと、各列のユニーク数の観測結果を返す
+
+    sourceはCSVのパスかファイルオブジェクト（Streamlitのアップロードファイルなど）。
+    """
+    sample = pd.read_csv(_rewind(source), nrows=sample_rows)
+    types = {name: _column_type(sample[name]) for name in sample.columns}
+
+    # サンプル内でユニーク数の少ない整数列だけが、カテゴリカルかどうかの確認対象になる
+    seen = {name: set(pd.unique(sample[name].dropna())) for name, t in types.items() if t == "Integer"}
+    candidates = {name for name, values in seen.items() if len(values) <= max_categories}
+    whole_file = len(sample) < sample_rows
+    exhaustive = whole_file
+    if candidates and not exhaustive:
+        exhaustive = _scan_cardinality(source, candidates, seen, max_categories, len(sample), time_budget)
+
+    columns, cardinality = [], {}
+    for name in sample.columns:
+        col_type = types[name]
+        if name in candidates:
+            col_type = "Categorical"
+        columns.append({"name": name, "type": col_type})
+        if name in seen:
+            cardinality[name] = {
+                "distinct": len(seen[name]),
+                # 全行を数えた場合だけ厳密（走査中に上限を超えた列は数えるのをやめるので下限値）
+                "exact": whole_file or (exhaustive and len(seen[name]) <= max_categories),
+            }
+    return columns, cardinality
+
+
+def write_description(name, columns, metadata=None, data_dir=DATA_DIR):
+    description = {"columns": columns}
+    if metadata:
+        description["metadata"] = metadata
+    description_path = write_json(data_dir / name / f"{name}.json", description, ensure_ascii=False)
+    return description_path, description
@@ -0,0 +1,127 @@
+"""外部データセットの内容ハッシュ付きローカルキャッシュと、オフライン環境向けのアーカイブ読み込み
+
+取得したデータはCSVのバイト列のSHA-256で data/cache/sources/<source>/<sha256>.csv に保存する。
+2回目以降はネットワークに接続せずにキャッシュを使い、保存済みのデータセットと内容が同じなら書き直さない。
+"""
+import gzip
+import hashlib
+import io
+import zipfile
+from pathlib import Path
+
+import pandas as pd
+
+from core.datasets import (
+    DATA_DIR, atomic_write, dataset_lock, dataset_path, load_metadata, read_json, save_metadata, store_file, write_json,
+)
+from core.stats import write_stats
+
+SOURCE_CACHE_DIR = Path("data/cache/sources")
+
+# UCIのアーカイブ（adult.zip）に含まれる adult.data にはヘッダーが無いので列名を補う
+ADULT_COLUMNS = [
+    "age", "workclass", "fnlwgt", "education", "education-num", "marital-status",
+    "occupation", "relationship", "race", "sex", "capital-gain", "capital-loss",
+    "hours-per-week", "native-country", "income",
+]
+
+SOURCES = {
+    "uci_adult": {"uci_id": 2, "headerless": {"adult.data": ADULT_COLUMNS}},
+}
+
+
+def _sha256(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def _source_dir(source, cache_dir):
+    return Path(cache_dir) / source
+
+
+def cached_source(source, cache_dir=SOURCE_CACHE_DIR):
+    # キャッシュ済みのCSVのパスとハッシュ（無ければNone）
+    index = read_json(_source_dir(source, cache_dir) / "index.json")
+    if index is None:
+        return None
+    path = _source_dir(source, cache_dir) / f"{index['sha256']}.csv"
+    return (path, index["sha256"]) if path.exists() else None
+
+
+def store_source(source, data, origin, cache_dir=SOURCE_CACHE_DIR):
+    # 同じ内容なら既存のファイルをそのまま使い、索引だけを更新する
+    directory = _source_dir(source, cache_dir)
+    directory.mkdir(parents=True, exist_ok=True)
+    sha = _sha256(data)
+    path = directory / f"{sha}.csv"
+    if not path.exists():
+        with atomic_write(path, "wb") as f:
+            f.write(data)
+    index = {"sha256": sha, "origin": origin, "stored_at": pd.Timestamp.now().isoformat()}
+    write_json(directory / "index.json", index)
+    return path, sha
+
+
+def fetch_uci(source, cache_dir=SOURCE_CACHE_DIR):
+    # ネットワークから取得する（ucimlrepoはここで初めてインポートする）
+    from ucimlrepo import fetch_ucirepo
+
+    repo = fetch_ucirepo(id=SOURCES[source]["uci_id"])
+    data = pd.concat([repo.data.features, repo.data.targets], axis=1)
+    return store_source(source, data.to_csv(index=False).encode(), f"ucimlrepo:{SOURCES[source]['uci_id']}", cache_dir)
+
+
+def _read_member(name, data, headerless):
+    # ヘッダーの無い既知のファイルは列名を補ってCSVに変換する
+    columns = headerless.get(Path(name).name)
+    if columns is None:
+        return data
+    df = pd.read_csv(io.BytesIO(data), header=None, names=columns, skipinitialspace=True, na_values="?")
+    return df.dropna(how="all").to_csv(index=False).encode()
+
+
+def import_archive(source, name, data, cache_dir=SOURCE_CACHE_DIR):
+    """ローカルのファイル（.csv / .csv.gz / .zip / UCIの .data）をキャッシュに取り込む
+
+    nameは元のファイル名、dataはその中身のバイト列。
+    """
+    headerless = SOURCES.get(source, {}).get("headerless", {})
+    if name.endswith(".zip"):
+        with zipfile.ZipFile(io.BytesIO(data)) as archive:
+            members = [m for m in archive.namelist() if m.endswith(".csv") or Path(m).name in headerless]
+            if not members:
+                raise ValueError("アーカイブにCSVファイルが含まれていません。")
+            member = members[0]
+            data = _read_member(member, archive.read(member), headerless)
+    elif name.endswith(".gz"):
+        data = _read_member(name[:-3], gzip.decompress(data), headerless)
+    else:
+        data = _read_member(name, data, headerless)
+    return store_source(source, data, f"archive:{name}", cache_dir)
+
+
+def install_source(name, source_path, sha, description, data_dir=DATA_DIR):
+    """キャッシュのCSVをデータセットとして配置する。内容が同じなら書き直さずFalseを返す"""
+    csv_path = dataset_path(name, data_dir)
+    with dataset_lock(name, data_dir):
+        recorded = load_metadata(name, data_dir).get("source_sha256")
+        # 配置後にCSVが書き換えられていないかはサイズで簡易的に確認する
+        if recorded == sha and csv_path.exists() and csv_path.stat().st_size == Path(source_path).stat().st_size:
+            return False
+
+        # キャッシュのファイルはコピーせず、内容の保存場所からデータセット名で参照する
+        store_file(name, source_path, data_dir)
+
+        data = pd.read_csv(source_path)
+        write_stats(name, data, data_dir)
+        save_metadata(name, {
+            "name": name,
+            "description": description,
+            "original_filename": Path(source_path).name,
+            "rows": len(data),
+            "columns": len(data.columns),
+            "column_names": data.columns.tolist(),
+            "dtypes": data.dtypes.astype(str).to_dict(),
+            "upload_date": pd.Timestamp.now().isoformat(),
+            "source_sha256": sha,
+        }, data_dir)
+    return True
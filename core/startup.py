@@ -0,0 +1,110 @@
+"""ページの表示開始までの時間計測とインポート時間の予算チェック"""
+import ast
+import importlib.util
+import json
+import logging
+import pkgutil
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+# ページの最上位で読み込んではいけない重いモジュール（必要な処理の中で遅延インポートする）
+HEAVY_MODULES = ["tapas", "sklearn", "scipy", "matplotlib", "seaborn", "ucimlrepo"]
+
+# どのページでも必ず読み込まれるモジュール（計測時間から差し引く）
+BASELINE_MODULES = ["streamlit", "pandas", "numpy"]
+
+# 基準のモジュールを除いた、ページ最上位のインポートにかけてよい時間（秒）
+IMPORT_BUDGET_SECONDS = 0.5
+
+# ページごとの直近の表示開始までの時間（秒）
+FIRST_PAINT = {}
+
+
+def record_first_paint(page, started):
+    # startedはスクリプト先頭で取った time.perf_counter() の値
+    elapsed = time.perf_counter() - started
+    FIRST_PAINT[page] = elapsed
+    logger.info("%s: 表示開始まで %.3f 秒", page, elapsed)
+    return elapsed
+
+
+def tapas_modules(names=("datasets", "generators", "threat_models", "attacks", "report")):
+    # TAPASを実際にインポートせずに、利用可能なサブモジュールを調べる
+    # （空の tapas/ ディレクトリも名前空間パッケージとして見つかるので、サブモジュールが無ければNone）
+    try:
+        spec = importlib.util.find_spec("tapas")
+    except (ImportError, ValueError):
+        return None
+    if spec is None or not spec.submodule_search_locations:
+        return None
+    found = {module.name for module in pkgutil.iter_modules(spec.submodule_search_locations)}
+    return [name for name in names if name in found] or None
+
+
+def _top_level_statements(body):
+    # 無条件に実行される文（try/withの中身を含む）だけをたどる
+    for node in body:
+        yield node
+        if isinstance(node, ast.Try):
+            yield from _top_level_statements(node.body)
+        elif isinstance(node, ast.With):
+            yield from _top_level_statements(node.body)
+
+
+def top_level_imports(path):
+    tree = ast.parse(Path(path).read_text(encoding="utf-8"))
+    modules = []
+    for node in _top_level_statements(tree.body):
+        if isinstance(node, ast.Import):
+            modules.extend(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.level == 0:
+            modules.append(node.module)
+    return list(dict.fromkeys(modules))
+
+
+_MEASURE_SCRIPT = """
+import importlib, json, sys, time
+modules, heavy = json.loads(sys.argv[1])
+started = time.perf_counter()
+missing = []
+for module in modules:
+    try:
+        importlib.import_module(module)
+    except ImportError:
+        missing.append(module)
+elapsed = time.perf_counter() - started
+loaded = sorted({name.split(".")[0] for name in sys.modules} & set(heavy))
+print(json.dumps({"seconds": elapsed, "missing": missing, "heavy": loaded}))
+"""
+
+
+def measure_imports(modules, project_dir):
+    # 既に読み込まれたモジュールの影響を受けないように新しいプロセスで計測する
+    project_dir = Path(project_dir).resolve()
+    command = [
+        sys.executable, "-c",
+        f"import sys; sys.path[:0] = [{str(project_dir)!r}, {str(project_dir / 'tapas')!r}]\n" + _MEASURE_SCRIPT,
+        json.dumps([modules, HEAVY_MODULES]),
+    ]
+    output = subprocess.run(command, capture_output=True, text=True, check=True, cwd=project_dir)
+    return json.loads(output.stdout.strip().splitlines()[-1])
+
+
+def check_import_budget(pages, project_dir, budget=IMPORT_BUDGET_SECONDS):
+    baseline = measure_imports(BASELINE_MODULES, project_dir)["seconds"]
+    report = []
+    for page in pages:
+        measured = measure_imports(top_level_imports(page), project_dir)
+        seconds = max(measured["seconds"] - baseline, 0.0)
+        report.append({
+            "page": str(page),
+            "seconds": seconds,
+            "missing": measured["missing"],
+            "heavy": measured["heavy"],
+            "ok": seconds <= budget and not measured["heavy"],
+        })
+    return report
@@ -0,0 +1,356 @@
+"""データセットごとの統計量（モーメント・分位点スケッチ・カテゴリ頻度）の計算と保存
+
+統計量は全てマージ可能な形で持つので、データを追記したときは追記分だけを集計して足し合わせればよい。
+"""
+import json
+import math
+
+import numpy as np
+import pandas as pd
+
+from core.datasets import DATA_DIR, atomic_write, dataset_path, dataset_signature, open_snapshot, version_key
+
+STATS_FILENAME = "stats.json"
+# 統計量ファイルの形式を変えたら上げる（古い形式のファイルは作り直す）
+STATS_VERSION = 3
+
+# 分位点スケッチのセントロイド数
+SKETCH_SIZE = 128
+# ユニーク数の推定に使うハッシュ値の数（これ未満のユニーク数は厳密）
+DISTINCT_SKETCH_SIZE = 256
+# カテゴリ頻度として保持する値の数（超えた分は other にまとめる）
+MAX_CATEGORIES = 1000
+# CSVから統計量を作り直すときの読み込み単位
+CHUNK_SIZE = 100_000
+
+
+def _is_numeric(series):
+    return pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series)
+
+
+def _compress(values, weights, size=SKETCH_SIZE):
+    order = np.argsort(values, kind="stable")
+    return _compress_sorted(values[order], weights[order], size)
+
+
+def _compress_sorted(values, weights, size=SKETCH_SIZE):
+    # 値の順に並んだ点を、重みが均等になるようにsize個のセントロイドへまとめる
+    if len(values) <= size:
+        return values, weights
+    total = weights.sum()
+    bins = np.minimum(((np.cumsum(weights) - weights) * size // total).astype(np.intp), size - 1)
+    counts = np.bincount(bins, weights=weights, minlength=size)
+    sums = np.bincount(bins, weights=weights * values, minlength=size)
+    present = counts > 0
+    return sums[present] / counts[present], counts[present]
+
+
+def _quantile(sketch, q, minimum, maximum):
+    values, weights = np.asarray(sketch, dtype=float).reshape(-1, 2).T
+    # セントロイドの中心位置（重み1ならpandasと同じ 0 .. n-1 の位置になる）
+    positions = np.cumsum(weights) - (weights + 1) / 2
+    value = np.interp(q * (weights.sum() - 1), positions, values)
+    return float(min(max(value, minimum), maximum))
+
+
+def column_cdf(column, x):
+    # 分位点スケッチから求めた経験分布関数の近似値
+    numeric = column["numeric"]
+    values, weights = np.asarray(numeric["sketch"], dtype=float).reshape(-1, 2).T
+    cumulative = (np.cumsum(weights) - weights / 2) / weights.sum()
+    x = np.asarray(x, dtype=float)
+    cdf = np.interp(x, values, cumulative, left=0.0, right=1.0)
+    return np.where(x < numeric["min"], 0.0, np.where(x >= numeric["max"], 1.0, cdf))
+
+
+def column_quantiles(column, qs):
+    numeric = column["numeric"]
+    return np.array([_quantile(numeric["sketch"], q, numeric["min"], numeric["max"]) for q in qs])
+
+
+def _value_hashes(series):
+    # 同じ値はチャンクごとに推論された型（int64/float64/object）によらず同じハッシュ値にする
+    # （数値として読める値はfloat64、それ以外は文字列としてハッシュする）
+    if pd.api.types.is_bool_dtype(series):
+        series = series.astype(str)
+    numbers = (series if _is_numeric(series) else pd.to_numeric(series, errors="coerce")).astype("float64")
+    is_number = numbers.notna().to_numpy()
+    hashes = np.empty(len(series), dtype=np.uint64)
+    hashes[is_number] = pd.util.hash_pandas_object(numbers[is_number], index=False).to_numpy()
+    hashes[~is_number] = pd.util.hash_pandas_object(series[~is_number].astype(str), index=False).to_numpy()
+    return hashes
+
+
+def _smallest_hashes(series, size=DISTINCT_SKETCH_SIZE):
+    # 全体をuniqueにせず、小さい方の候補だけを取り出してから重複を除く
+    hashes = _value_hashes(series)
+    if len(hashes) > 4 * size:
+        smallest = np.unique(np.partition(hashes, 4 * size)[:4 * size])
+        if len(smallest) >= size:
+            return smallest[:size]
+    return np.unique(hashes)[:size]
+
+
+def _merge_distinct(a, b, size=DISTINCT_SKETCH_SIZE):
+    # 小さい方からsize個のハッシュ値を保持する（KMVスケッチ）
+    return sorted(set(a) | set(b))[:size]
+
+
+def _estimate_distinct(hashes, size=DISTINCT_SKETCH_SIZE):
+    if len(hashes) < size:
+        return len(hashes)
+    return int(round((size - 1) / (hashes[-1] / 2.0**64)))
+
+
+def _column_stats(series):
+    non_null = series.dropna()
+    stats = {
+        "dtype": str(series.dtype),
+        "count": int(len(non_null)),
+        "nulls": int(len(series) - len(non_null)),
+        "memory_bytes": int(series.memory_usage(deep=True, index=False)),
+        "distinct": [int(h) for h in _smallest_hashes(non_null)],
+    }
+
+    if _is_numeric(series):
+        # スケッチを作るためにチャンク内の値は1度すべてソートする（マージで並べ替えるのはセントロイドだけ）
+        values = np.sort(non_null.to_numpy(dtype=float))
+        mean = float(values.mean()) if len(values) else 0.0
+        centroids, weights = _compress_sorted(values, np.ones(len(values)))
+        stats["numeric"] = {
+            "mean": mean,
+            "m2": float(((values - mean) ** 2).sum()),
+            "min": float(values[0]) if len(values) else None,
+            "max": float(values[-1]) if len(values) else None,
+            "sketch": np.column_stack([centroids, weights]).tolist(),
+        }
+    else:
+        counts = non_null.astype(str).value_counts()
+        stats["categories"] = {str(k): int(v) for k, v in counts.iloc[:MAX_CATEGORIES].items()}
+        stats["other"] = int(counts.iloc[MAX_CATEGORIES:].sum())
+    return stats
+
+
+def _comoments(df):
+    # 数値列の相関係数を求めるための平均と偏差積和（欠損のない行だけを使う）
+    columns = [col for col in df.columns if _is_numeric(df[col])]
+    values = df[columns].to_numpy(dtype=float)
+    values = values[~np.isnan(values).any(axis=1)]
+    mean = values.mean(axis=0) if len(values) else np.zeros(len(columns))
+    deviations = values - mean
+    return {
+        "columns": columns,
+        "n": int(len(values)),
+        "mean": mean.tolist(),
+        "comoment": (deviations.T @ deviations).tolist(),
+    }
+
+
+def match_types(df, stats):
+    """チャンク・追記分ごとの型推論の違いをそろえ、記録済みの統計量と同じ型（数値かカテゴリか）にする
+
+    数値として集計してきた列に数値へ変換できない値があれば ValueError を送出する。
+    """
+    df = df.copy(deep=False)
+    for name, column in stats["columns"].items():
+        if name not in df:
+            continue
+        if "numeric" in column and not _is_numeric(df[name]):
+            try:
+                df[name] = pd.to_numeric(df[name].astype(object), errors="raise")
+            except (TypeError, ValueError) as e:
+                raise ValueError(f"列 '{name}' は数値の列として集計済みですが、数値でない値があります: {e}") from e
+        elif "numeric" not in column and _is_numeric(df[name]):
+            df[name] = df[name].astype(object)
+    return df
+
+
+def compute_stats(df, like=None):
+    # likeに既存の統計量を渡すと、その型に合わせてから集計する（merge_stats で足し合わせる場合）
+    if like is not None:
+        df = match_types(df, like)
+    return {
+        "version": STATS_VERSION,
+        "rows": int(len(df)),
+        "columns": {col: _column_stats(df[col]) for col in df.columns},
+        "correlation": _comoments(df),
+    }
+
+
+def _merge_numeric(a, b, n_a, n_b):
+    if n_a == 0:
+        return b
+    if n_b == 0:
+        return a
+    # Chan et al. の並列アルゴリズムで平均と偏差平方和をまとめる
+    n = n_a + n_b
+    delta = b["mean"] - a["mean"]
+    sketch = np.asarray(a["sketch"] + b["sketch"], dtype=float)
+    centroids, weights = _compress(sketch[:, 0], sketch[:, 1])
+    return {
+        "mean": a["mean"] + delta * n_b / n,
+        "m2": a["m2"] + b["m2"] + delta**2 * n_a * n_b / n,
+        "min": min(a["min"], b["min"]),
+        "max": max(a["max"], b["max"]),
+        "sketch": np.column_stack([centroids, weights]).tolist(),
+    }
+
+
+def _merge_column(a, b):
+    merged = {
+        "dtype": a["dtype"],
+        "count": a["count"] + b["count"],
+        "nulls": a["nulls"] + b["nulls"],
+        "memory_bytes": a["memory_bytes"] + b["memory_bytes"],
+        "distinct": _merge_distinct(a["distinct"], b["distinct"]),
+    }
+    if ("numeric" in a) != ("numeric" in b):
+        raise ValueError("数値の列とカテゴリの列の統計量はマージできません（compute_stats に like を渡してください）。")
+    if "numeric" in a:
+        merged["numeric"] = _merge_numeric(a["numeric"], b["numeric"], a["count"], b["count"])
+    else:
+        counts = pd.Series(a.get("categories", {}), dtype="int64").add(
+            pd.Series(b.get("categories", {}), dtype="int64"), fill_value=0
+        ).astype("int64").sort_values(ascending=False, kind="stable")
+        merged["categories"] = {str(k): int(v) for k, v in counts.iloc[:MAX_CATEGORIES].items()}
+        merged["other"] = a.get("other", 0) + b.get("other", 0) + int(counts.iloc[MAX_CATEGORIES:].sum())
+    return merged
+
+
+def _merge_comoments(a, b):
+    if a["columns"] != b["columns"]:
+        raise ValueError(
+            f"数値列が異なる統計量の相関はマージできません: {a['columns']} と {b['columns']}"
+        )
+    if a["n"] == 0:
+        return b
+    if b["n"] == 0:
+        return a
+    n = a["n"] + b["n"]
+    delta = np.asarray(b["mean"]) - np.asarray(a["mean"])
+    comoment = np.asarray(a["comoment"]) + np.asarray(b["comoment"]) + np.outer(delta, delta) * a["n"] * b["n"] / n
+    return {
+        "columns": a["columns"],
+        "n": n,
+        "mean": (np.asarray(a["mean"]) + delta * b["n"] / n).tolist(),
+        "comoment": comoment.tolist(),
+    }
+
+
+def merge_stats(a, b):
+    if a is None:
+        return b
+    return {
+        "version": STATS_VERSION,
+        "rows": a["rows"] + b["rows"],
+        "columns": {col: _merge_column(a["columns"][col], b["columns"][col]) for col in a["columns"]},
+        "correlation": _merge_comoments(a["correlation"], b["correlation"]),
+    }
+
+
+def stats_path(name, data_dir=DATA_DIR):
+    return data_dir / name / STATS_FILENAME
+
+
+def save_stats(name, stats, data_dir=DATA_DIR, signature=None):
+    # CSVの識別子を記録しておき、CSVが書き換えられたら作り直す
+    # （集計に使ったCSVの識別子が分かっている場合は、保存時点のCSVではなくそちらを記録する）
+    stats = {key: value for key, value in stats.items() if key != "content_key"}
+    if signature is None:
+        signature = dataset_signature(name, data_dir)
+        # 内容が同じファイルに置き換わった場合（重複の統合など）も作り直さずに使えるようにする
+        stats["content_key"] = version_key(name, data_dir=data_dir)
+    stats["signature"] = list(signature)
+    with atomic_write(stats_path(name, data_dir)) as f:
+        json.dump(stats, f, ensure_ascii=False)
+    return stats
+
+
+def write_stats(name, df, data_dir=DATA_DIR):
+    # 保存・生成直後のDataFrameから統計量を作る
+    return save_stats(name, compute_stats(df), data_dir)
+
+
+def update_stats(name, appended_df, data_dir=DATA_DIR, stats=None):
+    # 追記したレコードの統計量だけを計算して既存の統計量にマージする
+    # （追記でCSVの識別子が変わった後に呼ぶ場合は、追記前の統計量をstatsに渡す）
+    if stats is None:
+        stats = load_stats(name, data_dir)
+    return save_stats(name, merge_stats(stats, compute_stats(appended_df, stats)), data_dir)
+
+
+def load_stats(name, data_dir=DATA_DIR):
+    path = stats_path(name, data_dir)
+    if not path.exists() or not dataset_path(name, data_dir).exists():
+        return None
+    with open(path) as f:
+        stats = json.load(f)
+    if stats.get("version") != STATS_VERSION:
+        return None
+    if stats.get("signature") != dataset_signature(name, data_dir):
+        if stats.get("content_key") is None or stats["content_key"] != version_key(name, data_dir=data_dir):
+            return None
+    return stats
+
+
+def dataset_stats(name, data_dir=DATA_DIR):
+    # 統計量ファイルが無い・古い場合だけCSV（追記したパーティションを含む）をチャンク単位で読み込んで作り直す
+    stats = load_stats(name, data_dir)
+    if stats is None:
+        with open_snapshot(name, data_dir) as (files, signature):
+            for f in files:
+                for chunk in pd.read_csv(f, chunksize=CHUNK_SIZE):
+                    stats = merge_stats(stats, compute_stats(chunk, stats))
+        stats = save_stats(name, stats, data_dir, signature=signature)
+    return stats
+
+
+def column_info(stats):
+    # df.dtypes / count / isnull().sum() / nunique() に相当する表
+    return pd.DataFrame({
+        "データ型": {col: s["dtype"] for col, s in stats["columns"].items()},
+        "非NULL数": {col: s["count"] for col, s in stats["columns"].items()},
+        "NULL数": {col: s["nulls"] for col, s in stats["columns"].items()},
+        "ユニーク数": {col: _estimate_distinct(s["distinct"]) for col, s in stats["columns"].items()},
+    })
+
+
+def _std(column):
+    # pandasのstd()と同じ不偏標準偏差
+    if column["count"] < 2:
+        return float("nan")
+    return math.sqrt(column["numeric"]["m2"] / (column["count"] - 1))
+
+
+def memory_bytes(stats):
+    return sum(s["memory_bytes"] for s in stats["columns"].values())
+
+
+def numeric_moments(stats):
+    # 数値列の平均と標準偏差（不偏分散）
+    rows = {}
+    for col, s in stats["columns"].items():
+        if "numeric" in s and s["count"] > 0:
+            rows[col] = {"mean": s["numeric"]["mean"], "std": _std(s)}
+    return pd.DataFrame.from_dict(rows, orient="index", columns=["mean", "std"])
+
+
+def describe(stats):
+    # df.describe() と同じ形の表（分位点はスケッチからの近似値）
+    summary = {}
+    for col, s in stats["columns"].items():
+        numeric = s.get("numeric")
+        if numeric is None or s["count"] == 0:
+            continue
+        quantiles = column_quantiles(s, (0.25, 0.5, 0.75))
+        summary[col] = [s["count"], numeric["mean"], _std(s), numeric["min"], *quantiles, numeric["max"]]
+    return pd.DataFrame(summary, index=["count", "mean", "std", "min", "25%", "50%", "75%", "max"], dtype=float)
+
+
+def correlation_matrix(stats):
+    correlation = stats["correlation"]
+    comoment = np.asarray(correlation["comoment"], dtype=float).reshape(len(correlation["columns"]), -1)
+    scale = np.sqrt(np.diag(comoment))
+    with np.errstate(invalid="ignore", divide="ignore"):
+        matrix = comoment / np.outer(scale, scale)
+    return pd.DataFrame(matrix, index=correlation["columns"], columns=correlation["columns"])
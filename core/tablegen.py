@@ -0,0 +1,132 @@
+"""スケーリング実験用の大規模な混合型テーブルをチャンク単位でディスクに書き出す生成器
+
+数値列は共通の潜在因子を通して指定した相関を持ち、カテゴリカル列は別の相関した潜在変数を
+偏りのある確率で区切って作る。一部のレコードは外れ値として数値列を大きくずらす。
+"""
+import io
+from pathlib import Path
+from statistics import NormalDist
+
+import numpy as np
+import pandas as pd
+
+from core.datasets import DATA_DIR, atomic_write, dataset_lock, dataset_writer, save_metadata
+from core.schema import write_description
+from core.stats import compute_stats, merge_stats, save_stats
+
+DEFAULT_SPEC = {
+    "num_records": 1_000_000,
+    "num_numeric": 10,
+    "num_categorical": 5,
+    "num_categories": 8,
+    # 数値列どうしの相関係数（カテゴリカル列の潜在変数も同じ因子を共有する）
+    "correlation": 0.5,
+    "noise_level": 0.1,
+    "outlier_rate": 0.001,
+    "outlier_scale": 10.0,
+    "chunk_size": 100_000,
+    "seed": 42,
+}
+
+
+def _category_thresholds(num_categories, skew=1.0):
+    # Zipf風の偏った出現確率に対応する標準正規分布の区切り
+    probabilities = 1.0 / np.arange(1, num_categories + 1) ** skew
+    cumulative = np.cumsum(probabilities / probabilities.sum())[:-1]
+    return np.array([NormalDist().inv_cdf(p) for p in cumulative])
+
+
+def table_columns(spec):
+    numeric = [f"feature_{i + 1}" for i in range(spec["num_numeric"])]
+    categorical = [f"category_{i + 1}" for i in range(spec["num_categorical"])]
+    return numeric, categorical
+
+
+def table_description(spec):
+    numeric, categorical = table_columns(spec)
+    labels = [f"c{k}" for k in range(spec["num_categories"])]
+    return {
+        "columns": (
+            [{"name": name, "type": "Continuous"} for name in numeric]
+            + [{"name": name, "type": "Categorical", "representation": labels} for name in categorical]
+            + [{"name": "target", "type": "Categorical", "representation": ["0", "1"]}]
+        )
+    }
+
+
+def generate_chunk(spec, weights, num_records, offset, rng):
+    # 1チャンク分のDataFrameと、その中の外れ値レコードの通し番号を返す
+    numeric, categorical = table_columns(spec)
+    rho = spec["correlation"]
+    factor = rng.standard_normal((num_records, 1))
+
+    X = np.sqrt(rho) * factor + np.sqrt(1 - rho) * rng.standard_normal((num_records, len(numeric)))
+    X += rng.standard_normal(X.shape) * spec["noise_level"]
+
+    # 外れ値は数値列を符号付きで大きくずらす
+    outliers = rng.random(num_records) < spec["outlier_rate"]
+    if outliers.any():
+        signs = rng.choice([-1.0, 1.0], size=(outliers.sum(), len(numeric)))
+        X[outliers] += signs * spec["outlier_scale"]
+
+    latent = np.sqrt(rho) * factor + np.sqrt(1 - rho) * rng.standard_normal((num_records, len(categorical)))
+    codes = np.searchsorted(_category_thresholds(spec["num_categories"]), latent)
+    labels = np.array([f"c{k}" for k in range(spec["num_categories"])])
+
+    data = {name: X[:, i] for i, name in enumerate(numeric)}
+    data.update({name: labels[codes[:, i]] for i, name in enumerate(categorical)})
+    y = X @ weights + rng.standard_normal(num_records) * spec["noise_level"]
+    data["target"] = (y > 0).astype(int)
+    return pd.DataFrame(data), offset + np.flatnonzero(outliers)
+
+
+def write_table(name, spec=None, data_dir=DATA_DIR, on_progress=None):
+    """テーブルをCSVに追記しながら生成し、記述ファイル・統計量・メタデータも保存する"""
+    spec = {**DEFAULT_SPEC, **(spec or {})}
+    data_dir = Path(data_dir)
+
+    # チャンクごとに独立した乱数系列を使い、チャンクの大きさが同じなら同じテーブルになる
+    seed = np.random.SeedSequence(spec["seed"])
+    weights_seed, *chunk_seeds = seed.spawn(1 + -(-spec["num_records"] // spec["chunk_size"]))
+    weights = np.random.default_rng(weights_seed).standard_normal(spec["num_numeric"])
+
+    with dataset_lock(name, data_dir):
+        stats, outliers, written = None, [], 0
+        with dataset_writer(name, data_dir, newline="") as f:
+            for chunk_seed in chunk_seeds:
+                num_records = min(spec["chunk_size"], spec["num_records"] - written)
+                chunk, chunk_outliers = generate_chunk(
+                    spec, weights, num_records, written, np.random.default_rng(chunk_seed)
+                )
+                # 統計量はCSVに書いた（6桁に丸めた）値から作り、CSVから作り直した統計量と一致させる
+                text = chunk.to_csv(index=False, float_format="%.6g")
+                f.write(text if written == 0 else text.split("\n", 1)[1])
+                stats = merge_stats(stats, compute_stats(pd.read_csv(io.StringIO(text)), stats))
+                outliers.append(chunk_outliers)
+                written += num_records
+                if on_progress is not None:
+                    on_progress(written, spec["num_records"])
+
+        _, description = write_description(name, table_description(spec)["columns"], data_dir=data_dir)
+        # 埋め込んだ外れ値の位置（行番号）は評価で参照できるように別ファイルに残す
+        with atomic_write(data_dir / name / "outliers.npy", "wb") as f:
+            np.save(f, np.concatenate(outliers))
+        save_stats(name, stats, data_dir)
+
+        columns = [col["name"] for col in description["columns"]]
+        metadata = {
+            "name": name,
+            "description": (
+                f"Generated mixed-type table with {spec['num_records']} records, "
+                f"{spec['num_numeric']} numeric and {spec['num_categorical']} categorical features"
+            ),
+            "original_filename": f"{name}.csv",
+            "rows": spec["num_records"],
+            "columns": len(columns),
+            "column_names": columns,
+            "dtypes": {col: s["dtype"] for col, s in stats["columns"].items()},
+            "upload_date": pd.Timestamp.now().isoformat(),
+            "generation_params": spec,
+        }
+        save_metadata(name, metadata, data_dir)
+    return metadata
@@ -0,0 +1,112 @@
+"""追記によるデータセットのバージョン管理
+
+新しいバッチは元のCSVを書き直さずに別のパーティションとして保存し、バージョンはパーティションの並びとして
+versions.json に記録する。行数・統計量・TAPAS記述ファイルは追記分だけを集計して更新し、
+評価結果は実行時のバージョン番号を記録しておけば、後から追記されても同じデータで再実行できる。
+"""
+import pandas as pd
+
+from core.datasets import (
+    DATA_DIR, content_hash, dataset_lock, dataset_path, load_metadata, load_versions, read_json, save_metadata,
+    store_partition, version_partitions, versions_path, write_json,
+)
+from core.schema import write_description
+from core.stats import dataset_stats, update_stats
+
+
+def _widen_columns(columns, batch):
+    # 追記分に合わせて列定義を広げる（整数列に小数が来たら連続値、カテゴリに新しい値が来たら表現に追加）
+    updated = []
+    for column in columns:
+        column = dict(column)
+        values = batch[column["name"]].dropna()
+        if column["type"] == "Integer" and pd.api.types.is_numeric_dtype(values):
+            if len(values) and not (values == values.round()).all():
+                column["type"] = "Continuous"
+        if "representation" in column:
+            known = [str(value) for value in column["representation"]]
+            new = [value for value in pd.unique(values.astype(str)) if value not in known]
+            column["representation"] = column["representation"] + new
+        updated.append(column)
+    return updated
+
+
+def append_batch(name, batch, data_dir=DATA_DIR):
+    """バッチをパーティションとして追記し、新しいバージョンの履歴エントリを返す"""
+    with dataset_lock(name, data_dir):
+        header = pd.read_csv(dataset_path(name, data_dir), nrows=0).columns.tolist()
+        missing = [col for col in header if col not in batch.columns]
+        extra = [col for col in batch.columns if col not in header]
+        if missing or extra:
+            raise ValueError(f"列が一致しません（不足: {missing}, 余分: {extra}）")
+        batch = batch[header]
+
+        # 追記前の統計量（追記後は識別子が変わって読み込めなくなる）
+        previous_stats = dataset_stats(name, data_dir)
+        versions = load_versions(name, data_dir) or [{
+            "version": 1,
+            "partitions": [content_hash(name, data_dir)],
+            "rows": previous_stats["rows"],
+            "appended_rows": previous_stats["rows"],
+            "created_at": load_metadata(name, data_dir).get("upload_date"),
+        }]
+        current = versions[-1]
+
+        description_path = dataset_path(name, data_dir).with_suffix(".json")
+        description = read_json(description_path)
+        columns = None
+        if description is not None:
+            if isinstance(description, list):
+                description = {"columns": description}
+            if "columns" not in versions[0]:
+                # 追記前の列定義も残しておき、古いバージョンを同じ列定義で再現できるようにする
+                versions[0]["columns"] = description["columns"]
+            columns = _widen_columns(description["columns"], batch)
+
+        entry = {
+            "version": current["version"] + 1,
+            "partitions": current["partitions"] + [store_partition(name, batch, data_dir)],
+            "rows": current["rows"] + len(batch),
+            "appended_rows": len(batch),
+            "created_at": pd.Timestamp.now().isoformat(),
+        }
+        if columns is not None:
+            entry["columns"] = columns
+        write_json(versions_path(name, data_dir), {"versions": versions + [entry]})
+
+        if columns is not None:
+            write_description(name, columns, description.get("metadata"), data_dir)
+        update_stats(name, batch, data_dir, stats=previous_stats)
+
+        metadata = load_metadata(name, data_dir)
+        metadata.update({
+            "rows": entry["rows"],
+            "version": entry["version"],
+            "updated_date": entry["created_at"],
+        })
+        save_metadata(name, metadata, data_dir)
+    return entry
+
+
+def version_history(name, data_dir=DATA_DIR):
+    # 表示用のバージョン一覧（追記していなければバージョン1だけ）
+    versions = load_versions(name, data_dir)
+    if versions is None:
+        metadata = load_metadata(name, data_dir)
+        versions = [{
+            "version": 1,
+            "partitions": version_partitions(name, data_dir=data_dir),
+            "rows": metadata.get("rows"),
+            "appended_rows": metadata.get("rows"),
+            "created_at": metadata.get("upload_date"),
+        }]
+    return pd.DataFrame([
+        {
+            "バージョン": entry["version"],
+            "行数": entry["rows"],
+            "追記した行数": entry["appended_rows"],
+            "パーティション数": len(entry["partitions"]),
+            "作成日時": entry["created_at"],
+        }
+        for entry in versions
+    ])
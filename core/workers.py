@@ -0,0 +1,118 @@
+"""重いライブラリを読み込み済みの状態で待機する評価ワーカープール"""
+import atexit
+import importlib
+import multiprocessing
+import os
+import sys
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+
+from core.sampling import attach_tables, publish_tables
+
+TAPAS_PATH = Path(__file__).resolve().parent.parent / "tapas"
+
+# ワーカー起動時に読み込んでおくモジュール（評価ジョブごとのインポート時間をなくす）
+WARM_MODULES = [
+    "numpy",
+    "pandas",
+    "scipy.stats",
+    "sklearn.ensemble",
+    "sklearn.linear_model",
+    "core.evaluation",
+]
+TAPAS_MODULES = [
+    "tapas.datasets",
+    "tapas.generators",
+    "tapas.threat_models",
+    "tapas.attacks",
+    "tapas.report",
+]
+
+
+def warm_up(published=None):
+    if str(TAPAS_PATH) not in sys.path:
+        sys.path.insert(0, str(TAPAS_PATH))
+    for module in WARM_MODULES:
+        importlib.import_module(module)
+    try:
+        for module in TAPAS_MODULES:
+            importlib.import_module(module)
+    except ImportError:
+        # TAPASが無くても評価エンジン自体は動く
+        pass
+    if published:
+        attach_tables(published)
+
+
+def _context():
+    # Streamlitのようなマルチスレッドのプロセスからforkすると危険なのでforkserverを使う
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context("forkserver")
+        context.set_forkserver_preload(WARM_MODULES)
+        return context
+    return multiprocessing.get_context("spawn")
+
+
+class WorkerPool:
+    def __init__(self, workers=None, published=None):
+        self.workers = workers or os.cpu_count() or 1
+        self.published = dict(published or {})
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _ensure_executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=_context(),
+                    initializer=warm_up,
+                    initargs=(self.published,),
+                )
+            return self._executor
+
+    def start(self):
+        # 最初のジョブを待たずにワーカーを起動してウォームアップを済ませておく
+        executor = self._ensure_executor()
+        return [executor.submit(os.getpid) for _ in range(self.workers)]
+
+    def publish(self, names):
+        # 後から追加されたデータセットもテーブルは親で1度だけ作り、ワーカーは各自で1度だけ開く
+        self.published.update(publish_tables(names))
+
+    def submit(self, fn, *args, **kwargs):
+        try:
+            return self._ensure_executor().submit(fn, *args, **kwargs)
+        except BrokenProcessPool:
+            # ワーカーが異常終了した場合はプールを作り直す
+            self.shutdown(wait=False)
+            return self._ensure_executor().submit(fn, *args, **kwargs)
+
+    def shutdown(self, wait=True):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=wait)
+                self._executor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.shutdown()
+
+
+_SHARED_POOL = None
+_SHARED_LOCK = threading.Lock()
+
+
+def shared_pool(workers=None):
+    # Streamlitの再実行をまたいで使い回すプロセス全体で1つのプール
+    global _SHARED_POOL
+    with _SHARED_LOCK:
+        if _SHARED_POOL is None:
+            _SHARED_POOL = WorkerPool(workers)
+            _SHARED_POOL.start()
+            atexit.register(_SHARED_POOL.shutdown, wait=False)
+        return _SHARED_POOL
@@ -9,6 +9,8 @@ tapas_path = Path(__file__).parent / "tapas"
 if str(tapas_path) not in sys.path:
     sys.path.insert(0, str(tapas_path))
 
+from core.schema import MAX_CATEGORICAL_INTEGERS, infer_schema, write_description
+
 st.title("TAPAS データセット記述ファイル作成ツール")
 
 # TAPASの記述ファイル仕様を説明
@@ -62,50 +64,23 @@ if st.button("Adult Dataset用の記述ファイルを生成"):
     DATA_DIR = Path("data/uploaded/adult_dataset")
     
     if DATA_DIR.exists():
-        # CSVファイルを読み込んで列名を取得
         csv_path = DATA_DIR / "adult_dataset.csv"
         if csv_path.exists():
-            df = pd.read_csv(csv_path)
-            
-            # 各列の型を自動判定し、記述を作成
-            columns = []
-            for col in df.columns:
-                dtype = str(df[col].dtype)
-                # 型の判定ロジック
-                if col in ['age', 'fnlwgt', 'education-num', 'capital-gain', 'capital-loss', 'hours-per-week']:
-                    col_type = 'Integer' if 'int' in dtype else 'Continuous'
-                elif col in ['income', 'workclass', 'education', 'marital-status', 'occupation', 
-                           'relationship', 'race', 'sex', 'native-country']:
-                    col_type = 'Categorical'
-                else:
-                    # デフォルトの型判定
-                    if dtype.startswith('int'):
-                        col_type = 'Integer'
-                    elif dtype.startswith('float'):
-                        col_type = 'Continuous'
-                    else:
-                        col_type = 'Categorical'
-                
-                columns.append({
-                    "name": col,
-                    "type": col_type
-                })
+            # 先頭のサンプルと整数列のユニーク数から各列の型を推定（全行は読み込まない）
+            columns, _ = infer_schema(csv_path)
             
-            # 記述ファイルの作成
-            description = {
-                "columns": columns,
-                "metadata": {
+            # ファイルに保存
+            description_path, description = write_description(
+                "adult_dataset",
+                columns,
+                metadata={
                     "description": "UCI Adult Income Dataset",
                     "source": "UCI Machine Learning Repository",
                     "target": "income",
                     "created_date": pd.Timestamp.now().isoformat()
-                }
-            }
-            
-            # ファイルに保存
-            description_path = DATA_DIR / "adult_dataset.json"
-            with open(description_path, "w") as f:
-                json.dump(description, f, indent=2)
+                },
+                data_dir=DATA_DIR.parent
+            )
             
             st.success(f"✅ 記述ファイルが作成されました: {description_path}")
             st.json(description)
@@ -153,22 +128,32 @@ st.header("5. カスタムデータセット用の記述ファイル作成")
 uploaded_file = st.file_uploader("CSVファイルをアップロード", type=['csv'])
 
 if uploaded_file:
-    df = pd.read_csv(uploaded_file)
+    # 型の推定結果を初期値にする（表示用にはファイルの先頭だけを読む）
+    inferred_columns, cardinality = infer_schema(uploaded_file)
+    uploaded_file.seek(0)
+    df = pd.read_csv(uploaded_file, nrows=5)
+    type_options = ["Categorical", "Integer", "Continuous"]
     
     st.write("### 列の型指定")
+    st.caption(f"ユニーク数が{MAX_CATEGORICAL_INTEGERS}以下の整数列はカテゴリカルと推定しています。")
     
     columns = []
-    for col in df.columns:
+    for inferred in inferred_columns:
+        col = inferred["name"]
         col1, col2 = st.columns([2, 1])
         with col1:
             st.write(f"**{col}**")
             st.write(f"データ型: {df[col].dtype}")
             st.write(f"サンプル値: {df[col].iloc[0]}")
+            if col in cardinality:
+                prefix = "" if cardinality[col]["exact"] else "少なくとも"
+                st.write(f"ユニーク数: {prefix}{cardinality[col]['distinct']}")
         
         with col2:
             col_type = st.selectbox(
                 f"{col}の型",
-                ["Categorical", "Integer", "Continuous"],
+                type_options,
+                index=type_options.index(inferred["type"]),
                 key=f"type_{col}"
             )
         
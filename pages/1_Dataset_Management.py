@@ -1,6 +1,10 @@
+import time
+
+# 表示開始までの時間の計測起点（インポートを含める）
+PAGE_STARTED = time.perf_counter()
+
 import streamlit as st
 import pandas as pd
-import json
 import os
 import sys
 from pathlib import Path
@@ -10,6 +14,19 @@ tapas_path = Path(__file__).parent.parent / "tapas"
 if str(tapas_path) not in sys.path:
     sys.path.insert(0, str(tapas_path))
 
+# 共通モジュールのパス追加
+project_path = Path(__file__).parent.parent
+if str(project_path) not in sys.path:
+    sys.path.insert(0, str(project_path))
+
+from core.datasets import (
+    content_hash, deduplicate_datasets, dataset_lock, list_datasets, remove_dataset, save_metadata, store_dataframe,
+)
+from core.schema import infer_schema, write_description
+from core.startup import record_first_paint, tapas_modules
+from core.stats import column_info, compute_stats, dataset_stats, describe, memory_bytes, save_stats
+from core.versions import append_batch, version_history
+
 st.set_page_config(
     page_title="データセット管理 - TAPAS",
     page_icon="📊",
@@ -18,19 +35,16 @@ st.set_page_config(
 
 st.title("📊 データセット管理")
 st.write("プライバシー評価に使用するデータセットをアップロード・管理します。")
+record_first_paint("dataset_management", PAGE_STARTED)
 
 # データ保存用ディレクトリの作成
 DATA_DIR = Path("data/uploaded")
 DATA_DIR.mkdir(parents=True, exist_ok=True)
 
-# TAPASのインポート
-tapas_available = False
-try:
-    import tapas.datasets
-    tapas_available = True
-except ImportError as e:
-    st.error(f"TAPASライブラリが正しくインポートできません: {e}")
-    tapas_available = False
+# TAPASの確認（このページでは記述ファイルを書くだけなのでインポートはしない）
+tapas_available = tapas_modules(("datasets",)) is not None
+if not tapas_available:
+    st.error("TAPASライブラリが見つかりません。")
 
 # タブ作成
 tab1, tab2, tab3 = st.tabs(["📤 アップロード", "📋 データセット一覧", "🔧 データセット詳細"])
@@ -64,6 +78,8 @@ with tab1:
         # データプレビュー
         try:
             df = pd.read_csv(uploaded_file)
+            # 統計量は1度だけ集計し、表示と保存の両方に使う
+            upload_stats = compute_stats(df)
             st.write("### データプレビュー")
             st.dataframe(df.head(10))
             
@@ -75,17 +91,11 @@ with tab1:
             with col2:
                 st.metric("列数", len(df.columns))
             with col3:
-                st.metric("メモリ使用量", f"{df.memory_usage(deep=True).sum() / 1024**2:.1f} MB")
+                st.metric("メモリ使用量", f"{memory_bytes(upload_stats) / 1024**2:.1f} MB")
             
             # 列情報
             with st.expander("列の詳細情報", expanded=False):
-                col_info = pd.DataFrame({
-                    "データ型": df.dtypes,
-                    "非NULL数": df.count(),
-                    "NULL数": df.isnull().sum(),
-                    "ユニーク数": df.nunique()
-                })
-                st.dataframe(col_info)
+                st.dataframe(column_info(upload_stats))
             
             # 保存オプション
             st.write("### 保存オプション")
@@ -112,64 +122,50 @@ with tab1:
             # 保存ボタン
             if st.button("データセットを保存", type="primary"):
                 try:
-                    # CSVファイルの保存
-                    dataset_dir = DATA_DIR / dataset_name
-                    dataset_dir.mkdir(exist_ok=True)
-                    
-                    csv_path = dataset_dir / f"{dataset_name}.csv"
-                    df.to_csv(csv_path, index=False)
-                    
-                    # メタデータの保存
-                    metadata = {
-                        "name": dataset_name,
-                        "description": description,
-                        "original_filename": uploaded_file.name,
-                        "rows": len(df),
-                        "columns": len(df.columns),
-                        "column_names": df.columns.tolist(),
-                        "dtypes": df.dtypes.astype(str).to_dict(),
-                        "upload_date": pd.Timestamp.now().isoformat()
-                    }
+                    # 同じ名前への同時の保存と、保存途中のファイルの読み込みを防ぐ
+                    with dataset_lock(dataset_name, DATA_DIR):
+                        # CSVファイルの保存
+                        csv_path = store_dataframe(dataset_name, df, DATA_DIR)
+                        save_stats(dataset_name, upload_stats, DATA_DIR)
+                        
+                        # TAPAS形式での保存
+                        tapas_error = None
+                        if convert_to_tapas and tapas_available:
+                            try:
+                                # 保存したCSVの先頭部分から列型を推定し、TAPAS用の記述ファイルを保存
+                                columns, _ = infer_schema(csv_path)
+                                write_description(dataset_name, columns, data_dir=DATA_DIR)
+                            except Exception as e:
+                                tapas_error = e
+                        
+                        # メタデータは最後に保存する（一覧にはメタデータが揃ったデータセットだけが表示される）
+                        save_metadata(dataset_name, {
+                            "name": dataset_name,
+                            "description": description,
+                            "original_filename": uploaded_file.name,
+                            "rows": len(df),
+                            "columns": len(df.columns),
+                            "column_names": df.columns.tolist(),
+                            "dtypes": df.dtypes.astype(str).to_dict(),
+                            "upload_date": pd.Timestamp.now().isoformat()
+                        }, DATA_DIR)
                     
-                    metadata_path = dataset_dir / "metadata.json"
-                    with open(metadata_path, "w") as f:
-                        json.dump(metadata, f, indent=2)
+                    # 既存のデータセットと内容が同じ場合は保存領域を共有している
+                    sha = content_hash(dataset_name, DATA_DIR)
+                    same_content = [
+                        d["name"] for d in list_datasets(DATA_DIR)
+                        if d["name"] != dataset_name and d.get("content_sha256") == sha
+                    ]
+                    if same_content:
+                        st.info(f"データセット {', '.join(same_content)} と内容が同じため、CSVは共有して保存しました。")
                     
-                    # TAPAS形式での保存
-                    if convert_to_tapas and tapas_available:
-                        try:
-                            # TAPASデータセットの説明を作成
-                            columns = []
-                            for col in df.columns:
-                                dtype = str(df[col].dtype)
-                                if dtype.startswith('int'):
-                                    col_type = 'Integer'
-                                elif dtype.startswith('float'):
-                                    col_type = 'Continuous'
-                                else:
-                                    col_type = 'Categorical'
-                                
-                                columns.append({
-                                    "name": col,
-                                    "type": col_type
-                                })
-                            
-                            description_data = {
-                                "columns": columns
-                            }
-                            
-                            # TAPAS用の記述ファイルを保存
-                            description_path = dataset_dir / f"{dataset_name}.json"
-                            with open(description_path, "w") as f:
-                                json.dump(description_data, f, indent=2)
-                            
-                            st.success(f"✅ データセット '{dataset_name}' が正常に保存されました！")
-                            st.info("TAPAS形式での保存も完了しました。")
-                        except Exception as e:
-                            st.warning(f"TAPAS形式への変換中にエラーが発生しました: {e}")
-                            st.info("CSV形式での保存は完了しています。")
+                    if tapas_error is not None:
+                        st.warning(f"TAPAS形式への変換中にエラーが発生しました: {tapas_error}")
+                        st.info("CSV形式での保存は完了しています。")
                     else:
                         st.success(f"✅ データセット '{dataset_name}' が正常に保存されました！")
+                        if convert_to_tapas and tapas_available:
+                            st.info("TAPAS形式での保存も完了しました。")
                     
                     # アップロードファイルのリセット
                     uploaded_file = None
@@ -184,15 +180,7 @@ with tab2:
     st.header("保存済みデータセット一覧")
     
     # 保存済みデータセットの取得
-    datasets = []
-    if DATA_DIR.exists():
-        for dataset_dir in DATA_DIR.iterdir():
-            if dataset_dir.is_dir():
-                metadata_path = dataset_dir / "metadata.json"
-                if metadata_path.exists():
-                    with open(metadata_path) as f:
-                        metadata = json.load(f)
-                        datasets.append(metadata)
+    datasets = list_datasets(DATA_DIR)
     
     if datasets:
         # データセット一覧表示
@@ -210,6 +198,13 @@ with tab2:
             )
         else:
             st.write("データセット情報の表示ができません。")
+        
+        # 内容が同じデータセットは1つのファイルを共有する
+        with st.expander("保存領域"):
+            st.write("CSVの内容は内容のハッシュ値ごとに1つだけ保存され、同じ内容のデータセットはそれを共有します。")
+            if st.button("重複しているデータを統合"):
+                freed = deduplicate_datasets(DATA_DIR)
+                st.success(f"{freed / 1024**2:.1f} MB を解放しました。")
     else:
         st.info("保存済みのデータセットがありません。")
 
@@ -243,14 +238,30 @@ with tab3:
             # データプレビュー
             csv_path = dataset_dir / f"{selected_dataset}.csv"
             if csv_path.exists():
-                df = pd.read_csv(csv_path)
-                
                 st.write("### データプレビュー")
-                st.dataframe(df.head(20))
+                st.dataframe(pd.read_csv(csv_path, nrows=20))
                 
-                # 基本統計量
+                # 基本統計量（保存時に集計した統計量から表示）
                 st.write("### 基本統計量")
-                st.dataframe(df.describe())
+                st.dataframe(describe(dataset_stats(selected_dataset, DATA_DIR)))
+                
+                # バージョン履歴と追記（元のCSVは書き直さず、新しいバッチを別のパーティションとして保存）
+                st.write("### バージョン")
+                st.dataframe(version_history(selected_dataset, DATA_DIR), hide_index=True, use_container_width=True)
+                batch_file = st.file_uploader(
+                    "追加データ（CSV）",
+                    type=["csv"],
+                    key=f"append_{selected_dataset}",
+                    help="列名が同じCSVを新しいバージョンとして追記します。以前の評価結果は実行時のバージョンのまま残ります。"
+                )
+                if batch_file is not None and st.button("新しいバージョンとして追記"):
+                    try:
+                        entry = append_batch(selected_dataset, pd.read_csv(batch_file), DATA_DIR)
+                        st.success(
+                            f"v{entry['version']} を作成しました（{entry['appended_rows']} 行を追記、合計 {entry['rows']} 行）。"
+                        )
+                    except ValueError as e:
+                        st.error(f"追記できませんでした: {e}")
                 
                 # データ削除オプション
                 st.write("### データセット管理")
@@ -259,8 +270,7 @@ with tab3:
                     if confirm:
                         if st.button("削除を実行", type="primary"):
                             try:
-                                import shutil
-                                shutil.rmtree(dataset_dir)
+                                remove_dataset(selected_dataset, DATA_DIR)
                                 st.success(f"データセット '{selected_dataset}' を削除しました。")
                                 st.experimental_rerun()
                             except Exception as e:
@@ -1,17 +1,32 @@
+import time
+
+# 表示開始までの時間の計測起点（インポートを含める）
+PAGE_STARTED = time.perf_counter()
+
 import streamlit as st
 import pandas as pd
-import json
 import os
 import sys
 from pathlib import Path
-import matplotlib.pyplot as plt
-import numpy as np
 
 # TAPASパスの追加
 tapas_path = Path(__file__).parent.parent / "tapas"
 if str(tapas_path) not in sys.path:
     sys.path.insert(0, str(tapas_path))
 
+# 共通モジュールのパス追加
+project_path = Path(__file__).parent.parent
+if str(project_path) not in sys.path:
+    sys.path.insert(0, str(project_path))
+
+from core.attacks import ATTACK_TYPES, GROUNDHOG_TYPES, MIA_TYPES
+from core.classifiers import CLASSIFIERS, DEFAULT_CLASSIFIER, GROWTH
+from core.batch import run_job
+from core.datasets import dataset_version, list_datasets, load_metadata
+from core.evaluation import compare_classifiers, evaluation_checkpoint, find_result, generator_from_metadata, save_result
+from core.startup import record_first_paint
+from core.workers import shared_pool
+
 st.set_page_config(
     page_title="プライバシー評価 - TAPAS",
     page_icon="🔍",
@@ -23,37 +38,18 @@ st.write("""
 TAPASを使用して、合成データのプライバシー保護レベルを評価します。
 オリジナルデータと合成データを比較し、合成データからオリジナルデータの情報がどの程度漏洩するかを測定します。
 """)
+record_first_paint("privacy_evaluation", PAGE_STARTED)
 
 # データ保存用ディレクトリ
 DATA_DIR = Path("data/uploaded")
 RESULTS_DIR = Path("data/results")
 RESULTS_DIR.mkdir(parents=True, exist_ok=True)
 
-# TAPASのインポート
-try:
-    import tapas.datasets
-    import tapas.generators
-    import tapas.threat_models
-    import tapas.attacks
-    import tapas.report
-    tapas_available = True
-except ImportError:
-    tapas_available = False
-    st.error("TAPASライブラリが正しくインポートできません。")
-
-if not tapas_available:
-    st.stop()
+# 評価ワーカーはページの再実行をまたいで使い回す
+evaluation_pool = shared_pool()
 
 # 保存済みデータセットの取得
-datasets = []
-if DATA_DIR.exists():
-    for dataset_dir in DATA_DIR.iterdir():
-        if dataset_dir.is_dir():
-            metadata_path = dataset_dir / "metadata.json"
-            if metadata_path.exists():
-                with open(metadata_path) as f:
-                    metadata = json.load(f)
-                    datasets.append(metadata)
+datasets = list_datasets(DATA_DIR)
 
 if not datasets:
     st.warning("評価可能なデータセットがありません。まずデータセットをアップロードしてください。")
@@ -90,6 +86,15 @@ with col1:
         dataset_names,
         help="保護したい個人情報を含む元のデータセット"
     )
+    # 追記されたデータセットは評価に使うバージョンを選べる（結果には選んだバージョンが記録される）
+    latest_version = dataset_version(original_dataset, DATA_DIR)
+    original_version = latest_version
+    if latest_version > 1:
+        original_version = st.selectbox(
+            "バージョン",
+            list(range(latest_version, 0, -1)),
+            format_func=lambda v: f"v{v}（最新）" if v == latest_version else f"v{v}",
+        )
 
 with col2:
     st.subheader("合成データ")
@@ -105,7 +110,6 @@ with col2:
             help="既に生成済みの合成データセット"
         )
     elif synthetic_option == "新しく合成データを生成":
-        st.info("合成データ生成機能は現在開発中です。")
         generator_type = st.selectbox(
             "生成器の種類",
             ["Raw (コピー)", "ノイズ付加", "差分プライバシー"]
@@ -126,15 +130,24 @@ col1, col2 = st.columns(2)
 
 with col1:
     st.subheader("攻撃種別")
-    attack_type = st.selectbox(
-        "実行する攻撃を選択",
-        [
-            "Membership Inference Attack (MIA)",
-            "Attribute Inference Attack (AIA)",
-            "Groundhog Attack",
-            "Closest Distance Attack"
-        ]
+    multi_attack = st.checkbox(
+        "複数の攻撃をまとめて評価する",
+        help="Shadow・評価用の合成データを1度だけ生成し、選んだ攻撃を同じデータで並列に学習・評価します"
     )
+    if multi_attack:
+        attack_types = st.multiselect(
+            "実行する攻撃を選択",
+            MIA_TYPES,
+            default=["Groundhog Attack", "Closest Distance Attack"],
+            help="メンバーシップ推論攻撃から選択します"
+        )
+        attack_type = " + ".join(attack_types)
+    else:
+        attack_type = st.selectbox(
+            "実行する攻撃を選択",
+            ATTACK_TYPES
+        )
+        attack_types = [attack_type]
     
     # 攻撃の説明
     attack_descriptions = {
@@ -143,7 +156,8 @@ with col1:
         "Groundhog Attack": "統計的特徴を使用してメンバーシップを推定する攻撃です。",
         "Closest Distance Attack": "最近傍距離を使用してメンバーシップを推定する攻撃です。"
     }
-    st.info(attack_descriptions[attack_type])
+    for name in attack_types:
+        st.info(f"{name}: {attack_descriptions[name]}" if multi_attack else attack_descriptions[name])
 
 with col2:
     st.subheader("攻撃パラメータ")
@@ -157,7 +171,37 @@ with col2:
         help="攻撃評価に使用するサンプル数"
     )
     
-    if attack_type == "Membership Inference Attack (MIA)":
+    adaptive_supported = all(name in MIA_TYPES for name in attack_types)
+    sample_mode = st.radio(
+        "評価サンプル数の決め方",
+        ["固定", "適応的（信頼区間で停止）"],
+        horizontal=True,
+        disabled=not adaptive_supported,
+        help="適応的モードでは、信頼区間の幅が許容誤差を下回るか上限に達するまでバッチ単位で評価します"
+             "（メンバーシップ推論攻撃のみ）"
+    )
+    if not adaptive_supported:
+        # 属性推論攻撃は停止条件を判定できないので、常に固定のサンプル数で評価する
+        sample_mode = "固定"
+    if sample_mode == "適応的（信頼区間で停止）":
+        adaptive_metric = st.selectbox("停止判定に使う指標", ["advantage", "auc"])
+        adaptive_tolerance = st.number_input(
+            "信頼区間の許容幅", min_value=0.01, max_value=0.5, value=0.05, step=0.01
+        )
+        adaptive_batch_size = st.number_input("バッチサイズ", min_value=10, max_value=500, value=50)
+        adaptive_max_samples = st.number_input(
+            "評価サンプル数の上限", min_value=10, max_value=10000, value=1000
+        )
+    
+    evaluation_runs = st.number_input(
+        "評価実行回数",
+        min_value=1,
+        max_value=10,
+        value=3,
+        help="ターゲットと分割を変えて評価を繰り返す回数"
+    )
+    
+    if "Membership Inference Attack (MIA)" in attack_types:
         mia_target = st.radio(
             "攻撃対象",
             ["ランダムなレコード", "特定のレコード"]
@@ -165,13 +209,51 @@ with col2:
         if mia_target == "特定のレコード":
             target_record_idx = st.number_input("ターゲットレコードのインデックス", min_value=0, value=0)
     
-    elif attack_type == "Attribute Inference Attack (AIA)":
-        target_attribute = st.text_input("推定対象の属性名")
+    if "Attribute Inference Attack (AIA)" in attack_types:
+        original_metadata = next(d for d in datasets if d["name"] == original_dataset)
+        target_attribute = st.selectbox(
+            "推定対象の属性名",
+            original_metadata.get("column_names", []),
+            help="カテゴリカル列を選択してください"
+        )
+        num_targets = st.number_input(
+            "ターゲットレコード数",
+            min_value=1,
+            max_value=10000,
+            value=100,
+            help="属性を推定するレコードの数（全ターゲットをまとめて推定します）"
+        )
     
-    elif attack_type == "Groundhog Attack":
+    if "Groundhog Attack" in attack_types:
         use_naive = st.checkbox("Naive features", value=True)
         use_hist = st.checkbox("Histogram features", value=True)
         use_corr = st.checkbox("Correlation features", value=True)
+    
+    if "Closest Distance Attack" in attack_types:
+        distance_metric = st.selectbox(
+            "数値列の距離",
+            ["l1", "l2"],
+            format_func=lambda m: {"l1": "L1ノルム", "l2": "L2ノルム"}[m],
+            help="カテゴリカル列はHamming距離、数値列は正規化した値のL1/L2距離で比較します"
+        )
+    
+    uses_classifier = any(name in GROUNDHOG_TYPES for name in attack_types)
+    if uses_classifier:
+        classifier = st.selectbox(
+            "Shadowモデルの分類器",
+            list(CLASSIFIERS),
+            format_func=CLASSIFIERS.get,
+            help="勾配ブースティングは大きなサンプル数でも速く、ロジスティック回帰は最も速い代わりに攻撃が弱くなりがちです"
+        )
+        classifier_jobs = 1
+        if classifier in GROWTH:
+            classifier_jobs = st.number_input(
+                "学習に使うCPUコア数 (n_jobs)",
+                min_value=1,
+                max_value=os.cpu_count() or 1,
+                value=1,
+                help="評価ワーカーも並列に動くため、同時に複数の評価を実行する場合は1のままにしてください"
+            )
 
 # 攻撃者の知識設定
 st.header("3. 攻撃者の知識設定")
@@ -213,7 +295,7 @@ col1, col2, col3 = st.columns(3)
 
 with col1:
     st.write("**データセット**")
-    st.write(f"- オリジナル: {original_dataset}")
+    st.write(f"- オリジナル: {original_dataset}（v{original_version}）")
     if synthetic_option == "既存の合成データを使用":
         st.write(f"- 合成データ: {synthetic_dataset}")
     else:
@@ -223,91 +305,261 @@ with col2:
     st.write("**攻撃設定**")
     st.write(f"- 攻撃種別: {attack_type}")
     st.write(f"- サンプル数: {num_samples}")
+    if sample_mode == "適応的（信頼区間で停止）":
+        st.write(f"- 適応的評価: {adaptive_metric} の信頼区間幅 ≤ {adaptive_tolerance}")
 
 with col3:
     st.write("**攻撃者の知識**")
     st.write(f"- 補助データ: {auxiliary_split:.0%}")
     st.write(f"- アクセス: {synthetic_access}")
 
+use_checkpoint = st.checkbox(
+    "途中経過を保存する（中断後に同じ設定で実行すると続きから再開）",
+    value=True
+)
+
+fix_seed = st.checkbox(
+    "乱数シードを固定する（同じ設定・シードの保存済み結果があれば再計算せずに表示）",
+    value=False
+)
+if fix_seed:
+    evaluation_seed = st.number_input("ランダムシード", min_value=0, value=42)
+
+compare_option = False
+if uses_classifier:
+    compare_option = st.checkbox(
+        "分類器ごとの学習時間と攻撃性能も比較する",
+        value=False,
+        help="1回目の評価と同じShadow・評価用データセットの特徴量で全ての分類器を学習し、学習時間とAUCを比べます"
+    )
+
 if st.button("プライバシー評価を実行", type="primary"):
     with st.spinner("評価を実行中..."):
         try:
-            # 簡易実装：実際のTAPAS評価の代わりにダミー結果を生成
-            st.warning("現在は簡易実装です。実際のTAPAS攻撃は実装中です。")
+            # 合成データの生成手法を決定
+            if synthetic_option == "既存の合成データを使用":
+                generator, generator_params = generator_from_metadata(load_metadata(synthetic_dataset, DATA_DIR))
+            elif synthetic_option == "新しく合成データを生成":
+                if generator_type == "ノイズ付加":
+                    generator, generator_params = "ノイズ付加", {"noise_level": noise_level}
+                elif generator_type == "差分プライバシー":
+                    generator, generator_params = "差分プライバシー（簡易版）", {"epsilon": epsilon}
+                else:
+                    generator, generator_params = "Raw (コピー)", {}
+            else:
+                generator, generator_params = "Raw (コピー)", {}
             
-            # ダミーの評価結果
-            results = []
-            for i in range(5):
-                accuracy = np.random.uniform(0.5, 0.9)
-                results.append({
-                    "run": i + 1,
-                    "accuracy": accuracy,
-                    "precision": accuracy + np.random.uniform(-0.1, 0.1),
-                    "recall": accuracy + np.random.uniform(-0.1, 0.1),
-                    "f1_score": accuracy + np.random.uniform(-0.05, 0.05),
-                    "auc": accuracy + np.random.uniform(-0.05, 0.05)
-                })
+            if multi_attack and len(attack_types) < 2:
+                raise ValueError("複数攻撃モードでは2つ以上の攻撃を選択してください。")
             
-            results_df = pd.DataFrame(results)
-            avg_accuracy = results_df['accuracy'].mean()
+            params = {
+                "dataset": original_dataset,
+                "dataset_version": original_version,
+                "synthetic_dataset": synthetic_dataset if synthetic_option != "新しく合成データを生成" else None,
+                "generator": generator,
+                "generator_params": generator_params,
+                "attack_type": attack_type,
+                "auxiliary_split": auxiliary_split,
+                "num_samples": int(num_samples),
+                "num_synthetic_records": int(num_queries),
+                "evaluation_runs": int(evaluation_runs),
+            }
+            attack_params = {}
+            # 既定の分類器（ランダムフォレスト）は指定を省き、以前の結果と同じ設定として扱う
+            # （コア数は結果を変えないので攻撃パラメータに含めず、実行時に渡す）
+            classifier_params = {}
+            if uses_classifier and classifier != DEFAULT_CLASSIFIER:
+                classifier_params["classifier"] = classifier
+            n_jobs = int(classifier_jobs) if uses_classifier and classifier_jobs > 1 else None
+            if "Membership Inference Attack (MIA)" in attack_types and classifier_params:
+                attack_params["Membership Inference Attack (MIA)"] = dict(classifier_params)
+            if "Groundhog Attack" in attack_types:
+                attack_params["Groundhog Attack"] = {
+                    "use_naive": use_naive,
+                    "use_hist": use_hist,
+                    "use_corr": use_corr,
+                    **classifier_params,
+                }
+            if "Closest Distance Attack" in attack_types:
+                attack_params["Closest Distance Attack"] = {"distance": distance_metric}
+            if "Attribute Inference Attack (AIA)" in attack_types:
+                attack_params["Attribute Inference Attack (AIA)"] = {
+                    "target_attribute": target_attribute,
+                    "num_targets": int(num_targets),
+                }
+            if multi_attack:
+                # 選んだ攻撃は同じShadow・評価用データセットを共有し、結果は1つにまとめて保存される
+                params["attack_set"] = [
+                    {"attack_type": name, "attack_params": attack_params.get(name, {})} for name in attack_types
+                ]
+            elif attack_type in attack_params:
+                params["attack_params"] = attack_params[attack_type]
+            if sample_mode == "適応的（信頼区間で停止）":
+                params["adaptive"] = {
+                    "metric": adaptive_metric,
+                    "tolerance": adaptive_tolerance,
+                    "batch_size": int(adaptive_batch_size),
+                    "max_samples": int(adaptive_max_samples),
+                }
+            if "Membership Inference Attack (MIA)" in attack_types and mia_target == "特定のレコード":
+                params["target_record_idx"] = int(target_record_idx)
+            if fix_seed:
+                params["seed"] = int(evaluation_seed)
             
-            # 結果の表示
-            st.success("評価が完了しました！")
+            result = find_result(params, RESULTS_DIR)
+            if result is not None:
+                if result["dataset"] != original_dataset:
+                    st.info(f"内容が同じデータセット {result['dataset']} の、同じ設定・シードの保存済み結果（{result['id']}）を表示します。")
+                else:
+                    st.info(f"同じ設定・シードの保存済み結果（{result['id']}）を表示します。")
+            else:
+                evaluation_pool.publish([(original_dataset, original_version)])
+                result = evaluation_pool.submit(run_job, params, 10 if use_checkpoint else None, n_jobs).result()
+                save_result(result, RESULTS_DIR)
+                if use_checkpoint:
+                    evaluation_checkpoint(params).clear()
+            if "attacks" in result:
+                # 複数攻撃モード: 同じShadow・評価用データセットで評価した攻撃を並べて比較する
+                st.success("評価が完了しました！")
+                st.write("### 攻撃ごとの評価結果")
+                results_df = pd.DataFrame(result["results"])
+                if "summary" in result:
+                    comparison_df = pd.DataFrame(result["summary"]).T
+                else:
+                    comparison_df = results_df.groupby("attack_type").mean(numeric_only=True).drop(columns="run")
+                comparison_df = comparison_df.loc[result["attacks"]]
+                if "timings" in result:
+                    timings_df = pd.DataFrame(result["timings"]).groupby("attack_type").mean(numeric_only=True)
+                    comparison_df[["train_seconds", "score_seconds"]] = timings_df[["train_seconds", "score_seconds"]]
+                st.dataframe(comparison_df.style.format("{:.3f}"), use_container_width=True)
+                st.caption(
+                    f"全実行のサンプルをまとめた値 ／ 評価実行回数: {result['parameters']['evaluation_runs']}"
+                    f" ／ ランダムシード: {result['parameters']['seed']}"
+                )
+                
+                strongest = comparison_df["auc"].idxmax()
+                st.info(f"最も強い攻撃（AUC）: {strongest}（AUC {comparison_df.loc[strongest, 'auc']:.3f}）")
+                
+                import matplotlib.pyplot as plt
+                
+                fig, ax = plt.subplots(figsize=(10, 6))
+                comparison_df[["accuracy", "auc", "advantage"]].plot.bar(ax=ax, rot=0)
+                ax.set_xlabel('攻撃')
+                ax.set_ylabel('スコア')
+                ax.set_title('攻撃ごとの評価メトリクス')
+                ax.grid(True, alpha=0.3, axis='y')
+                st.pyplot(fig)
+            else:
+                results = result["results"]
             
-            # メトリクスの表示
-            st.write("### 評価結果")
-            col1, col2, col3, col4, col5 = st.columns(5)
-            with col1:
-                st.metric("平均精度", f"{results_df['accuracy'].mean():.3f}")
-            with col2:
-                st.metric("平均適合率", f"{results_df['precision'].mean():.3f}")
-            with col3:
-                st.metric("平均再現率", f"{results_df['recall'].mean():.3f}")
-            with col4:
-                st.metric("平均F1スコア", f"{results_df['f1_score'].mean():.3f}")
-            with col5:
-                st.metric("平均AUC", f"{results_df['auc'].mean():.3f}")
+                results_df = pd.DataFrame(results)
+                avg_accuracy = results_df['accuracy'].mean()
             
-            # プライバシーリスクの評価
-            st.write("### プライバシーリスク評価")
+                # 結果の表示
+                st.success("評価が完了しました！")
             
-            if avg_accuracy > 0.8:
-                risk_level = "高"
-                risk_color = "#ff4444"
-                risk_message = "合成データから元データの情報が漏洩するリスクが高いです。"
-            elif avg_accuracy > 0.65:
-                risk_level = "中"
-                risk_color = "#ffaa00"
-                risk_message = "中程度のプライバシーリスクがあります。"
-            else:
-                risk_level = "低"
-                risk_color = "#44ff44"
-                risk_message = "プライバシーリスクは比較的低いです。"
+                # メトリクスの表示
+                st.write("### 評価結果")
+                col1, col2, col3, col4, col5 = st.columns(5)
+                with col1:
+                    st.metric("平均精度", f"{results_df['accuracy'].mean():.3f}")
+                with col2:
+                    st.metric("平均適合率", f"{results_df['precision'].mean():.3f}")
+                with col3:
+                    st.metric("平均再現率", f"{results_df['recall'].mean():.3f}")
+                with col4:
+                    st.metric("平均F1スコア", f"{results_df['f1_score'].mean():.3f}")
+                with col5:
+                    st.metric("平均AUC", f"{results_df['auc'].mean():.3f}")
+                st.caption(
+                    f"使用した評価サンプル数（各実行）: {results_df['num_samples_used'].tolist()}"
+                    f" ／ ランダムシード: {result['parameters']['seed']}"
+                )
+                if "timings" in result:
+                    timings_df = pd.DataFrame(result["timings"])
+                    st.caption(
+                        f"攻撃の学習時間（平均）: {timings_df['train_seconds'].mean():.2f} 秒"
+                        f" ／ 採点時間（平均）: {timings_df['score_seconds'].mean():.2f} 秒"
+                    )
+            
+                if "per_target" in result:
+                    with st.expander("ターゲットごとの推定精度", expanded=False):
+                        st.dataframe(pd.DataFrame(result["per_target"]), hide_index=True, use_container_width=True)
+            
+                # プライバシーリスクの評価
+                st.write("### プライバシーリスク評価")
+            
+                if avg_accuracy > 0.8:
+                    risk_level = "高"
+                    risk_color = "#ff4444"
+                    risk_message = "合成データから元データの情報が漏洩するリスクが高いです。"
+                elif avg_accuracy > 0.65:
+                    risk_level = "中"
+                    risk_color = "#ffaa00"
+                    risk_message = "中程度のプライバシーリスクがあります。"
+                else:
+                    risk_level = "低"
+                    risk_color = "#44ff44"
+                    risk_message = "プライバシーリスクは比較的低いです。"
+            
+                st.markdown(f"""
+                <div style="background-color: {risk_color}20; padding: 20px; border-radius: 10px; border: 2px solid {risk_color};">
+                    <h3 style="color: {risk_color};">プライバシーリスクレベル: {risk_level}</h3>
+                    <p>{risk_message}</p>
+                    <p>攻撃の成功率（精度）が {avg_accuracy:.1%} であることは、合成データから元データの情報を
+                    {avg_accuracy:.1%} の確率で推測できることを意味します。</p>
+                </div>
+                """, unsafe_allow_html=True)
+            
+                # 詳細結果のプロット
+                import matplotlib.pyplot as plt
             
-            st.markdown(f"""
-            <div style="background-color: {risk_color}20; padding: 20px; border-radius: 10px; border: 2px solid {risk_color};">
-                <h3 style="color: {risk_color};">プライバシーリスクレベル: {risk_level}</h3>
-                <p>{risk_message}</p>
-                <p>攻撃の成功率（精度）が {avg_accuracy:.1%} であることは、合成データから元データの情報を
-                {avg_accuracy:.1%} の確率で推測できることを意味します。</p>
-            </div>
-            """, unsafe_allow_html=True)
+                fig, ax = plt.subplots(figsize=(10, 6))
+                metrics = ['accuracy', 'precision', 'recall', 'f1_score', 'auc']
+                x = range(len(results))
             
-            # 詳細結果のプロット
-            fig, ax = plt.subplots(figsize=(10, 6))
-            metrics = ['accuracy', 'precision', 'recall', 'f1_score', 'auc']
-            x = range(len(results))
+                for metric in metrics:
+                    values = [r[metric] for r in results]
+                    ax.plot(x, values, marker='o', label=metric)
             
-            for metric in metrics:
-                values = [r[metric] for r in results]
-                ax.plot(x, values, marker='o', label=metric)
+                ax.set_xlabel('実行回')
+                ax.set_ylabel('スコア')
+                ax.set_title('評価メトリクスの推移')
+                ax.legend()
+                ax.grid(True, alpha=0.3)
+                st.pyplot(fig)
             
-            ax.set_xlabel('実行回')
-            ax.set_ylabel('スコア')
-            ax.set_title('評価メトリクスの推移')
-            ax.legend()
-            ax.grid(True, alpha=0.3)
-            st.pyplot(fig)
+            if compare_option:
+                # 評価が終わってから実行し、学習時間が評価ジョブとの同時実行の影響を受けないようにする
+                st.write("### 分類器の比較")
+                with st.spinner("分類器ごとに学習・採点しています..."):
+                    evaluation_pool.publish([(original_dataset, original_version)])
+                    # シード未指定の評価でも、評価で実際に使ったシードとバージョンで同じデータセットを作る
+                    used_params = {
+                        **params,
+                        "seed": result["parameters"]["seed"],
+                        "dataset_version": result["parameters"]["dataset_version"],
+                    }
+                    comparison = evaluation_pool.submit(
+                        compare_classifiers, used_params, None, n_jobs
+                    ).result()
+                classifier_df = pd.DataFrame(comparison)
+                classifier_df["classifier"] = classifier_df["classifier"].map(CLASSIFIERS)
+                classifier_df = classifier_df.set_index("classifier")
+                st.dataframe(classifier_df.style.format("{:.3f}"), use_container_width=True)
+                st.caption("1回目の評価と同じShadow・評価用データセットの特徴量で学習・採点した結果です。")
+                
+                import matplotlib.pyplot as plt
+                
+                fig, ax = plt.subplots(figsize=(8, 5))
+                ax.scatter(classifier_df["train_seconds"], classifier_df["auc"], s=80)
+                for name, row in classifier_df.iterrows():
+                    ax.annotate(name, (row["train_seconds"], row["auc"]), textcoords="offset points", xytext=(5, 5))
+                ax.set_xlabel('学習時間（秒）')
+                ax.set_ylabel('AUC')
+                ax.set_title('学習時間と攻撃性能のトレードオフ')
+                ax.grid(True, alpha=0.3)
+                st.pyplot(fig)
             
         except Exception as e:
             st.error(f"評価中にエラーが発生しました: {e}")
@@ -1,9 +1,12 @@
+import time
+
+# 表示開始までの時間の計測起点（インポートを含める）
+PAGE_STARTED = time.perf_counter()
+
 import streamlit as st
 import pandas as pd
 import json
 import sys
-import matplotlib.pyplot as plt
-import seaborn as sns
 from pathlib import Path
 import base64
 from io import BytesIO
@@ -14,6 +17,17 @@ tapas_path = Path(__file__).parent.parent / "tapas"
 if str(tapas_path) not in sys.path:
     sys.path.insert(0, str(tapas_path))
 
+# 共通モジュールのパス追加
+project_path = Path(__file__).parent.parent
+if str(project_path) not in sys.path:
+    sys.path.insert(0, str(project_path))
+
+from core.datasets import read_json
+from core.evaluation import attack_views, load_results, pooled_samples
+from core.metrics import LOW_FPR_LEVELS, binary_metrics, bootstrap_intervals, roc_curve
+from core.frontier import list_frontiers
+from core.startup import record_first_paint
+
 st.set_page_config(
     page_title="レポート - TAPAS",
     page_icon="📄",
@@ -22,39 +36,69 @@ st.set_page_config(
 
 st.title("📄 プライバシー評価レポート")
 st.write("実行した評価の結果を確認し、レポートを生成します。")
+record_first_paint("reports", PAGE_STARTED)
 
 # データディレクトリ
 RESULTS_DIR = Path("data/results")
 
-# 結果ファイルの取得
-result_files = []
-if RESULTS_DIR.exists():
-    result_files = list(RESULTS_DIR.glob("*.json"))
+# 結果ファイルの取得（ページの表示中に他のジョブが結果を追加・削除しても、最初に読んだ内容だけを使う）
+# 複数攻撃モードの結果は攻撃ごとに分け、(ファイル, 攻撃種別) をキーにして単一攻撃の結果と同じように扱う
+result_files = load_results(RESULTS_DIR)
+results = {
+    (str(file), view['attack_type']): view
+    for file, data in result_files
+    for view in attack_views(data)
+}
+frontier_files = list_frontiers(RESULTS_DIR / "frontiers")
 
-if not result_files:
+if not result_files and not frontier_files:
     st.warning("評価結果がありません。プライバシー評価を実行してください。")
     st.stop()
 
+
+def summary_metrics(data):
+    # 全実行をまとめた指標がJSONにあればそれを使い、なければ実行ごとの値の平均を使う
+    if 'summary' in data:
+        return pd.Series(data['summary'])
+    if 'samples' in data:
+        return pd.Series(binary_metrics(*pooled_samples(data)))
+    return pd.DataFrame(data['results']).mean(numeric_only=True)
+
+
+def has_samples(data):
+    return 'samples' in data or 'samples_file' in data
+
+
+# 保存済みの結果は上書きされないので、サンプルの読み込みと信頼区間の計算はファイルごとに1度だけ行う
+@st.cache_data(show_spinner="サンプルを読み込み中...")
+def load_pooled_samples(key):
+    return pooled_samples(results[key], Path(key[0]).parent)
+
+
+@st.cache_data(show_spinner="信頼区間を計算中...")
+def metric_intervals(key, num_resamples=1000):
+    return bootstrap_intervals(*load_pooled_samples(key), num_resamples=num_resamples)
+
+
 # タブ作成
-tab1, tab2, tab3 = st.tabs(["📊 個別レポート", "📈 比較分析", "📥 レポートダウンロード"])
+tab1, tab2, tab3, tab4 = st.tabs(["📊 個別レポート", "📈 比較分析", "📥 レポートダウンロード", "🎯 プライバシーと有用性"])
 
 with tab1:
     st.header("個別評価レポート")
     
     # 評価結果の選択
     result_options = {}
-    for file in result_files:
-        with open(file) as f:
-            data = json.load(f)
-            label = f"{data['dataset']} - {data['attack_type']} ({data['timestamp'][:19]})"
-            result_options[label] = file
+    for key, data in results.items():
+        label = f"{data['dataset']} - {data['attack_type']} ({data['timestamp'][:19]})"
+        if 'attacks' in data:
+            label += " [複数攻撃]"
+        result_options[label] = key
     
     selected_result = st.selectbox("評価結果を選択", list(result_options.keys()))
     
     if selected_result:
         # 選択された結果の読み込み
-        with open(result_options[selected_result]) as f:
-            result_data = json.load(f)
+        result_data = results[result_options[selected_result]]
         
         # 基本情報の表示
         st.subheader("評価概要")
@@ -62,6 +106,8 @@ with tab1:
         
         with col1:
             st.write("**データセット:**", result_data['dataset'])
+            if result_data['parameters'].get('dataset_version') is not None:
+                st.write("**バージョン:**", f"v{result_data['parameters']['dataset_version']}")
             st.write("**攻撃タイプ:**", result_data['attack_type'])
         
         with col2:
@@ -76,19 +122,37 @@ with tab1:
         st.subheader("評価メトリクス")
         
         results_df = pd.DataFrame(result_data['results'])
-        avg_metrics = results_df.mean(numeric_only=True)
-        
-        col1, col2, col3, col4, col5 = st.columns(5)
-        with col1:
-            st.metric("平均精度", f"{avg_metrics['accuracy']:.3f}")
-        with col2:
-            st.metric("平均適合率", f"{avg_metrics['precision']:.3f}")
-        with col3:
-            st.metric("平均再現率", f"{avg_metrics['recall']:.3f}")
-        with col4:
-            st.metric("平均F1スコア", f"{avg_metrics['f1_score']:.3f}")
-        with col5:
-            st.metric("平均AUC", f"{avg_metrics['auc']:.3f}")
+        avg_metrics = summary_metrics(result_data)
+        # サンプルごとのスコア（別ファイル）は信頼区間とROC曲線のためにここで初めて読み込む
+        samples = load_pooled_samples(result_options[selected_result]) if has_samples(result_data) else None
+        
+        if samples is not None:
+            # 全実行のサンプルをまとめた値と、ブートストラップによる95%信頼区間
+            st.caption(f"全実行の {len(samples[0]):,} サンプルから計算した値（括弧内はブートストラップによる95%信頼区間）")
+            intervals = metric_intervals(result_options[selected_result])
+            metric_labels = {
+                'accuracy': "精度", 'precision': "適合率", 'recall': "再現率", 'f1_score': "F1スコア", 'auc': "AUC",
+                'advantage': "Advantage",
+                **{f"tpr_at_fpr_{level:g}": f"TPR (FPR≤{level:.1%})" for level in LOW_FPR_LEVELS},
+            }
+            columns = st.columns(4)
+            for idx, (metric, label) in enumerate(metric_labels.items()):
+                low, high = intervals[metric]
+                with columns[idx % 4]:
+                    st.metric(label, f"{avg_metrics[metric]:.3f}")
+                    st.caption(f"[{low:.3f}, {high:.3f}]")
+        else:
+            col1, col2, col3, col4, col5 = st.columns(5)
+            with col1:
+                st.metric("平均精度", f"{avg_metrics['accuracy']:.3f}")
+            with col2:
+                st.metric("平均適合率", f"{avg_metrics['precision']:.3f}")
+            with col3:
+                st.metric("平均再現率", f"{avg_metrics['recall']:.3f}")
+            with col4:
+                st.metric("平均F1スコア", f"{avg_metrics['f1_score']:.3f}")
+            with col5:
+                st.metric("平均AUC", f"{avg_metrics['auc']:.3f}")
         
         # 詳細テーブル
         st.subheader("実行ごとの詳細結果")
@@ -96,6 +160,8 @@ with tab1:
         
         # メトリクスのプロット
         st.subheader("メトリクスの推移")
+        import matplotlib.pyplot as plt
+        
         fig, axes = plt.subplots(2, 3, figsize=(15, 10))
         axes = axes.flatten()
         
@@ -114,6 +180,29 @@ with tab1:
         plt.tight_layout()
         st.pyplot(fig)
         
+        if samples is not None:
+            # ROC曲線（低FPR領域が見えるよう両対数軸でも表示する）
+            st.subheader("ROC曲線")
+            fpr, tpr, _ = roc_curve(samples[0], samples[1])
+            fig, axes = plt.subplots(1, 2, figsize=(12, 5))
+            for ax, log_scale in zip(axes, [False, True]):
+                ax.plot(fpr, tpr, linewidth=2, label=f"AUC = {avg_metrics['auc']:.3f}")
+                ax.plot([1e-4, 1], [1e-4, 1], '--', color='gray', label="ランダム")
+                ax.set_xlabel('偽陽性率 (FPR)')
+                ax.set_ylabel('真陽性率 (TPR)')
+                if log_scale:
+                    ax.set_xscale('log')
+                    ax.set_yscale('log')
+                    ax.set_xlim(1e-4, 1)
+                    ax.set_ylim(1e-4, 1)
+                    ax.set_title('ROC曲線（両対数）')
+                else:
+                    ax.set_title('ROC曲線')
+                ax.legend()
+                ax.grid(True, alpha=0.3)
+            plt.tight_layout()
+            st.pyplot(fig)
+        
         # リスク評価
         st.subheader("プライバシーリスク評価")
         
@@ -152,21 +241,22 @@ with tab2:
         # 選択された結果のデータを読み込み
         comparison_data = []
         for result_label in selected_results:
-            with open(result_options[result_label]) as f:
-                data = json.load(f)
-                avg_metrics = pd.DataFrame(data['results']).mean(numeric_only=True)
-                comparison_data.append({
-                    'label': f"{data['dataset']} - {data['attack_type']}",
-                    'accuracy': avg_metrics['accuracy'],
-                    'precision': avg_metrics['precision'],
-                    'recall': avg_metrics['recall'],
-                    'f1_score': avg_metrics['f1_score'],
-                    'auc': avg_metrics['auc']
-                })
+            data = results[result_options[result_label]]
+            avg_metrics = summary_metrics(data)
+            comparison_data.append({
+                'label': f"{data['dataset']} - {data['attack_type']}",
+                'accuracy': avg_metrics['accuracy'],
+                'precision': avg_metrics['precision'],
+                'recall': avg_metrics['recall'],
+                'f1_score': avg_metrics['f1_score'],
+                'auc': avg_metrics['auc']
+            })
         
         comparison_df = pd.DataFrame(comparison_data)
         
         # 比較プロット
+        import matplotlib.pyplot as plt
+        
         fig, ax = plt.subplots(figsize=(12, 8))
         
         # 各メトリクスのバープロット
@@ -219,6 +309,8 @@ with tab2:
         display_df = comparison_df.set_index('label')
         
         # カラーマップで視覚化
+        import seaborn as sns
+        
         cm = sns.light_palette("green", as_cmap=True)
         styled_df = display_df.style.background_gradient(cmap=cm)
         
@@ -238,8 +330,7 @@ with tab3:
     )
     
     if selected_report:
-        with open(result_options[selected_report]) as f:
-            result_data = json.load(f)
+        result_data = results[result_options[selected_report]]
         
         # レポートフォーマットの選択
         report_format = st.radio(
@@ -263,15 +354,30 @@ with tab3:
         # レポート生成ボタン
         if st.button("レポートを生成", type="primary"):
             try:
+                # 生データ（サンプルごとのラベルとスコア）はエクスポートする場合だけ読み込む
+                raw_samples = None
+                if include_raw_data and has_samples(result_data):
+                    raw_samples = pooled_samples(result_data, Path(result_options[selected_report][0]).parent)
+                
                 if report_format == "JSON":
                     # JSONフォーマット
-                    report_content = json.dumps(result_data, indent=2, ensure_ascii=False)
+                    report_data = dict(result_data)
+                    if raw_samples is not None:
+                        labels, scores, predictions = raw_samples
+                        report_data['samples'] = {
+                            'labels': labels.tolist(), 'scores': scores.tolist(), 'predictions': predictions.tolist()
+                        }
+                    report_content = json.dumps(report_data, indent=2, ensure_ascii=False)
                     file_name = f"privacy_report_{result_data['id']}.json"
                     mime_type = "application/json"
                     
                 elif report_format == "CSV":
                     # CSVフォーマット
                     results_df = pd.DataFrame(result_data['results'])
+                    if raw_samples is not None:
+                        # 生データを含める場合はサンプルごとの行にする
+                        labels, scores, predictions = raw_samples
+                        results_df = pd.DataFrame({'label': labels, 'score': scores, 'prediction': predictions})
                     csv_buffer = BytesIO()
                     results_df.to_csv(csv_buffer, index=False, encoding='utf-8')
                     report_content = csv_buffer.getvalue()
@@ -310,7 +416,7 @@ with tab3:
                     """
                     
                     # メトリクスの追加
-                    avg_metrics = pd.DataFrame(result_data['results']).mean(numeric_only=True)
+                    avg_metrics = summary_metrics(result_data)
                     for metric, value in avg_metrics.items():
                         html_content += f'<div class="metric">{metric}: {value:.3f}</div>'
                     
@@ -372,6 +478,54 @@ with tab3:
             except Exception as e:
                 st.error(f"レポート生成中にエラーが発生しました: {e}")
 
+with tab4:
+    st.header("プライバシーと有用性のトレードオフ")
+    
+    if frontier_files:
+        frontier_options = {}
+        for file in frontier_files:
+            data = read_json(file)
+            if data is None:
+                continue
+            label = f"{data['dataset']} - {data['generator']} / {data['parameter']} ({data['timestamp'][:19]})"
+            frontier_options[label] = data
+        
+        selected_frontier = st.selectbox("スイープ結果を選択", list(frontier_options.keys()))
+        frontier = frontier_options[selected_frontier]
+        risk_metric, fidelity_metric = frontier["risk_metric"], frontier["fidelity_metric"]
+        
+        points_df = pd.DataFrame([
+            {
+                frontier["parameter"]: point["value"],
+                risk_metric: point["privacy"][risk_metric],
+                fidelity_metric: point["fidelity"][fidelity_metric],
+                "pareto": point["pareto"],
+            }
+            for point in frontier["points"]
+        ])
+        
+        import matplotlib.pyplot as plt
+        
+        fig, ax = plt.subplots(figsize=(10, 6))
+        ax.scatter(points_df[fidelity_metric], points_df[risk_metric], color="gray", label="評価点")
+        pareto_df = points_df[points_df["pareto"]].sort_values(fidelity_metric)
+        ax.plot(pareto_df[fidelity_metric], pareto_df[risk_metric], "o-", color="red", linewidth=2, label="パレートフロンティア")
+        for _, row in points_df.iterrows():
+            ax.annotate(f"{row[frontier['parameter']]}", (row[fidelity_metric], row[risk_metric]),
+                        textcoords="offset points", xytext=(5, 5))
+        ax.set_xlabel(f"分布のずれ（{fidelity_metric}）")
+        ax.set_ylabel(f"プライバシーリスク（{frontier['attack_type']} の {risk_metric}）")
+        ax.set_title(f"{frontier['generator']} の {frontier['parameter']} によるトレードオフ")
+        ax.legend()
+        ax.grid(True, alpha=0.3)
+        
+        plt.tight_layout()
+        st.pyplot(fig)
+        
+        st.dataframe(points_df, hide_index=True, use_container_width=True)
+    else:
+        st.info("スイープ結果がありません。合成データ生成ツールのパラメータスイープを実行してください。")
+
 # サイドバー
 st.sidebar.header("📊 レポート統計")
 
@@ -383,14 +537,14 @@ if result_files:
     dataset_counts = {}
     attack_counts = {}
     
-    for file in result_files:
-        with open(file) as f:
-            data = json.load(f)
-            dataset = data['dataset']
-            attack = data['attack_type']
-            
-            dataset_counts[dataset] = dataset_counts.get(dataset, 0) + 1
-            attack_counts[attack] = attack_counts.get(attack, 0) + 1
+    for _, data in result_files:
+        dataset = data['dataset']
+        dataset_counts[dataset] = dataset_counts.get(dataset, 0) + 1
+    
+    # 複数攻撃モードの結果は含まれる攻撃ごとに数える
+    for data in results.values():
+        attack = data['attack_type']
+        attack_counts[attack] = attack_counts.get(attack, 0) + 1
     
     st.sidebar.metric("総評価数", total_evaluations)
     
@@ -403,9 +557,7 @@ if result_files:
         st.sidebar.write(f"• {attack}: {count}回")
     
     # 最新の評価
-    latest_file = max(result_files, key=lambda f: f.stat().st_mtime)
-    with open(latest_file) as f:
-        latest_data = json.load(f)
+    latest_data = max(results.values(), key=lambda data: data['timestamp'])
     
     st.sidebar.subheader("最新の評価")
     st.sidebar.write(f"**データセット:** {latest_data['dataset']}")
@@ -414,16 +566,14 @@ if result_files:
     
     # 平均リスクレベル
     risk_levels = []
-    for file in result_files:
-        with open(file) as f:
-            data = json.load(f)
-            avg_accuracy = pd.DataFrame(data['results']).mean(numeric_only=True)['accuracy']
-            if avg_accuracy > 0.9:
-                risk_levels.append(3)  # 高
-            elif avg_accuracy > 0.7:
-                risk_levels.append(2)  # 中
-            else:
-                risk_levels.append(1)  # 低
+    for data in results.values():
+        avg_accuracy = summary_metrics(data)['accuracy']
+        if avg_accuracy > 0.9:
+            risk_levels.append(3)  # 高
+        elif avg_accuracy > 0.7:
+            risk_levels.append(2)  # 中
+        else:
+            risk_levels.append(1)  # 低
     
     avg_risk = sum(risk_levels) / len(risk_levels) if risk_levels else 0
     
@@ -0,0 +1,137 @@
+"""Streamlitを介さずにプライバシー評価のスイープを実行するコマンドラインツール
+
+使用例:
+    python run_batch_evaluation.py --spec sweep.json --workers 4
+    python run_batch_evaluation.py --datasets adult_dataset --attacks "Groundhog Attack" \
+        --auxiliary-split 0.3 0.5 --num-samples 100 200 --workers 4
+
+スイープ仕様（JSON）の例:
+    {
+        "datasets": ["adult_dataset"],
+        "generators": ["Raw (コピー)", {"method": "ノイズ付加", "noise_level": 0.1}],
+        "attacks": ["Groundhog Attack", "Closest Distance Attack"],
+        "auxiliary_split": [0.3, 0.5],
+        "num_samples": [100],
+        "num_training_records": 1000,
+        "num_synthetic_records": 1000,
+        "evaluation_runs": 3
+    }
+
+評価サンプル数を信頼区間の幅で決める場合は "adaptive" を指定する:
+    "adaptive": {"metric": "auc", "tolerance": 0.05, "batch_size": 50, "max_samples": 1000}
+
+シードを指定すると結果はビット単位で再現でき、同じ設定の保存済み結果がある評価は実行しない:
+    python run_batch_evaluation.py --spec sweep.json --seed 42
+保存済みの結果を記録されたシードで再実行し、一致を確認する:
+    python run_batch_evaluation.py --replay data/results/adult_dataset_Groundhog_Attack_20240101_120000.json
+"""
+import argparse
+import json
+import sys
+from pathlib import Path
+
+from core.batch import expand_sweep, run_batch
+from core.evaluation import (
+    RESULTS_DIR, evaluation_checkpoint, replay_result, result_keys, save_result, saved_config_keys,
+)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="TAPASプライバシー評価のバッチ実行")
+    parser.add_argument("--spec", type=Path, help="スイープ仕様のJSONファイル")
+    parser.add_argument("--datasets", nargs="+", help="評価するデータセット名")
+    parser.add_argument("--generators", nargs="+", help="合成データ生成手法")
+    parser.add_argument("--attacks", nargs="+", help="攻撃種別")
+    parser.add_argument("--auxiliary-split", nargs="+", type=float, help="補助データの割合")
+    parser.add_argument("--num-samples", nargs="+", type=int, help="評価サンプル数")
+    parser.add_argument("--evaluation-runs", type=int, help="各設定の評価実行回数")
+    parser.add_argument("--seed", type=int, help="乱数シード（同じ設定の保存済み結果があれば再利用する）")
+    parser.add_argument("--workers", type=int, default=1, help="並列ワーカー数")
+    parser.add_argument(
+        "--checkpoint-every",
+        type=int,
+        help="途中経過を保存する間隔（サンプルのペア数）。再実行時は続きから再開する",
+    )
+    parser.add_argument("--results-dir", type=Path, default=RESULTS_DIR, help="結果の保存先")
+    parser.add_argument("--dry-run", action="store_true", help="展開されたジョブを表示して終了")
+    parser.add_argument("--replay", nargs="+", type=Path, help="保存済みの結果を再実行して一致を確認する")
+    return parser.parse_args(argv)
+
+
+def build_spec(args):
+    spec = {}
+    if args.spec:
+        with open(args.spec) as f:
+            spec = json.load(f)
+
+    # コマンドライン引数は仕様ファイルの値を上書きする
+    overrides = {
+        "datasets": args.datasets,
+        "generators": args.generators,
+        "attacks": args.attacks,
+        "auxiliary_split": args.auxiliary_split,
+        "num_samples": args.num_samples,
+        "evaluation_runs": args.evaluation_runs,
+        "seed": args.seed,
+    }
+    spec.update({key: value for key, value in overrides.items() if value is not None})
+    return spec
+
+
+def replay(paths):
+    mismatches = 0
+    for path in paths:
+        with open(path) as f:
+            result = json.load(f)
+        _, identical = replay_result(result)
+        if not identical:
+            mismatches += 1
+        print(f"{'一致' if identical else '不一致'}: {path}")
+    return 1 if mismatches else 0
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.replay:
+        return replay(args.replay)
+
+    jobs = expand_sweep(build_spec(args))
+    # シードを固定したジョブは、同じ設定の結果が既にあれば実行しない
+    saved = saved_config_keys(args.results_dir) if any(job.get("seed") is not None for job in jobs) else set()
+    existing = set()
+    for index, job in enumerate(jobs):
+        if job.get("seed") is None or not saved:
+            continue
+        try:
+            if result_keys(job) & saved:
+                existing.add(index)
+        except Exception as e:
+            # 照合できないジョブ（読み込めないデータセットなど）は実行に回し、失敗として報告する
+            print(f"保存済みの結果と照合できません: {job['dataset']}: {e}", file=sys.stderr)
+    if existing:
+        print(f"{len(existing)} 件は保存済みの結果があるためスキップします")
+        jobs = [job for index, job in enumerate(jobs) if index not in existing]
+    print(f"{len(jobs)} 件の評価ジョブを実行します（ワーカー数: {args.workers}）")
+
+    if args.dry_run:
+        for job in jobs:
+            print(json.dumps(job, ensure_ascii=False))
+        return 0
+
+    failures = 0
+    for done, (job, result, error) in enumerate(run_batch(jobs, args.workers, args.checkpoint_every), start=1):
+        label = f"{job['dataset']} / {job['generator']} / {job['attack_type']}"
+        if error is not None:
+            failures += 1
+            print(f"[{done}/{len(jobs)}] 失敗: {label}: {error}", file=sys.stderr)
+            continue
+        path = save_result(result, args.results_dir)
+        if args.checkpoint_every:
+            evaluation_checkpoint(job).clear()
+        print(f"[{done}/{len(jobs)}] 完了: {label} -> {path}")
+
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,14 +1,15 @@
 import streamlit as st
-import pandas as pd
+import numpy as np
 import sys
 from pathlib import Path
-import json
 
 # TAPASパスの追加
 tapas_path = Path(__file__).parent / "tapas"
 if str(tapas_path) not in sys.path:
     sys.path.insert(0, str(tapas_path))
 
+from core.datasets import dataset_version, list_datasets, load_columns, load_dataframe
+
 st.title("TAPAS実装例：完全なプライバシー評価")
 
 st.write("""
@@ -84,15 +85,7 @@ st.header("2. 評価のデモンストレーション")
 
 # データセット選択
 DATA_DIR = Path("data/uploaded")
-datasets = []
-if DATA_DIR.exists():
-    for dataset_dir in DATA_DIR.iterdir():
-        if dataset_dir.is_dir():
-            metadata_path = dataset_dir / "metadata.json"
-            if metadata_path.exists():
-                with open(metadata_path) as f:
-                    metadata = json.load(f)
-                    datasets.append(metadata)
+datasets = list_datasets(DATA_DIR)
 
 if datasets:
     col1, col2 = st.columns(2)
@@ -114,25 +107,25 @@ if datasets:
             key="synth"
         )
     
+    # TAPASは内部でグローバルな乱数状態を使うので、実行前にシードを設定して結果を再現できるようにする
+    demo_seed = st.number_input("ランダムシード", min_value=0, value=42)
+    
     if st.button("評価を実行"):
         try:
-            # 1. データセットの読み込み
+            # 1. データセットの読み込み（追記したパーティションを含む最新のバージョン）
             original_dir = DATA_DIR / original_dataset
-            synthetic_dir = DATA_DIR / synthetic_dataset
+            original_version = dataset_version(original_dataset, DATA_DIR)
+            original_df = load_dataframe(original_dataset, DATA_DIR, version=original_version)
+            
+            from tapas.datasets import DataDescription, TabularDataset
             
             # TAPASデータセットとして読み込み
             if (original_dir / f"{original_dataset}.json").exists():
-                original_data = tapas.datasets.TabularDataset.read(
-                    str(original_dir / original_dataset),
-                    label="Original Data"
-                )
+                # バージョンを作った時点の列定義（追記で広げた列定義を含む）を使う
+                columns = load_columns(original_dataset, original_df, DATA_DIR, version=original_version)
             else:
                 # CSVのみの場合は簡易的に読み込み
                 st.warning("TAPAS記述ファイルが見つかりません。簡易モードで読み込みます。")
-                original_df = pd.read_csv(original_dir / f"{original_dataset}.csv")
-                
-                # 簡易的なTAPASデータセット作成
-                from tapas.datasets import DataDescription, TabularRecord
                 
                 # データ記述の作成
                 columns = []
@@ -145,17 +138,17 @@ if datasets:
                         col_type = 'Categorical'
                     
                     columns.append({"name": col, "type": col_type})
-                
-                description = DataDescription({"columns": columns})
-                
-                # レコードの作成
-                records = []
-                for _, row in original_df.iterrows():
-                    records.append(TabularRecord(row.to_dict()))
-                
-                # データセットの作成
-                from tapas.datasets import Dataset
-                original_data = Dataset(records, description, label="Original Data")
+            
+            description = DataDescription({"columns": columns})
+            
+            # カテゴリカル列はcategory型にして、レコードごとのオブジェクトを作らずに保持
+            for col in columns:
+                if col["type"] == 'Categorical':
+                    original_df[col["name"]] = original_df[col["name"]].astype('category')
+            
+            # データセットの作成
+            original_data = TabularDataset(original_df, description, label="Original Data")
+            st.caption(f"オリジナルデータ: {original_dataset}（バージョン {original_version}）")
             
             # 2. ジェネレータの設定（実際には合成データを読み込む）
             generator = tapas.generators.Raw()
@@ -164,6 +157,8 @@ if datasets:
             st.write("### Membership Inference Attack (MIA) 評価")
             
             with st.spinner("評価を実行中..."):
+                np.random.seed(int(demo_seed))
+                
                 # 攻撃者の知識設定
                 data_knowledge = tapas.threat_models.AuxiliaryDataKnowledge(
                     original_data,
@@ -192,6 +187,7 @@ if datasets:
                 
                 # 結果表示
                 st.success("評価が完了しました！")
+                st.caption(f"ランダムシード: {int(demo_seed)}（同じシードで再実行すると同じ結果になります）")
                 
                 # 結果の取得（resultsの形式に依存）
                 if hasattr(results, 'get_metrics'):
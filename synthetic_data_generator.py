@@ -3,13 +3,21 @@ import pandas as pd
 import numpy as np
 import sys
 from pathlib import Path
-import json
 
 # TAPASパスの追加
 tapas_path = Path(__file__).parent / "tapas"
 if str(tapas_path) not in sys.path:
     sys.path.insert(0, str(tapas_path))
 
+from core.datasets import (
+    alias_dataset, atomic_write, dataset_lock, list_datasets, load_dataframe, save_metadata, store_dataframe,
+)
+from core.generators import GENERATION_METHODS, generate_synthetic
+from core.fidelity import fidelity_report
+from core.frontier import PARAMETER_GRIDS, run_frontier, save_frontier
+from core.stats import dataset_stats, numeric_moments, save_stats, write_stats
+from core.workers import shared_pool
+
 st.title("合成データ生成ツール")
 
 st.write("""
@@ -35,15 +43,7 @@ with st.expander("合成データ生成手法について", expanded=True):
 
 # データセット選択
 DATA_DIR = Path("data/uploaded")
-datasets = []
-if DATA_DIR.exists():
-    for dataset_dir in DATA_DIR.iterdir():
-        if dataset_dir.is_dir():
-            metadata_path = dataset_dir / "metadata.json"
-            if metadata_path.exists():
-                with open(metadata_path) as f:
-                    metadata = json.load(f)
-                    datasets.append(metadata)
+datasets = list_datasets(DATA_DIR)
 
 if not datasets:
     st.warning("利用可能なデータセットがありません。")
@@ -55,8 +55,7 @@ selected_dataset = st.selectbox("オリジナルデータセット", dataset_nam
 
 # データの読み込み
 dataset_dir = DATA_DIR / selected_dataset
-csv_path = dataset_dir / f"{selected_dataset}.csv"
-df = pd.read_csv(csv_path)
+df = load_dataframe(selected_dataset, DATA_DIR)
 
 st.write(f"データセットサイズ: {len(df)} レコード、{len(df.columns)} 列")
 st.dataframe(df.head())
@@ -65,7 +64,7 @@ st.dataframe(df.head())
 st.header("2. 生成手法の選択")
 generation_method = st.selectbox(
     "合成データ生成手法",
-    ["Raw (コピー)", "ノイズ付加", "データ置換", "k-匿名化（簡易版）", "差分プライバシー（簡易版）"]
+    GENERATION_METHODS
 )
 
 # パラメータ設定
@@ -90,6 +89,9 @@ elif generation_method == "差分プライバシー（簡易版）":
     epsilon = st.slider("プライバシーパラメータ (ε)", 0.1, 10.0, 1.0)
     st.info("εが小さいほどプライバシー保護が強くなりますが、データの有用性は低下します。")
 
+fix_seed = st.checkbox("乱数シードを固定する", value=True, help="同じシードなら同じ合成データが再現されます")
+generation_seed = st.number_input("ランダムシード", min_value=0, value=42) if fix_seed else None
+
 # 生成実行
 st.header("4. 合成データ生成")
 
@@ -103,103 +105,63 @@ if st.button("合成データを生成", type="primary"):
     with st.spinner("合成データを生成中..."):
         try:
             # 合成データの生成
-            if generation_method == "Raw (コピー)":
-                synthetic_df = df.copy()
-                
-            elif generation_method == "ノイズ付加":
-                synthetic_df = df.copy()
-                
-                # 数値列にノイズを追加
-                numeric_cols = df.select_dtypes(include=[np.number]).columns
-                for col in numeric_cols:
-                    if noise_type == "ガウシアン":
-                        noise = np.random.normal(0, noise_level * df[col].std(), size=len(df))
-                    elif noise_type == "ラプラス":
-                        noise = np.random.laplace(0, noise_level * df[col].std(), size=len(df))
-                    else:  # 一様分布
-                        noise = np.random.uniform(-noise_level * df[col].std(), 
-                                                noise_level * df[col].std(), 
-                                                size=len(df))
-                    synthetic_df[col] = df[col] + noise
-            
-            elif generation_method == "データ置換":
-                synthetic_df = df.copy()
-                
-                # カテゴリカル列の値をランダムに置換
-                categorical_cols = df.select_dtypes(include=['object']).columns
-                for col in categorical_cols:
-                    mask = np.random.random(len(df)) < replacement_rate
-                    unique_values = df[col].unique()
-                    synthetic_df.loc[mask, col] = np.random.choice(unique_values, sum(mask))
-            
-            elif generation_method == "k-匿名化（簡易版）":
-                synthetic_df = df.copy()
+            if generation_method == "k-匿名化（簡易版）":
                 st.warning("簡易実装：実際のk-匿名化アルゴリズムではありません")
-                
-                # 準識別子の一般化（簡易版）
-                for col in quasi_identifiers:
-                    if df[col].dtype in ['int64', 'float64']:
-                        # 数値の場合：範囲に一般化
-                        bins = pd.qcut(df[col], q=len(df)//k_value, duplicates='drop')
-                        synthetic_df[col] = bins
-                    else:
-                        # カテゴリカルの場合：頻度の低い値を「その他」に
-                        value_counts = df[col].value_counts()
-                        rare_values = value_counts[value_counts < k_value].index
-                        synthetic_df.loc[synthetic_df[col].isin(rare_values), col] = "その他"
-            
             elif generation_method == "差分プライバシー（簡易版）":
-                synthetic_df = df.copy()
                 st.warning("簡易実装：実際の差分プライバシーアルゴリズムではありません")
-                
-                # 数値列にラプラスノイズを追加
-                numeric_cols = df.select_dtypes(include=[np.number]).columns
-                for col in numeric_cols:
-                    sensitivity = df[col].max() - df[col].min()
-                    scale = sensitivity / epsilon
-                    noise = np.random.laplace(0, scale, size=len(df))
-                    synthetic_df[col] = df[col] + noise
-            
-            else:
-                synthetic_df = df.copy()
-            
-            # 合成データの保存
-            output_dir = DATA_DIR / output_name
-            output_dir.mkdir(exist_ok=True)
-            
-            # CSVファイルの保存
-            csv_path = output_dir / f"{output_name}.csv"
-            synthetic_df.to_csv(csv_path, index=False)
             
-            # メタデータの保存
-            metadata = {
-                "name": output_name,
-                "description": f"Synthetic data generated from {selected_dataset} using {generation_method}",
-                "original_dataset": selected_dataset,
-                "generation_method": generation_method,
-                "generation_params": {
-                    "method": generation_method,
-                    "noise_level": noise_level if generation_method == "ノイズ付加" else None,
-                    "replacement_rate": replacement_rate if generation_method == "データ置換" else None,
-                    "k_value": k_value if generation_method == "k-匿名化（簡易版）" else None,
-                    "epsilon": epsilon if generation_method == "差分プライバシー（簡易版）" else None,
-                },
-                "rows": len(synthetic_df),
-                "columns": len(synthetic_df.columns),
-                "column_names": synthetic_df.columns.tolist(),
-                "dtypes": synthetic_df.dtypes.astype(str).to_dict(),
-                "generation_date": pd.Timestamp.now().isoformat()
+            generation_params = {
+                "noise_level": noise_level if generation_method == "ノイズ付加" else None,
+                "noise_type": noise_type if generation_method == "ノイズ付加" else None,
+                "replacement_rate": replacement_rate if generation_method == "データ置換" else None,
+                "k_value": k_value if generation_method == "k-匿名化（簡易版）" else None,
+                "quasi_identifiers": quasi_identifiers if generation_method == "k-匿名化（簡易版）" else None,
+                "epsilon": epsilon if generation_method == "差分プライバシー（簡易版）" else None,
             }
+            # シード未指定でも、使ったシードをメタデータに記録して再現できるようにする
+            seed = int(generation_seed) if generation_seed is not None else int(np.random.SeedSequence().entropy % 2**32)
+            synthetic_df = generate_synthetic(
+                df,
+                generation_method,
+                {key: value for key, value in generation_params.items() if value is not None},
+                rng=np.random.default_rng(seed)
+            )
+            generation_params["seed"] = seed
             
-            metadata_path = output_dir / "metadata.json"
-            with open(metadata_path, "w") as f:
-                json.dump(metadata, f, indent=2)
-            
-            # TAPAS記述ファイルもコピー（存在する場合）
-            original_json_path = dataset_dir / f"{selected_dataset}.json"
-            if original_json_path.exists():
-                import shutil
-                shutil.copy(original_json_path, output_dir / f"{output_name}.json")
+            # 合成データの保存（同じ名前への同時の保存と、保存途中のファイルの読み込みを防ぐ）
+            output_dir = DATA_DIR / output_name
+            with dataset_lock(output_name, DATA_DIR):
+                # CSVファイルの保存（Rawはオリジナルと同じ内容なので、コピーせずに別名で参照する）
+                if generation_method == "Raw (コピー)":
+                    alias_dataset(output_name, selected_dataset, DATA_DIR)
+                    synthetic_stats = save_stats(output_name, dataset_stats(selected_dataset, DATA_DIR), DATA_DIR)
+                else:
+                    store_dataframe(output_name, synthetic_df, DATA_DIR)
+                    synthetic_stats = write_stats(output_name, synthetic_df, DATA_DIR)
+                
+                # TAPAS記述ファイルもコピー（存在する場合）
+                original_json_path = dataset_dir / f"{selected_dataset}.json"
+                if original_json_path.exists():
+                    with open(original_json_path, "rb") as src, atomic_write(output_dir / f"{output_name}.json", "wb") as dst:
+                        dst.write(src.read())
+                
+                # メタデータの保存（一覧にはメタデータが揃ったデータセットだけが表示される）
+                metadata = {
+                    "name": output_name,
+                    "description": f"Synthetic data generated from {selected_dataset} using {generation_method}",
+                    "original_dataset": selected_dataset,
+                    "generation_method": generation_method,
+                    "generation_params": {
+                        "method": generation_method,
+                        **generation_params,
+                    },
+                    "rows": len(synthetic_df),
+                    "columns": len(synthetic_df.columns),
+                    "column_names": synthetic_df.columns.tolist(),
+                    "dtypes": synthetic_df.dtypes.astype(str).to_dict(),
+                    "generation_date": pd.Timestamp.now().isoformat()
+                }
+                save_metadata(output_name, metadata, DATA_DIR)
             
             st.success(f"✅ 合成データが生成されました: {output_name}")
             
@@ -217,16 +179,40 @@ if st.button("合成データを生成", type="primary"):
             # 基本統計量の比較
             st.write("### 基本統計量の比較")
             
-            numeric_cols = df.select_dtypes(include=[np.number]).columns
-            if len(numeric_cols) > 0:
+            original_stats = dataset_stats(selected_dataset, DATA_DIR)
+            original_moments = numeric_moments(original_stats)
+            synthetic_moments = numeric_moments(synthetic_stats)
+            if len(original_moments) > 0:
                 stats_comparison = pd.DataFrame({
-                    'Original_mean': df[numeric_cols].mean(),
-                    'Synthetic_mean': synthetic_df[numeric_cols].mean(),
-                    'Original_std': df[numeric_cols].std(),
-                    'Synthetic_std': synthetic_df[numeric_cols].std()
+                    'Original_mean': original_moments['mean'],
+                    'Synthetic_mean': synthetic_moments['mean'],
+                    'Original_std': original_moments['std'],
+                    'Synthetic_std': synthetic_moments['std']
                 })
                 st.dataframe(stats_comparison)
             
+            # 分布の比較（保存済みの統計量のスケッチから計算）
+            st.write("### 分布の忠実度")
+            fidelity = fidelity_report(original_stats, synthetic_stats)
+            summary = fidelity["summary"]
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                if summary["mean_ks"] is not None:
+                    st.metric("平均KS統計量（数値列）", f"{summary['mean_ks']:.3f}")
+            with col2:
+                if summary["mean_tvd"] is not None:
+                    st.metric("平均TVD", f"{summary['mean_tvd']:.3f}")
+            with col3:
+                if summary["mean_correlation_difference"] is not None:
+                    st.metric("相関係数の平均絶対差", f"{summary['mean_correlation_difference']:.3f}")
+            st.caption("いずれも0に近いほどオリジナルデータの分布に近いことを示します。")
+            
+            with st.expander("列ごとの比較", expanded=False):
+                st.dataframe(pd.DataFrame(fidelity["columns"]).set_index("column"))
+                for column, frequencies in fidelity["categories"].items():
+                    st.write(f"**{column}** のカテゴリ頻度")
+                    st.dataframe(pd.DataFrame(frequencies).set_index("value"))
+            
             st.info("""
             合成データが生成されました。
             データセット管理ページで確認し、プライバシー評価ページで評価を実行できます。
@@ -235,6 +221,75 @@ if st.button("合成データを生成", type="primary"):
         except Exception as e:
             st.error(f"合成データ生成中にエラーが発生しました: {e}")
 
+# パラメータスイープ
+st.header("5. パラメータスイープ（プライバシーと有用性のトレードオフ）")
+st.write("""
+選択した生成手法のパラメータを複数の値で試し、メンバーシップ推論攻撃のAUC（プライバシーリスク）と
+分布のずれ（TVD）を並列に評価します。どちらも小さいほど良く、他の設定に劣らない点がパレートフロンティアです。
+結果はレポートページでも確認できます。
+""")
+
+if generation_method not in PARAMETER_GRIDS:
+    st.info("スイープするには、パラメータのある生成手法を選択してください。")
+else:
+    sweep_parameter, default_grid = PARAMETER_GRIDS[generation_method]
+    col1, col2 = st.columns(2)
+    with col1:
+        grid_text = st.text_input(
+            f"{sweep_parameter} の値（カンマ区切り）",
+            value=", ".join(str(v) for v in default_grid)
+        )
+        sweep_attack = st.selectbox(
+            "評価に使う攻撃",
+            ["Groundhog Attack", "Closest Distance Attack"]
+        )
+    with col2:
+        sweep_samples = st.number_input("評価サンプル数", min_value=10, max_value=1000, value=100, key="sweep_samples")
+        sweep_runs = st.number_input("評価実行回数", min_value=1, max_value=10, value=1, key="sweep_runs")
+    
+    if st.button("スイープを実行"):
+        try:
+            cast = int if sweep_parameter == "k_value" else float
+            grid = [cast(v) for v in grid_text.split(",") if v.strip()]
+            base_params = {
+                key: value for key, value in {
+                    "noise_type": noise_type if generation_method == "ノイズ付加" else None,
+                    "quasi_identifiers": quasi_identifiers if generation_method == "k-匿名化（簡易版）" else None,
+                }.items() if value is not None
+            }
+            progress = st.progress(0.0, text="評価中...")
+            frontier = run_frontier(
+                shared_pool(),
+                {
+                    "dataset": selected_dataset,
+                    "generator": generation_method,
+                    "generator_params": base_params,
+                    "attack_type": sweep_attack,
+                    "num_samples": int(sweep_samples),
+                    "evaluation_runs": int(sweep_runs),
+                },
+                sweep_parameter,
+                grid,
+                on_progress=lambda done, total: progress.progress(done / total, text=f"評価中... {done}/{total}"),
+            )
+            path = save_frontier(frontier)
+            st.success(f"✅ スイープが完了しました: {path}")
+            
+            frontier_df = pd.DataFrame([
+                {
+                    sweep_parameter: point["value"],
+                    "AUC": point["privacy"]["auc"],
+                    "精度": point["privacy"]["accuracy"],
+                    "平均TVD": point["fidelity"]["mean_tvd"],
+                    "平均KS": point["fidelity"]["mean_ks"],
+                    "パレート最適": point["pareto"],
+                }
+                for point in frontier["points"]
+            ])
+            st.dataframe(frontier_df, hide_index=True)
+        except Exception as e:
+            st.error(f"スイープ中にエラーが発生しました: {e}")
+
 # 注意事項
 st.divider()
 st.warning("""